@@ -0,0 +1,51 @@
+"""LangGraph checkpoint tables in their own schema, outside the tenant-scoped metadata schema."""
+
+from __future__ import annotations
+
+from langgraph.checkpoint.postgres.base import BasePostgresSaver
+
+from alembic import op
+
+revision = '0002_agent_checkpoints'
+down_revision = '0001_initial_with_rls'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Checkpoints hold the document text and agent state of every tenant but carry no tenant id, so RLS
+    # cannot scope them. They live in a schema metadata_rw has no access to; only the workers' login role,
+    # a member of agent_checkpoints_rw, reads and writes them.
+    op.execute('CREATE SCHEMA IF NOT EXISTS agent_checkpoints;')
+    op.execute(
+        """
+        DO $$
+        BEGIN
+            IF NOT EXISTS (SELECT FROM pg_catalog.pg_roles WHERE rolname = 'agent_checkpoints_rw') THEN
+                CREATE ROLE agent_checkpoints_rw NOLOGIN;
+            END IF;
+        END
+        $$;
+        """
+    )
+
+    # The checkpointer migrations use CREATE INDEX CONCURRENTLY, which cannot run inside a transaction.
+    with op.get_context().autocommit_block():
+        op.execute('SET search_path TO agent_checkpoints')
+        op.execute(BasePostgresSaver.MIGRATIONS[0])
+        applied = {row[0] for row in op.get_bind().exec_driver_sql('SELECT v FROM checkpoint_migrations')}
+        for version, migration in enumerate(BasePostgresSaver.MIGRATIONS):
+            if version in applied:
+                continue
+            op.execute(migration)
+            op.execute(f'INSERT INTO checkpoint_migrations (v) VALUES ({version})')
+        op.execute('RESET search_path')
+
+    op.execute('GRANT USAGE ON SCHEMA agent_checkpoints TO agent_checkpoints_rw;')
+    op.execute(
+        'GRANT SELECT, INSERT, UPDATE, DELETE ON ALL TABLES IN SCHEMA agent_checkpoints TO agent_checkpoints_rw;'
+    )
+
+
+def downgrade() -> None:
+    op.execute('DROP SCHEMA IF EXISTS agent_checkpoints CASCADE;')
@@ -0,0 +1,27 @@
+"""Partial agent results on metadata jobs."""
+
+from __future__ import annotations
+
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from alembic import op
+
+revision = '0003_job_partial_results'
+down_revision = '0002_agent_checkpoints'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('metadata_jobs', sa.Column('stage', sa.Text(), nullable=True), schema='metadata')
+    op.add_column(
+        'metadata_jobs',
+        sa.Column('partial_metadata', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+        schema='metadata',
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('metadata_jobs', 'partial_metadata', schema='metadata')
+    op.drop_column('metadata_jobs', 'stage', schema='metadata')
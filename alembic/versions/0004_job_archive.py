@@ -0,0 +1,142 @@
+"""Archive table for terminal jobs and partial indexes on metadata_jobs."""
+
+from __future__ import annotations
+
+import sqlalchemy as sa
+
+from alembic import op
+
+revision = '0004_job_archive'
+down_revision = '0003_job_partial_results'
+branch_labels = None
+depends_on = None
+
+ACTIVE = "status IN ('queued', 'running')"
+TERMINAL = "status IN ('succeeded', 'failed', 'canceled')"
+
+
+def upgrade() -> None:
+    # Before the models stored enum values, the ORM wrote member names ('QUEUED'); the partial indexes and
+    # the archiver below compare against the lowercase values.
+    op.execute('UPDATE metadata.metadata_jobs SET status = lower(status) WHERE status <> lower(status)')
+
+    # Same columns as metadata_jobs plus `archived_at`; both models share them through `JobFields`. Rows
+    # are copied by column name, so a migration adding a job column adds it to both tables.
+    op.execute(
+        """
+        CREATE TABLE metadata.metadata_jobs_archive (
+            LIKE metadata.metadata_jobs INCLUDING DEFAULTS,
+            archived_at TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT (now() AT TIME ZONE 'UTC'),
+            PRIMARY KEY (job_id)
+        )
+        """
+    )
+    op.create_index(
+        'ix_jobs_archive_tenant_created',
+        'metadata_jobs_archive',
+        ['tenant_id', 'created_at'],
+        schema='metadata',
+    )
+    op.execute('ALTER TABLE metadata.metadata_jobs_archive ENABLE ROW LEVEL SECURITY;')
+    op.execute('ALTER TABLE metadata.metadata_jobs_archive FORCE ROW LEVEL SECURITY;')
+    op.execute(
+        """
+        CREATE POLICY metadata_jobs_archive_tenant_policy
+        ON metadata.metadata_jobs_archive
+        USING (tenant_id = current_setting('app.tenant_id', false)::uuid)
+        WITH CHECK (tenant_id = current_setting('app.tenant_id', false)::uuid)
+        """
+    )
+    op.execute('GRANT SELECT, INSERT, UPDATE, DELETE ON metadata.metadata_jobs_archive TO metadata_rw;')
+
+    # SECURITY DEFINER: runs as the migration role, which must bypass RLS (superuser or BYPASSRLS)
+    # because one call archives jobs of every tenant.
+    op.execute(
+        f"""
+        CREATE OR REPLACE FUNCTION metadata.archive_terminal_jobs(max_age interval, batch_size integer)
+        RETURNS integer
+        LANGUAGE plpgsql
+        SECURITY DEFINER
+        SET search_path = metadata, pg_temp
+        AS $$
+        DECLARE
+            moved integer;
+        BEGIN
+            WITH candidates AS (
+                SELECT job_id
+                FROM metadata_jobs
+                WHERE {TERMINAL} AND finished_at < (now() AT TIME ZONE 'UTC') - max_age
+                ORDER BY finished_at
+                LIMIT batch_size
+                FOR UPDATE SKIP LOCKED
+            ), moved_jobs AS (
+                DELETE FROM metadata_jobs AS jobs
+                USING candidates
+                WHERE jobs.job_id = candidates.job_id
+                RETURNING jobs.*
+            )
+            INSERT INTO metadata_jobs_archive
+            SELECT (jsonb_populate_record(
+                NULL::metadata_jobs_archive,
+                to_jsonb(moved_jobs) || jsonb_build_object('archived_at', now() AT TIME ZONE 'UTC')
+            )).*
+            FROM moved_jobs;
+            GET DIAGNOSTICS moved = ROW_COUNT;
+            RETURN moved;
+        END;
+        $$
+        """
+    )
+    op.execute('REVOKE ALL ON FUNCTION metadata.archive_terminal_jobs(interval, integer) FROM PUBLIC;')
+    op.execute('GRANT EXECUTE ON FUNCTION metadata.archive_terminal_jobs(interval, integer) TO metadata_rw;')
+
+    # Build the partial indexes without blocking writes on existing deployments.
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_jobs_active_priority_created',
+            'metadata_jobs',
+            ['status', 'priority', 'created_at'],
+            schema='metadata',
+            postgresql_where=sa.text(ACTIVE),
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            'ix_jobs_terminal_finished',
+            'metadata_jobs',
+            ['finished_at'],
+            schema='metadata',
+            postgresql_where=sa.text(TERMINAL),
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.drop_index(
+            'ix_jobs_status_priority_created',
+            table_name='metadata_jobs',
+            schema='metadata',
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+
+
+def downgrade() -> None:
+    # Archived jobs move back so no history is lost.
+    op.execute(
+        """
+        INSERT INTO metadata.metadata_jobs
+        SELECT (jsonb_populate_record(NULL::metadata.metadata_jobs, to_jsonb(archive))).*
+        FROM metadata.metadata_jobs_archive AS archive
+        ON CONFLICT DO NOTHING
+        """
+    )
+    op.execute('DROP FUNCTION IF EXISTS metadata.archive_terminal_jobs(interval, integer);')
+    op.drop_table('metadata_jobs_archive', schema='metadata')
+
+    op.create_index(
+        'ix_jobs_status_priority_created',
+        'metadata_jobs',
+        ['status', 'priority', 'created_at'],
+        schema='metadata',
+    )
+    op.drop_index('ix_jobs_terminal_finished', table_name='metadata_jobs', schema='metadata')
+    op.drop_index('ix_jobs_active_priority_created', table_name='metadata_jobs', schema='metadata')
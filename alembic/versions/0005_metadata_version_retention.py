@@ -0,0 +1,105 @@
+"""Source and pin flags on metadata versions, and the version compaction function."""
+
+from __future__ import annotations
+
+import sqlalchemy as sa
+
+from alembic import op
+
+revision = '0005_metadata_version_retention'
+down_revision = '0004_job_archive'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        'document_metadata',
+        sa.Column('source', sa.Text(), nullable=False, server_default='agent'),
+        schema='metadata',
+    )
+    op.add_column(
+        'document_metadata',
+        sa.Column('pinned', sa.Boolean(), nullable=False, server_default=sa.false()),
+        schema='metadata',
+    )
+    # Versions that no job produced were stored through the manual update endpoint. Unknown is treated as
+    # manual so compaction never removes a version someone typed in.
+    op.execute(
+        """
+        UPDATE metadata.document_metadata AS versions
+        SET source = 'manual'
+        WHERE NOT EXISTS (
+            SELECT 1 FROM metadata.metadata_jobs AS jobs
+            WHERE jobs.tenant_id = versions.tenant_id
+              AND jobs.document_id = versions.document_id
+              AND jobs.processing_fingerprint = versions.fingerprint
+        )
+        AND NOT EXISTS (
+            SELECT 1 FROM metadata.metadata_jobs_archive AS jobs
+            WHERE jobs.tenant_id = versions.tenant_id
+              AND jobs.document_id = versions.document_id
+              AND jobs.processing_fingerprint = versions.fingerprint
+        )
+        """
+    )
+
+    # One call compacts the next `batch_size` documents after the (tenant_id, document_id) cursor and
+    # returns how many versions it deleted plus the new cursor, or no row once every document was visited.
+    # SECURITY DEFINER for the same reason as `archive_terminal_jobs`: it spans tenants.
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION metadata.compact_metadata_versions(
+            keep_last integer,
+            batch_size integer,
+            after_tenant_id uuid,
+            after_document_id uuid
+        )
+        RETURNS TABLE (deleted integer, last_tenant_id uuid, last_document_id uuid)
+        LANGUAGE sql
+        SECURITY DEFINER
+        SET search_path = metadata, pg_temp
+        AS $$
+            WITH documents AS (
+                SELECT DISTINCT tenant_id, document_id
+                FROM document_metadata
+                WHERE (tenant_id, document_id) > (after_tenant_id, after_document_id)
+                ORDER BY tenant_id, document_id
+                LIMIT batch_size
+            ), surplus AS (
+                SELECT documents.tenant_id, documents.document_id, older.version
+                FROM documents
+                CROSS JOIN LATERAL (
+                    SELECT version, source, pinned
+                    FROM document_metadata AS versions
+                    WHERE versions.tenant_id = documents.tenant_id
+                      AND versions.document_id = documents.document_id
+                    ORDER BY version DESC
+                    OFFSET keep_last
+                ) AS older
+                WHERE older.source = 'agent' AND NOT older.pinned
+            ), removed AS (
+                DELETE FROM document_metadata AS versions
+                USING surplus
+                WHERE versions.tenant_id = surplus.tenant_id
+                  AND versions.document_id = surplus.document_id
+                  AND versions.version = surplus.version
+                RETURNING 1
+            )
+            SELECT (SELECT count(*) FROM removed)::integer, tenant_id, document_id
+            FROM documents
+            ORDER BY tenant_id DESC, document_id DESC
+            LIMIT 1
+        $$
+        """
+    )
+    op.execute('REVOKE ALL ON FUNCTION metadata.compact_metadata_versions(integer, integer, uuid, uuid) FROM PUBLIC;')
+    op.execute(
+        'GRANT EXECUTE ON FUNCTION metadata.compact_metadata_versions(integer, integer, uuid, uuid) TO metadata_rw;'
+    )
+
+
+def downgrade() -> None:
+    op.execute('DROP FUNCTION IF EXISTS metadata.compact_metadata_versions(integer, integer, uuid, uuid);')
+    op.drop_column('document_metadata', 'pinned', schema='metadata')
+    op.drop_column('document_metadata', 'source', schema='metadata')
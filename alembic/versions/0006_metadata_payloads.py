@@ -0,0 +1,216 @@
+"""Content-addressed metadata payloads shared by versions with the same fingerprint."""
+
+from __future__ import annotations
+
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from alembic import op
+
+revision = '0006_metadata_payloads'
+down_revision = '0005_metadata_version_retention'
+branch_labels = None
+depends_on = None
+
+# Documents after the cursor, in key order, and the versions beyond the newest `keep_last` that are neither
+# manual nor pinned. Shared by the upgraded function and the one restored on downgrade.
+_SURPLUS = """
+    documents AS (
+        SELECT DISTINCT tenant_id, document_id
+        FROM document_metadata
+        WHERE (tenant_id, document_id) > (after_tenant_id, after_document_id)
+        ORDER BY tenant_id, document_id
+        LIMIT batch_size
+    ), surplus AS (
+        SELECT documents.tenant_id, documents.document_id, older.version
+        FROM documents
+        CROSS JOIN LATERAL (
+            SELECT version, source, pinned
+            FROM document_metadata AS versions
+            WHERE versions.tenant_id = documents.tenant_id
+              AND versions.document_id = documents.document_id
+            ORDER BY version DESC
+            OFFSET keep_last
+        ) AS older
+        WHERE older.source = 'agent' AND NOT older.pinned
+    )
+"""
+
+
+def upgrade() -> None:
+    op.create_table(
+        'metadata_payloads',
+        sa.Column('tenant_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('fingerprint', sa.Text(), nullable=False),
+        sa.Column('payload', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+        sa.Column(
+            'created_at',
+            sa.TIMESTAMP(timezone=False),
+            nullable=False,
+            server_default=sa.text("(now() AT TIME ZONE 'UTC')"),
+        ),
+        sa.PrimaryKeyConstraint('tenant_id', 'fingerprint'),
+        schema='metadata',
+    )
+    op.execute('ALTER TABLE metadata.metadata_payloads ENABLE ROW LEVEL SECURITY;')
+    op.execute('ALTER TABLE metadata.metadata_payloads FORCE ROW LEVEL SECURITY;')
+    op.execute(
+        """
+        CREATE POLICY metadata_payloads_tenant_policy
+        ON metadata.metadata_payloads
+        USING (tenant_id = current_setting('app.tenant_id', false)::uuid)
+        WITH CHECK (tenant_id = current_setting('app.tenant_id', false)::uuid)
+        """
+    )
+    op.execute('GRANT SELECT, INSERT, UPDATE, DELETE ON metadata.metadata_payloads TO metadata_rw;')
+
+    # The fingerprint is a hash of the payload, so versions sharing one share the content; keep the newest.
+    op.execute(
+        """
+        INSERT INTO metadata.metadata_payloads (tenant_id, fingerprint, payload, created_at)
+        SELECT DISTINCT ON (tenant_id, fingerprint) tenant_id, fingerprint, payload, extracted_on
+        FROM metadata.document_metadata
+        ORDER BY tenant_id, fingerprint, version DESC
+        """
+    )
+    op.create_index(
+        'ix_docmeta_tenant_fingerprint',
+        'document_metadata',
+        ['tenant_id', 'fingerprint'],
+        schema='metadata',
+    )
+    op.create_foreign_key(
+        'fk_docmeta_payload',
+        'document_metadata',
+        'metadata_payloads',
+        ['tenant_id', 'fingerprint'],
+        ['tenant_id', 'fingerprint'],
+        source_schema='metadata',
+        referent_schema='metadata',
+    )
+    op.drop_column('document_metadata', 'payload', schema='metadata')
+
+    # Compaction now also deletes the payloads its removed versions leave unreferenced. Writers lock the
+    # payload row they reference (`_store_payload` upserts it), so the delete waits for a concurrent version
+    # to commit, after which the foreign key rejects that one delete and the payload is kept. A payload deleted
+    # first is simply inserted again by the writer's upsert.
+    op.execute(
+        f"""
+        CREATE OR REPLACE FUNCTION metadata.compact_metadata_versions(
+            keep_last integer,
+            batch_size integer,
+            after_tenant_id uuid,
+            after_document_id uuid
+        )
+        RETURNS TABLE (deleted integer, last_tenant_id uuid, last_document_id uuid)
+        LANGUAGE plpgsql
+        SECURITY DEFINER
+        SET search_path = metadata, pg_temp
+        AS $$
+        DECLARE
+            removed_tenants uuid[];
+            removed_fingerprints text[];
+            gone_tenant_id uuid;
+            gone_fingerprint text;
+        BEGIN
+            WITH {_SURPLUS}, removed AS (
+                DELETE FROM document_metadata AS versions
+                USING surplus
+                WHERE versions.tenant_id = surplus.tenant_id
+                  AND versions.document_id = surplus.document_id
+                  AND versions.version = surplus.version
+                RETURNING versions.tenant_id, versions.fingerprint
+            ), cursor_row AS (
+                SELECT tenant_id, document_id
+                FROM documents
+                ORDER BY tenant_id DESC, document_id DESC
+                LIMIT 1
+            )
+            SELECT
+                (SELECT count(*) FROM removed)::integer,
+                cursor_row.tenant_id,
+                cursor_row.document_id,
+                gone.tenants,
+                gone.fingerprints
+            INTO deleted, last_tenant_id, last_document_id, removed_tenants, removed_fingerprints
+            FROM cursor_row
+            CROSS JOIN (
+                SELECT array_agg(tenant_id) AS tenants, array_agg(fingerprint) AS fingerprints
+                FROM (SELECT DISTINCT tenant_id, fingerprint FROM removed) AS distinct_removed
+            ) AS gone;
+            IF NOT FOUND THEN
+                RETURN;
+            END IF;
+
+            -- One payload at a time, so a payload re-referenced concurrently keeps only itself; the others
+            -- would never be looked at again by a later run.
+            FOR gone_tenant_id, gone_fingerprint IN
+                SELECT * FROM unnest(removed_tenants, removed_fingerprints)
+            LOOP
+                BEGIN
+                    DELETE FROM metadata_payloads AS payloads
+                    WHERE payloads.tenant_id = gone_tenant_id
+                      AND payloads.fingerprint = gone_fingerprint
+                      AND NOT EXISTS (
+                          SELECT 1 FROM document_metadata AS versions
+                          WHERE versions.tenant_id = payloads.tenant_id
+                            AND versions.fingerprint = payloads.fingerprint
+                      );
+                EXCEPTION WHEN foreign_key_violation THEN
+                    NULL;
+                END;
+            END LOOP;
+            RETURN NEXT;
+        END;
+        $$
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute(
+        f"""
+        CREATE OR REPLACE FUNCTION metadata.compact_metadata_versions(
+            keep_last integer,
+            batch_size integer,
+            after_tenant_id uuid,
+            after_document_id uuid
+        )
+        RETURNS TABLE (deleted integer, last_tenant_id uuid, last_document_id uuid)
+        LANGUAGE sql
+        SECURITY DEFINER
+        SET search_path = metadata, pg_temp
+        AS $$
+            WITH {_SURPLUS}, removed AS (
+                DELETE FROM document_metadata AS versions
+                USING surplus
+                WHERE versions.tenant_id = surplus.tenant_id
+                  AND versions.document_id = surplus.document_id
+                  AND versions.version = surplus.version
+                RETURNING 1
+            )
+            SELECT (SELECT count(*) FROM removed)::integer, tenant_id, document_id
+            FROM documents
+            ORDER BY tenant_id DESC, document_id DESC
+            LIMIT 1
+        $$
+        """
+    )
+
+    op.add_column(
+        'document_metadata',
+        sa.Column('payload', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+        schema='metadata',
+    )
+    op.execute(
+        """
+        UPDATE metadata.document_metadata AS versions
+        SET payload = payloads.payload
+        FROM metadata.metadata_payloads AS payloads
+        WHERE payloads.tenant_id = versions.tenant_id AND payloads.fingerprint = versions.fingerprint
+        """
+    )
+    op.alter_column('document_metadata', 'payload', nullable=False, schema='metadata')
+    op.drop_constraint('fk_docmeta_payload', 'document_metadata', schema='metadata', type_='foreignkey')
+    op.drop_index('ix_docmeta_tenant_fingerprint', table_name='document_metadata', schema='metadata')
+    op.drop_table('metadata_payloads', schema='metadata')
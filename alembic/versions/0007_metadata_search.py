@@ -0,0 +1,105 @@
+"""Search table holding the indexed fields of each document's latest metadata version."""
+
+from __future__ import annotations
+
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from alembic import op
+
+revision = '0007_metadata_search'
+down_revision = '0006_metadata_payloads'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Trigram operator classes back the prefix and substring company name matches.
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm;')
+
+    op.create_table(
+        'metadata_search',
+        sa.Column('tenant_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('document_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('version', sa.Integer(), nullable=False),
+        sa.Column('fingerprint', sa.Text(), nullable=False),
+        sa.Column('extracted_on', sa.TIMESTAMP(timezone=False), nullable=False),
+        sa.Column('document_type', sa.Text(), nullable=True),
+        sa.Column('company_name', sa.Text(), nullable=True),
+        sa.Column('reporting_year', sa.Integer(), nullable=True),
+        sa.Column('register_number', sa.Text(), nullable=True),
+        sa.Column('tags', postgresql.JSONB(astext_type=sa.Text()), nullable=False, server_default='[]'),
+        sa.PrimaryKeyConstraint('tenant_id', 'document_id'),
+        sa.ForeignKeyConstraint(
+            ['tenant_id', 'fingerprint'],
+            ['metadata.metadata_payloads.tenant_id', 'metadata.metadata_payloads.fingerprint'],
+            name='fk_search_payload',
+        ),
+        schema='metadata',
+    )
+    op.create_index(
+        'ix_search_tenant_type_year',
+        'metadata_search',
+        ['tenant_id', 'document_type', 'reporting_year', 'document_id'],
+        schema='metadata',
+    )
+    op.create_index('ix_search_tenant_register', 'metadata_search', ['tenant_id', 'register_number'], schema='metadata')
+    op.create_index(
+        'ix_search_company_trgm',
+        'metadata_search',
+        ['company_name'],
+        schema='metadata',
+        postgresql_using='gin',
+        postgresql_ops={'company_name': 'gin_trgm_ops'},
+    )
+    op.create_index(
+        'ix_search_tags',
+        'metadata_search',
+        ['tags'],
+        schema='metadata',
+        postgresql_using='gin',
+        postgresql_ops={'tags': 'jsonb_path_ops'},
+    )
+
+    op.execute('ALTER TABLE metadata.metadata_search ENABLE ROW LEVEL SECURITY;')
+    op.execute('ALTER TABLE metadata.metadata_search FORCE ROW LEVEL SECURITY;')
+    op.execute(
+        """
+        CREATE POLICY metadata_search_tenant_policy
+        ON metadata.metadata_search
+        USING (tenant_id = current_setting('app.tenant_id', false)::uuid)
+        WITH CHECK (tenant_id = current_setting('app.tenant_id', false)::uuid)
+        """
+    )
+    op.execute('GRANT SELECT, INSERT, UPDATE, DELETE ON metadata.metadata_search TO metadata_rw;')
+
+    op.execute(
+        """
+        INSERT INTO metadata.metadata_search (
+            tenant_id, document_id, version, fingerprint, extracted_on,
+            document_type, company_name, reporting_year, register_number, tags
+        )
+        SELECT DISTINCT ON (versions.tenant_id, versions.document_id)
+            versions.tenant_id,
+            versions.document_id,
+            versions.version,
+            versions.fingerprint,
+            versions.extracted_on,
+            payloads.payload ->> 'document_type',
+            payloads.payload ->> 'company_name',
+            (payloads.payload ->> 'reporting_year')::integer,
+            payloads.payload ->> 'register_number',
+            CASE
+                WHEN jsonb_typeof(payloads.payload -> 'tags') = 'array' THEN payloads.payload -> 'tags'
+                ELSE '[]'::jsonb
+            END
+        FROM metadata.document_metadata AS versions
+        JOIN metadata.metadata_payloads AS payloads
+          ON payloads.tenant_id = versions.tenant_id AND payloads.fingerprint = versions.fingerprint
+        ORDER BY versions.tenant_id, versions.document_id, versions.version DESC
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('metadata_search', schema='metadata')
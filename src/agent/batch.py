@@ -0,0 +1,62 @@
+"""Classify many documents with one structured-output call, for bulk backfills."""
+
+from __future__ import annotations
+
+import logging
+from collections.abc import Mapping
+
+from langchain_core.messages import HumanMessage, SystemMessage
+from langchain_core.runnables import RunnableConfig
+from pydantic import BaseModel, Field
+
+from core.config import get_settings
+
+from .budget import call_timeout
+from .models import chat_model, model_route, record_model_call
+from .nodes import DOCUMENT_TYPE_CHOICES, parse_document_type
+
+logger = logging.getLogger(__name__)
+
+
+class DocumentClassification(BaseModel):
+    key: str = Field(description='The key of the excerpt, exactly as given.')
+    document_type: str = Field(description='The document type of the excerpt.')
+
+
+class BatchClassification(BaseModel):
+    documents: list[DocumentClassification]
+
+
+def _excerpt_block(key: str, text: str, max_chars: int) -> str:
+    return f'<document key="{key}">\n{text[:max_chars]}\n</document>'
+
+
+def classify_documents(excerpts: Mapping[str, str], config: RunnableConfig) -> dict[str, str | None]:
+    """Return the document type per excerpt key; keys the model skipped or mislabelled map to None."""
+    settings = get_settings()
+    keys = [key for key, text in excerpts.items() if text]
+    if not keys:
+        return {key: None for key in excerpts}
+
+    prompt = SystemMessage(
+        content=(
+            'You are an expert document classifier. Each document below is given by its first chunks. '
+            f'Classify every document as exactly one of: {DOCUMENT_TYPE_CHOICES}. '
+            'Return one entry per document, using its key exactly as given.'
+        )
+    )
+    body = HumanMessage(
+        content='\n\n'.join(_excerpt_block(key, excerpts[key], settings.agent_batch_excerpt_chars) for key in keys)
+    )
+    model = chat_model(model_route(config).primary).with_structured_output(BatchClassification)
+    record_model_call('batch_classifier')
+    result = model.invoke([prompt, body], timeout=call_timeout(config, settings.agent_llm_timeout_secs))
+
+    document_types: dict[str, str | None] = {key: None for key in excerpts}
+    for item in BatchClassification.model_validate(result).documents:
+        if item.key in document_types:
+            document_types[item.key] = parse_document_type(item.document_type)
+    missing = [key for key in keys if document_types[key] is None]
+    if missing:
+        logger.info('Batch classification left %d of %d documents unclassified', len(missing), len(keys))
+    return document_types
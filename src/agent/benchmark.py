@@ -0,0 +1,147 @@
+"""Replay a document corpus through an agent profile and report where the time goes.
+
+Record cassettes once against live services, then compare prompt or graph changes offline:
+
+    python -m agent.benchmark corpus.jsonl --cassettes bench/cassettes --mode record
+    python -m agent.benchmark corpus.jsonl --cassettes bench/cassettes --repeat 3 --output after.json
+
+Each corpus line is a JSON object with `digest`, `collection_name` and `tenant_id`. Replay needs no
+network access, but the settings still have to load (dummy API keys and database URLs are fine).
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Any
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+from .budget import DEADLINE_KEY, job_deadline, recursion_limit
+from .models import MODEL_KEY
+from .profiles import DEFAULT_PROFILE, get_profile
+from .replay import Cassette, Mode, cassette_calls
+from .schemas import ContextSchema
+
+
+class BenchmarkCallback(BaseCallbackHandler):
+    """Collect per-node latency, tool-call counts and token usage from LangChain callbacks."""
+
+    def __init__(self) -> None:
+        self.node_secs: dict[str, list[float]] = defaultdict(list)
+        self.tool_calls: Counter[str] = Counter()
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self._started: dict[UUID, tuple[str, float]] = {}
+
+    def on_chain_start(self, serialized, inputs, *, run_id, metadata=None, **kwargs: Any) -> None:
+        name = kwargs.get('name')
+        if name and (metadata or {}).get('langgraph_node') == name:
+            self._started[run_id] = (name, time.perf_counter())
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs: Any) -> None:
+        self._finish(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs: Any) -> None:
+        self._finish(run_id)
+
+    def on_tool_start(self, serialized, input_str, **kwargs: Any) -> None:
+        self.tool_calls[kwargs.get('name') or (serialized or {}).get('name') or 'unknown'] += 1
+
+    def on_llm_end(self, response: LLMResult, **kwargs: Any) -> None:
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, 'message', None), 'usage_metadata', None) or {}
+                self.prompt_tokens += usage.get('input_tokens', 0)
+                self.completion_tokens += usage.get('output_tokens', 0)
+
+    def _finish(self, run_id: UUID) -> None:
+        started = self._started.pop(run_id, None)
+        if started is not None:
+            name, start = started
+            self.node_secs[name].append(time.perf_counter() - start)
+
+
+def _cassette_path(directory: Path, profile: str, context: ContextSchema) -> Path:
+    safe_digest = context.digest.replace('/', '_').replace('+', '-').rstrip('=')
+    return directory / f'{profile}-{safe_digest}.json'
+
+
+def run_document(context: ContextSchema, profile_name: str, cassette: Cassette, callback: BenchmarkCallback) -> float:
+    """Run one document through the profile graph with all external calls served by `cassette`."""
+    profile = get_profile(profile_name)
+    config = {
+        'configurable': {**context.model_dump(), DEADLINE_KEY: job_deadline(), MODEL_KEY: profile.models},
+        'recursion_limit': recursion_limit(),
+        'callbacks': [callback],
+    }
+    start = time.perf_counter()
+    with cassette_calls(cassette):
+        profile.graph.invoke({}, config=config)
+    return time.perf_counter() - start
+
+
+def _report(callback: BenchmarkCallback, wall_secs: list[float]) -> dict[str, Any]:
+    return {
+        'documents': len(wall_secs),
+        'wall_ms': {
+            'mean': 1000 * statistics.fmean(wall_secs) if wall_secs else 0.0,
+            'max': 1000 * max(wall_secs, default=0.0),
+        },
+        'nodes': {
+            name: {'calls': len(secs), 'total_ms': 1000 * sum(secs), 'mean_ms': 1000 * statistics.fmean(secs)}
+            for name, secs in sorted(callback.node_secs.items())
+        },
+        'tool_calls': dict(sorted(callback.tool_calls.items())),
+        'prompt_tokens': callback.prompt_tokens,
+        'completion_tokens': callback.completion_tokens,
+    }
+
+
+def _print_report(report: dict[str, Any]) -> None:
+    wall = report['wall_ms']
+    print(f'documents: {report["documents"]}  wall mean {wall["mean"]:.1f} ms  max {wall["max"]:.1f} ms')
+    print(f'{"node":<24}{"calls":>8}{"total ms":>12}{"mean ms":>12}')
+    for name, stats in report['nodes'].items():
+        print(f'{name:<24}{stats["calls"]:>8}{stats["total_ms"]:>12.1f}{stats["mean_ms"]:>12.1f}')
+    print('tool calls: ' + (', '.join(f'{name}={count}' for name, count in report['tool_calls'].items()) or 'none'))
+    print(f'tokens: prompt {report["prompt_tokens"]}  completion {report["completion_tokens"]}')
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('corpus', type=Path, help='JSONL file with one agent context per line.')
+    parser.add_argument('--cassettes', type=Path, required=True, help='Directory holding the cassettes.')
+    parser.add_argument('--mode', choices=['record', 'replay'], default='replay')
+    parser.add_argument('--profile', default=DEFAULT_PROFILE)
+    parser.add_argument('--repeat', type=int, default=1, help='Replay the corpus this many times.')
+    parser.add_argument('--output', type=Path, help='Also write the report as JSON to this file.')
+    args = parser.parse_args(argv)
+
+    mode: Mode = args.mode
+    contexts = [
+        ContextSchema.model_validate_json(line) for line in args.corpus.read_text().splitlines() if line.strip()
+    ]
+    callback = BenchmarkCallback()
+    wall_secs = []
+    for _ in range(1 if mode == 'record' else max(args.repeat, 1)):
+        for context in contexts:
+            cassette = Cassette(_cassette_path(args.cassettes, args.profile, context), mode)
+            wall_secs.append(run_document(context, args.profile, cassette, callback))
+
+    report = _report(callback, wall_secs)
+    _print_report(report)
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+import time
+
+from langchain_core.runnables import RunnableConfig
+
+from core.config import get_settings
+
+from .state import State
+
+DEADLINE_KEY = 'deadline'
+_MIN_CALL_TIMEOUT_SECS = 1.0
+
+
+def max_tool_rounds(node: str) -> int:
+    """Return the number of tool rounds the given node may request."""
+    return get_settings().agent_max_tool_rounds.get(node, 0)
+
+
+def tool_rounds_exhausted(state: State, node: str) -> bool:
+    used = (state.get('tool_rounds') or {}).get(node, 0)
+    return used >= max_tool_rounds(node)
+
+
+def job_deadline(timeout_secs: float | None = None) -> float:
+    """Return the wall-clock deadline (epoch seconds) for a job starting now."""
+    if timeout_secs is None:
+        timeout_secs = get_settings().agent_job_timeout_secs
+    return time.time() + timeout_secs
+
+
+def remaining_secs(config: RunnableConfig | None) -> float | None:
+    """Seconds left until the job deadline carried in the runnable config, if any."""
+    deadline = ((config or {}).get('configurable') or {}).get(DEADLINE_KEY)
+    if deadline is None:
+        return None
+    return float(deadline) - time.time()
+
+
+def deadline_passed(config: RunnableConfig | None) -> bool:
+    remaining = remaining_secs(config)
+    return remaining is not None and remaining <= 0
+
+
+def call_timeout(config: RunnableConfig | None, cap: float) -> float:
+    """Clamp a per-call timeout to the time left until the job deadline."""
+    remaining = remaining_secs(config)
+    if remaining is None:
+        return cap
+    return max(min(cap, remaining), _MIN_CALL_TIMEOUT_SECS)
+
+
+def recursion_limit() -> int:
+    """Upper bound on graph super-steps implied by the configured tool budgets."""
+    rounds = sum(get_settings().agent_max_tool_rounds.values())
+    # Every tool round costs two steps (model + tools); leave room for the linear nodes.
+    return 2 * rounds + 10
@@ -0,0 +1,154 @@
+"""Exact-match response cache for the agent's chat model calls.
+
+LangChain consults the global LLM cache before every chat model request, passing the serialized
+message list and a string describing the model, its parameters and the bound tools or output schema.
+With `temperature=0` an identical request yields a reusable answer, so rebuilds and retries of the
+same document skip the provider round trip.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import re
+import threading
+from collections import OrderedDict
+from collections.abc import Sequence
+from hashlib import sha256
+from typing import Any
+
+import redis
+from langchain_core.caches import BaseCache
+from langchain_core.globals import set_llm_cache
+from langchain_core.messages import messages_from_dict, messages_to_dict
+from langchain_core.outputs import ChatGeneration, Generation
+from pydantic import BaseModel
+
+from core.config import get_settings
+from core.metrics import create_counter
+
+logger = logging.getLogger(__name__)
+
+REDIS_KEY_PREFIX = 'metis:llm:'
+
+# Per-call timeouts are derived from the job deadline and would make every request key unique.
+_TIMEOUT_PARAM = re.compile(r"\('timeout', [^)]*\)(, )?")
+
+_lookups = create_counter('metis.agent.llm_cache_lookups', description='LLM response cache lookups by result.')
+_configured = False
+
+
+def json_default(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode='json')
+    return str(value)
+
+
+def _strip_message_ids(value: Any) -> Any:
+    # LangGraph assigns random ids to messages added to the state; they must not affect the key.
+    if isinstance(value, dict):
+        stripped = {key: _strip_message_ids(item) for key, item in value.items()}
+        if stripped.get('lc') == 1 and isinstance(stripped.get('kwargs'), dict):
+            stripped['kwargs'].pop('id', None)
+        return stripped
+    if isinstance(value, list):
+        return [_strip_message_ids(item) for item in value]
+    return value
+
+
+def llm_request_key(prompt: str, llm_string: str) -> str:
+    """Return a stable key for a chat model request, ignoring message ids and per-call timeouts."""
+    try:
+        prompt = json.dumps(_strip_message_ids(json.loads(prompt)), sort_keys=True)
+    except ValueError:
+        pass
+    return sha256(f'{prompt}\n{_TIMEOUT_PARAM.sub("", llm_string)}'.encode()).hexdigest()
+
+
+def dump_generations(generations: Sequence[Generation]) -> str:
+    messages = [generation.message for generation in generations if isinstance(generation, ChatGeneration)]
+    return json.dumps(messages_to_dict(messages), default=json_default)
+
+
+def load_generations(payload: str) -> list[Generation]:
+    return [ChatGeneration(message=message) for message in messages_from_dict(json.loads(payload))]
+
+
+class InMemoryResponseCache(BaseCache):
+    """Process-local LRU cache bounded by entry count."""
+
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, str] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def lookup(self, prompt: str, llm_string: str) -> Sequence[Generation] | None:
+        key = llm_request_key(prompt, llm_string)
+        with self._lock:
+            payload = self._entries.get(key)
+            if payload is not None:
+                self._entries.move_to_end(key)
+        _lookups.add(1, {'result': 'miss' if payload is None else 'hit'})
+        return None if payload is None else load_generations(payload)
+
+    def update(self, prompt: str, llm_string: str, return_val: Sequence[Generation]) -> None:
+        key = llm_request_key(prompt, llm_string)
+        with self._lock:
+            self._entries[key] = dump_generations(return_val)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self, **kwargs: Any) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class RedisResponseCache(BaseCache):
+    """Redis-backed cache shared by all workers; entries expire after `ttl_secs`.
+
+    Size is bounded by the TTL and the server's `maxmemory` eviction policy. Redis errors are logged
+    and treated as misses so the cache never fails a model call.
+    """
+
+    def __init__(self, client: redis.Redis, ttl_secs: int) -> None:
+        self.client = client
+        self.ttl_secs = ttl_secs
+
+    def lookup(self, prompt: str, llm_string: str) -> Sequence[Generation] | None:
+        try:
+            payload = self.client.get(REDIS_KEY_PREFIX + llm_request_key(prompt, llm_string))
+        except redis.RedisError:
+            logger.warning('LLM cache lookup failed', exc_info=True)
+            payload = None
+        _lookups.add(1, {'result': 'miss' if payload is None else 'hit'})
+        return None if payload is None else load_generations(payload)
+
+    def update(self, prompt: str, llm_string: str, return_val: Sequence[Generation]) -> None:
+        key = REDIS_KEY_PREFIX + llm_request_key(prompt, llm_string)
+        try:
+            self.client.set(key, dump_generations(return_val), ex=self.ttl_secs)
+        except redis.RedisError:
+            logger.warning('LLM cache update failed', exc_info=True)
+
+    def clear(self, **kwargs: Any) -> None:
+        for key in self.client.scan_iter(match=REDIS_KEY_PREFIX + '*'):
+            self.client.delete(key)
+
+
+def configure_llm_cache() -> None:
+    """Install the configured response cache as LangChain's global LLM cache (once per process)."""
+    global _configured
+    if _configured:
+        return
+    _configured = True
+
+    settings = get_settings()
+    if settings.agent_llm_cache == 'memory':
+        set_llm_cache(InMemoryResponseCache(settings.agent_llm_cache_max_entries))
+    elif settings.agent_llm_cache == 'redis':
+        client = redis.Redis.from_url(settings.redis_url.get_secret_value())
+        set_llm_cache(RedisResponseCache(client, settings.agent_llm_cache_ttl_secs))
+    else:
+        return
+    logger.info('LLM response cache configured | backend=%s', settings.agent_llm_cache)
@@ -0,0 +1,33 @@
+"""Cheap plausibility checks that decide whether extracted metadata needs a cleaning pass."""
+
+from __future__ import annotations
+
+import re
+
+from .schemas import MetadataSchema
+
+_LEGAL_FORM = re.compile(
+    r'\b(?:AG|SE|KG|KGaA|OHG|GbR|UG|eG|e\.\s?V\.|g?GmbH|mbH|Aktiengesellschaft|Kommanditgesellschaft'
+    r'|Ltd|Limited|Inc|LLC|PLC|S\.A\.|B\.V\.|N\.V\.)(?=\W|$)'
+)
+
+
+def confidence_issues(metadata: MetadataSchema | None) -> list[str]:
+    """Return human-readable reasons why the metadata candidate looks unreliable."""
+    if metadata is None:
+        return ['no metadata extracted']
+
+    issues = []
+    if not metadata.company_name:
+        issues.append('company name is missing')
+    elif not _LEGAL_FORM.search(metadata.company_name):
+        issues.append('company name has no legal form')
+    if metadata.reporting_year is None:
+        issues.append('reporting year is missing')
+    if metadata.reporting_date and metadata.reporting_year and metadata.reporting_date.year != metadata.reporting_year:
+        issues.append('reporting date and reporting year disagree')
+    if metadata.reporting_date and metadata.call_date and metadata.call_date < metadata.reporting_date:
+        issues.append('call date precedes the reporting date')
+    if not metadata.tags:
+        issues.append('tags are empty')
+    return issues
@@ -1,60 +1,130 @@
+from functools import partial
 from uuid import UUID
 
+from langchain_core.messages import AIMessage
 from langgraph.constants import START
 from langgraph.graph import StateGraph
-from langgraph.prebuilt import ToolNode, tools_condition
+from langgraph.graph.state import CompiledStateGraph
+from langgraph.prebuilt import ToolNode
 
+from agent.confidence import confidence_issues
 from agent.nodes import (
+    classify_document,
+    extraction_done,
+    fast_extractor,
     finalize_metadata,
     metadata_cleaner,
     metadata_extractor,
+    prefetch_chunks,
+    rule_extractor,
     tools,
     type_extractor,
 )
 from agent.schemas import ContextSchema, MetadataSchema
 from agent.state import State
+from core.config import get_settings
 
-builder = StateGraph(State, context_schema=ContextSchema, output_schema=MetadataSchema)
 
-builder.add_node('type_extractor', type_extractor)  # pyrefly: ignore[no-matching-overload]
-builder.add_node('metadata_extractor', metadata_extractor)  # pyrefly: ignore[no-matching-overload]
-builder.add_node('metadata_cleaner', metadata_cleaner)  # pyrefly: ignore[no-matching-overload]
-builder.add_node('finalize_metadata', finalize_metadata)  # pyrefly: ignore[no-matching-overload]
+def route_tools(state: State, messages_key: str = 'messages') -> str:
+    """Route to the tool node only when the last model turn requested tools.
 
-builder.add_node('tools_for_type', ToolNode(tools))
-builder.add_node('tools_for_metadata', ToolNode(tools))
-builder.add_node('tools_for_cleaner', ToolNode(tools))
+    Nodes stop requesting tools once their budget or the job deadline is spent, so the loop always
+    falls through to the next stage.
+    """
+    messages = state.get(messages_key) or []
+    if messages and isinstance(messages[-1], AIMessage) and messages[-1].tool_calls:
+        return 'tools'
+    return '__end__'
+
+
+def route_extraction(state: State) -> str:
+    """After extraction, run the requested tools, clean a low-confidence candidate, or finish."""
+    if route_tools(state) == 'tools':
+        return 'tools'
+    if get_settings().agent_cleaner_enabled and confidence_issues(state.get('metadata')):
+        return 'clean'
+    return '__end__'
+
+
+def build_graph() -> CompiledStateGraph:
+    """Build the default agent.
+
+    After prefetching the first chunks and the rule-based pre-extraction, classification and field
+    extraction run as parallel branches that are joined in `finalize_metadata`. The cleaner only runs
+    when the extracted candidate fails the confidence checks.
+    """
+    builder = StateGraph(State, context_schema=ContextSchema, output_schema=MetadataSchema)
+
+    builder.add_node('prefetch_chunks', prefetch_chunks)  # pyrefly: ignore[no-matching-overload]
+    builder.add_node('rule_extractor', rule_extractor)  # pyrefly: ignore[no-matching-overload]
+    builder.add_node('type_extractor', type_extractor)  # pyrefly: ignore[no-matching-overload]
+    builder.add_node('classify_document', classify_document)  # pyrefly: ignore[no-matching-overload]
+    builder.add_node('metadata_extractor', metadata_extractor)  # pyrefly: ignore[no-matching-overload]
+    builder.add_node('metadata_cleaner', metadata_cleaner)  # pyrefly: ignore[no-matching-overload]
+    builder.add_node('extraction_done', extraction_done)  # pyrefly: ignore[no-matching-overload]
+    builder.add_node('finalize_metadata', finalize_metadata)  # pyrefly: ignore[no-matching-overload]
+
+    builder.add_node('tools_for_type', ToolNode(tools, messages_key='type_messages'))
+    builder.add_node('tools_for_metadata', ToolNode(tools))
+    builder.add_node('tools_for_cleaner', ToolNode(tools))
+
+    builder.add_edge(START, 'prefetch_chunks')
+    builder.add_edge('prefetch_chunks', 'rule_extractor')
+
+    # Classification branch
+    builder.add_edge('rule_extractor', 'type_extractor')
+    builder.add_conditional_edges(
+        source='type_extractor',
+        path=partial(route_tools, messages_key='type_messages'),
+        path_map={'tools': 'tools_for_type', '__end__': 'classify_document'},
+    )
+    builder.add_edge('tools_for_type', 'type_extractor')
+
+    # Extraction branch
+    builder.add_edge('rule_extractor', 'metadata_extractor')
+    builder.add_conditional_edges(
+        source='metadata_extractor',
+        path=route_extraction,
+        path_map={
+            'tools': 'tools_for_metadata',
+            'clean': 'metadata_cleaner',
+            '__end__': 'extraction_done',
+        },
+    )
+    builder.add_edge('tools_for_metadata', 'metadata_extractor')
+
+    builder.add_conditional_edges(
+        source='metadata_cleaner',
+        path=route_tools,
+        path_map={
+            'tools': 'tools_for_cleaner',
+            '__end__': 'extraction_done',
+        },
+    )
+    builder.add_edge('tools_for_cleaner', 'metadata_cleaner')
+
+    builder.add_edge(['classify_document', 'extraction_done'], 'finalize_metadata')
+    builder.add_edge('finalize_metadata', '__end__')
+
+    return builder.compile()
+
+
+def build_fast_graph() -> CompiledStateGraph:
+    """Build the single-pass agent: one structured-output call over the first chunks."""
+    builder = StateGraph(State, context_schema=ContextSchema, output_schema=MetadataSchema)
+
+    builder.add_node('fast_extractor', fast_extractor)  # pyrefly: ignore[no-matching-overload]
+    builder.add_node('finalize_metadata', finalize_metadata)  # pyrefly: ignore[no-matching-overload]
+
+    builder.add_edge(START, 'fast_extractor')
+    builder.add_edge('fast_extractor', 'finalize_metadata')
+    builder.add_edge('finalize_metadata', '__end__')
+
+    return builder.compile()
 
-builder.add_edge(START, 'type_extractor')
-builder.add_conditional_edges(
-    source='type_extractor',
-    path=tools_condition,
-    path_map={'tools': 'tools_for_type', '__end__': 'metadata_extractor'},
-)
-builder.add_edge('tools_for_type', 'type_extractor')
-
-builder.add_conditional_edges(
-    source='metadata_extractor',
-    path=tools_condition,
-    path_map={
-        'tools': 'tools_for_metadata',
-        '__end__': 'finalize_metadata',
-    },
-)
-builder.add_edge('tools_for_metadata', 'metadata_extractor')
-
-builder.add_conditional_edges(
-    source='metadata_cleaner',
-    path=tools_condition,
-    path_map={
-        'tools': 'tools_for_cleaner',
-        '__end__': 'finalize_metadata',
-    },
-)
-builder.add_edge('tools_for_cleaner', 'metadata_cleaner')
-builder.add_edge('finalize_metadata', '__end__')
 
-graph = builder.compile()
+graph = build_graph()
+fast_graph = build_fast_graph()
 
 
 if __name__ == '__main__':
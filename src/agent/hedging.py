@@ -0,0 +1,158 @@
+"""Hedged chat model requests to cut tail latency.
+
+When a call is still running after the configured latency percentile of earlier calls, an identical
+second request is issued and whichever finishes first wins. A process-wide budget caps the fraction of
+calls that may be hedged, so cost grows by at most that fraction.
+"""
+
+from __future__ import annotations
+
+import contextvars
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeout
+from concurrent.futures import wait
+from typing import Any
+
+from langchain_core.runnables import Runnable
+
+from core.config import get_settings
+from core.metrics import create_counter
+
+logger = logging.getLogger(__name__)
+
+_WINDOW = 200
+
+_hedges = create_counter('metis.agent.hedged_calls', description='Hedged chat model calls by winning request.')
+
+
+class LatencyWindow:
+    """Rolling window of recent call latencies."""
+
+    def __init__(self, size: int = _WINDOW) -> None:
+        self._samples: deque[float] = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, secs: float) -> None:
+        with self._lock:
+            self._samples.append(secs)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, pct: float) -> float:
+        with self._lock:
+            ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+        return ordered[index]
+
+
+class Hedger:
+    """Invoke runnables with an optional hedged second request.
+
+    Latencies are tracked per bound runnable, since tool rounds and structured calls differ widely.
+    Sync HTTP requests cannot be aborted, so the losing request is cancelled if it has not started and
+    otherwise left to finish in the background with its result discarded.
+    """
+
+    def __init__(self, *, percentile: float, min_samples: int, max_fraction: float, max_workers: int) -> None:
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.max_fraction = max_fraction
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='llm-hedge')
+        self._windows: dict[int, LatencyWindow] = {}
+        self._lock = threading.Lock()
+        self._calls = 0
+        self._hedged = 0
+
+    def _window(self, runnable: Runnable) -> LatencyWindow:
+        with self._lock:
+            return self._windows.setdefault(id(runnable), LatencyWindow())
+
+    def _take_budget(self) -> bool:
+        with self._lock:
+            if self._hedged + 1 > self.max_fraction * self._calls:
+                return False
+            self._hedged += 1
+            return True
+
+    def _submit(
+        self, window: LatencyWindow, runnable: Runnable, messages: Any, kwargs: dict[str, Any]
+    ) -> tuple[Future, threading.Event]:
+        """Run the request on the executor; the returned event is set once it leaves the executor queue."""
+        started = threading.Event()
+
+        def timed() -> Any:
+            started.set()
+            start = time.perf_counter()
+            result = runnable.invoke(messages, **kwargs)
+            window.add(time.perf_counter() - start)
+            return result
+
+        # Each request runs in a copy of the caller's context so callbacks and tracing stay attached.
+        return self._executor.submit(contextvars.copy_context().run, timed), started
+
+    @staticmethod
+    def _invoke_direct(window: LatencyWindow, runnable: Runnable, messages: Any, kwargs: dict[str, Any]) -> Any:
+        start = time.perf_counter()
+        result = runnable.invoke(messages, **kwargs)
+        window.add(time.perf_counter() - start)
+        return result
+
+    def invoke(self, runnable: Runnable, messages: Any, **kwargs: Any) -> Any:
+        window = self._window(runnable)
+        with self._lock:
+            self._calls += 1
+        if len(window) < self.min_samples:
+            return self._invoke_direct(window, runnable, messages, kwargs)
+
+        delay = window.percentile(self.percentile)
+        primary, started = self._submit(window, runnable, messages, kwargs)
+        # Time queued behind other calls in the executor does not count towards the hedge delay. A request
+        # still queued after the delay (or the call timeout, if shorter) means losing requests occupy every
+        # worker; it is withdrawn and made directly rather than waiting an unbounded time for a slot.
+        timeout = kwargs.get('timeout')
+        if not started.wait(delay if timeout is None else min(delay, timeout)) and primary.cancel():
+            logger.debug('Hedge executor saturated; calling the model directly')
+            return self._invoke_direct(window, runnable, messages, kwargs)
+        try:
+            return primary.result(timeout=delay)
+        except FuturesTimeout:
+            pass
+        if not self._take_budget():
+            return primary.result()
+
+        hedge, _ = self._submit(window, runnable, messages, kwargs)
+        pending = {primary, hedge}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    for loser in pending:
+                        loser.cancel()
+                    _hedges.add(1, {'winner': 'primary' if future is primary else 'hedge'})
+                    return future.result()
+        # Both requests failed; surface the primary's error.
+        return primary.result()
+
+
+_hedger: Hedger | None = None
+
+
+def get_hedger() -> Hedger | None:
+    """Return the process-wide hedger, or None when hedging is disabled."""
+    global _hedger
+    settings = get_settings()
+    if not settings.agent_hedge_enabled:
+        return None
+    if _hedger is None:
+        _hedger = Hedger(
+            percentile=settings.agent_hedge_percentile,
+            min_samples=settings.agent_hedge_min_samples,
+            max_fraction=settings.agent_hedge_max_fraction,
+            max_workers=settings.agent_hedge_max_workers,
+        )
+    return _hedger
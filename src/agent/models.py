@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from functools import lru_cache
+
+from langchain.chat_models import init_chat_model
+from langchain_core.language_models import BaseChatModel
+from langchain_core.runnables import RunnableConfig
+
+from core.config import get_settings
+from core.http import get_async_http_client, get_http_client
+from core.metrics import create_counter
+
+from .cache import configure_llm_cache
+
+MODEL_KEY = 'model'
+
+_model_calls = create_counter(
+    'metis.agent.model_calls',
+    description='Chat model calls by node and routing tier (primary or escalation).',
+)
+_escalations = create_counter(
+    'metis.agent.model_escalations',
+    description='Calls escalated to the stronger model, by node and reason.',
+)
+
+
+@dataclass(frozen=True, slots=True)
+class ModelSettings:
+    """Chat model selection for a processing profile."""
+
+    name: str
+    temperature: float = 0
+
+
+@dataclass(frozen=True, slots=True)
+class ModelRoute:
+    """Cheap-first routing: run on `primary`, retry on `escalation` when the output is unusable."""
+
+    primary: ModelSettings
+    escalation: ModelSettings | None = None
+
+    def tier(self, escalated: bool) -> ModelSettings:
+        if escalated and self.escalation is not None:
+            return self.escalation
+        return self.primary
+
+
+def default_model_route() -> ModelRoute:
+    settings = get_settings()
+    escalation = ModelSettings(settings.agent_escalation_model) if settings.agent_escalation_model else None
+    return ModelRoute(primary=ModelSettings(settings.agent_model), escalation=escalation)
+
+
+def profile_model_route(profile: str) -> ModelRoute:
+    """Return the route of a processing profile: its `AGENT_PROFILE_*MODELS` overrides, else the default."""
+    settings = get_settings()
+    primary = settings.agent_profile_models.get(profile, settings.agent_model)
+    escalation = settings.agent_profile_escalation_models.get(profile, settings.agent_escalation_model)
+    return ModelRoute(primary=ModelSettings(primary), escalation=ModelSettings(escalation) if escalation else None)
+
+
+def model_route(config: RunnableConfig | None) -> ModelRoute:
+    """Return the model route carried in the runnable config, falling back to the default."""
+    value = ((config or {}).get('configurable') or {}).get(MODEL_KEY)
+    return value if isinstance(value, ModelRoute) else default_model_route()
+
+
+@lru_cache(maxsize=8)
+def chat_model(settings: ModelSettings) -> BaseChatModel:
+    """Build (once per settings) the chat model used by the agent nodes.
+
+    Deterministic (temperature 0) models answer repeated requests from the LLM response cache.
+    """
+    configure_llm_cache()
+    clients = {}
+    if settings.name.startswith('openai:'):
+        clients = {'http_client': get_http_client(), 'http_async_client': get_async_http_client()}
+    return init_chat_model(
+        model=settings.name,
+        temperature=settings.temperature,
+        cache=None if settings.temperature == 0 else False,
+        **clients,
+    )
+
+
+def record_model_call(node: str, *, escalated: bool = False) -> None:
+    _model_calls.add(1, {'node': node, 'tier': 'escalation' if escalated else 'primary'})
+
+
+def record_escalation(node: str, reason: str) -> None:
+    _escalations.add(1, {'node': node, 'reason': reason})
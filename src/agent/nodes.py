@@ -1,22 +1,79 @@
 from __future__ import annotations
 
+import logging
+from dataclasses import dataclass
+from functools import lru_cache
 from typing import Any, Dict
 
-from langchain.chat_models import init_chat_model
-from langchain_core.messages import AIMessage, BaseMessage, SystemMessage
+from langchain_core.messages import (
+    AIMessage,
+    BaseMessage,
+    HumanMessage,
+    SystemMessage,
+    ToolMessage,
+)
+from langchain_core.runnables import Runnable, RunnableConfig
+from openai import APITimeoutError
 from pydantic import ValidationError
 
-from .schemas import MetadataSchema
+from core.config import get_settings
+
+from .budget import call_timeout, deadline_passed, tool_rounds_exhausted
+from .confidence import confidence_issues
+from .hedging import get_hedger
+from .models import (
+    ModelSettings,
+    chat_model,
+    model_route,
+    record_escalation,
+    record_model_call,
+)
+from .rules import extract_structured_fields, filled_fields, lock_prefilled
+from .schemas import ContextSchema, MetadataSchema
 from .state import State
-from .tools import first_chunks, retriever, search_tool
+from .tools import (
+    document_digest,
+    fetch_first_chunks,
+    first_chunks,
+    retriever,
+    search_tool,
+)
 
-_base_model = init_chat_model(model='openai:gpt-5-mini', temperature=0)
-tools = [retriever, first_chunks, search_tool]
+logger = logging.getLogger(__name__)
+settings = get_settings()
 
-model_with_tools = _base_model.bind_tools(tools)
-structured_metadata_model = _base_model.with_structured_output(MetadataSchema)
+tools = [document_digest, retriever, first_chunks, search_tool]
 
 _EMPTY_METADATA = MetadataSchema()
+DOCUMENT_TYPES = ('Annual Report', 'Management Report', 'Balance Sheet', 'Commercial Register Extract', 'Other')
+DOCUMENT_TYPE_CHOICES = ', '.join(DOCUMENT_TYPES[:-1]) + ', or ' + DOCUMENT_TYPES[-1]
+_PREFETCH_CALL_ID = 'prefetch-first-chunks'
+
+
+@dataclass(frozen=True, slots=True)
+class _BoundModels:
+    with_tools: Runnable
+    # Keeps the tool schemas (the history references them) but forbids further calls once a budget is spent.
+    without_tool_calls: Runnable
+    structured: Runnable
+
+
+@lru_cache(maxsize=8)
+def _bind_models(model: ModelSettings) -> _BoundModels:
+    base = chat_model(model)
+    return _BoundModels(
+        with_tools=base.bind_tools(tools),
+        without_tool_calls=base.bind_tools(tools, tool_choice='none'),
+        structured=base.with_structured_output(MetadataSchema),
+    )
+
+
+def _models(config: RunnableConfig, *, escalated: bool = False) -> _BoundModels:
+    return _bind_models(model_route(config).tier(escalated))
+
+
+def _can_escalate(config: RunnableConfig) -> bool:
+    return model_route(config).escalation is not None and not deadline_passed(config)
 
 
 def _metadata_fields(remove: list | None) -> str:
@@ -26,9 +83,31 @@ def _metadata_fields(remove: list | None) -> str:
     return ', '.join(fields)
 
 
-def _history(state: State) -> list[BaseMessage]:
+def _history(state: State, key: str = 'messages') -> list[BaseMessage]:
     """Return a copy of the conversation history list."""
-    return list(state.get('messages', []))
+    return list(state.get(key) or [])
+
+
+def _seeded_chunks(text: str, k: int) -> list[BaseMessage]:
+    """Present prefetched chunks as an already answered `first_chunks` tool call."""
+    call = {'name': 'first_chunks', 'args': {'k': k, 'skip': 0}, 'id': _PREFETCH_CALL_ID}
+    return [
+        AIMessage(content='', tool_calls=[call]),
+        ToolMessage(content=text, name='first_chunks', tool_call_id=_PREFETCH_CALL_ID),
+    ]
+
+
+def parse_document_type(answer: str) -> str | None:
+    """Return the known document type mentioned first in the classifier's answer."""
+    lowered = answer.lower()
+    found = [(lowered.find(doc_type.lower()), doc_type) for doc_type in DOCUMENT_TYPES if doc_type.lower() in lowered]
+    return min(found)[1] if found else None
+
+
+def _prefilled_note(prefilled: MetadataSchema | None) -> str:
+    if prefilled is None or not filled_fields(prefilled):
+        return ''
+    return f' These fields are already known and must not be changed: {prefilled.model_dump_json(exclude_none=True)}.'
 
 
 def _metadata_message(metadata: MetadataSchema) -> AIMessage:
@@ -36,39 +115,172 @@ def _metadata_message(metadata: MetadataSchema) -> AIMessage:
     return AIMessage(content=metadata.model_dump_json(indent=2))
 
 
-def type_extractor(state: State) -> Dict[str, Any]:
+def _invoke(runnable: Runnable, messages: list[BaseMessage], config: RunnableConfig) -> Any:
+    """Invoke a model with a timeout clamped to the job deadline, hedging slow calls when enabled."""
+    timeout = call_timeout(config, settings.agent_llm_timeout_secs)
+    hedger = get_hedger()
+    if hedger is None:
+        return runnable.invoke(messages, timeout=timeout)
+    return hedger.invoke(runnable, messages, timeout=timeout)
+
+
+def _tool_model(state: State, node: str, config: RunnableConfig) -> Runnable:
+    if tool_rounds_exhausted(state, node):
+        logger.info('Tool budget exhausted for %s; answering without tools', node)
+        return _models(config).without_tool_calls
+    return _models(config).with_tools
+
+
+def _structured_metadata(
+    node: str, messages: list[BaseMessage], config: RunnableConfig, *, escalated: bool = False
+) -> MetadataSchema | None:
+    """Run the structured-output call, retrying once on the escalation model when validation fails.
+
+    Returns None when no tier produced valid metadata; timeouts propagate to the caller.
+    """
+    try:
+        record_model_call(node, escalated=escalated)
+        return MetadataSchema.model_validate(_invoke(_models(config, escalated=escalated).structured, messages, config))
+    except ValidationError:
+        if escalated or not _can_escalate(config):
+            return None
+
+    logger.info('Structured output of %s failed validation; escalating', node)
+    record_escalation(node, 'validation')
+    return _structured_metadata(node, messages, config, escalated=True)
+
+
+def _tool_round_update(node: str, result: BaseMessage, key: str = 'messages') -> Dict[str, Any]:
+    update: Dict[str, Any] = {key: [result]}
+    if getattr(result, 'tool_calls', None):
+        update['tool_rounds'] = {node: 1}
+    return update
+
+
+def first_chunks_state(text: str) -> Dict[str, Any]:
+    """State that seeds prefetched chunks into both branches as an answered `first_chunks` tool call."""
+    if not text:
+        return {'first_chunks': ''}
+    k = settings.agent_prefetch_chunk_count
+    return {
+        'first_chunks': text,
+        'messages': _seeded_chunks(text, k),
+        'type_messages': _seeded_chunks(text, k),
+    }
+
+
+def prefetch_chunks(state: State, config: RunnableConfig) -> Dict[str, Any]:
+    """Fetch the first chunks once, unless the worker already seeded them into the initial state."""
+    if state.get('first_chunks') is not None or deadline_passed(config):
+        return {}
+
+    context = ContextSchema.model_validate(config['configurable'])
+    document = fetch_first_chunks(
+        context,
+        k=settings.agent_prefetch_chunk_count,
+        timeout_secs=call_timeout(config, settings.agent_tool_timeout_secs),
+    )
+    return first_chunks_state(document.page_content)
+
+
+def rule_extractor(state: State) -> Dict[str, Any]:
+    """Pre-fill rigidly formatted fields from the prefetched chunks before any LLM call."""
+    prefilled = extract_structured_fields(state.get('first_chunks') or '')
+    fields = filled_fields(prefilled)
+    if not fields:
+        return {}
+
+    logger.info('Rule-based extraction prefilled fields: %s', ', '.join(fields))
+    return {'prefilled': prefilled, 'metadata': prefilled}
+
+
+def type_extractor(state: State, config: RunnableConfig) -> Dict[str, Any]:
+    if deadline_passed(config):
+        logger.warning('Job deadline passed; skipping document classification')
+        return {}
+    if state.get('document_type'):
+        # Seeded by batch classification.
+        return {}
+
     sys_msg = SystemMessage(
         content=(
-            'You are an expert document classifier. Retrieve and analyse the first document chunks '
-            'and their metadata to classify the document (Annual Report, Management Report, Balance Sheet, '
-            'Commercial Register Extract, or Other). Start by retrieving a few chunks; if that is insufficient, '
-            'retrieve more chunks and skipping already received chunks.'
+            'You are an expert document classifier. Analyse the first document chunks and their metadata '
+            f'to classify the document ({DOCUMENT_TYPE_CHOICES}). The first chunks may already be provided; if they '
+            'are missing or insufficient, call the document digest tool once instead of paging through chunks. '
+            'Answer with the document type only.'
         )
     )
-    history = _history(state)
-    result = model_with_tools.invoke([sys_msg] + history)
-    return {'messages': [result]}
+    history = _history(state, 'type_messages')
+    try:
+        record_model_call('type_extractor')
+        result = _invoke(_tool_model(state, 'type_extractor', config), [sys_msg] + history, config)
+    except APITimeoutError:
+        logger.warning('Document classification timed out; continuing without a document type')
+        return {}
+    return _tool_round_update('type_extractor', result, key='type_messages')
+
+
+def classify_document(state: State, config: RunnableConfig) -> Dict[str, Any]:
+    """Read the document type from the classifier's final answer.
 
+    An answer that names no known type is asked once more of the escalation model.
+    """
+    history = _history(state, 'type_messages')
+    answer = next((m for m in reversed(history) if isinstance(m, AIMessage) and not m.tool_calls), None)
+    if answer is None:
+        return {}
+
+    document_type = parse_document_type(str(answer.content))
+    if document_type is not None or not _can_escalate(config):
+        return {'document_type': document_type}
+
+    record_escalation('classify_document', 'unparsable')
+    sys_msg = SystemMessage(
+        content=f'Classify the document as exactly one of: {DOCUMENT_TYPE_CHOICES}. Answer with the document type only.'
+    )
+    try:
+        record_model_call('classify_document', escalated=True)
+        result = _invoke(_models(config, escalated=True).without_tool_calls, [sys_msg] + history, config)
+    except APITimeoutError:
+        logger.warning('Escalated document classification timed out')
+        return {'document_type': None}
+    return {'document_type': parse_document_type(str(result.content))}
+
+
+def metadata_extractor(state: State, config: RunnableConfig) -> Dict[str, Any]:
+    if deadline_passed(config):
+        logger.warning('Job deadline passed; finalising with the metadata collected so far')
+        return {}
 
-def metadata_extractor(state: State) -> Dict[str, Any]:
     history = _history(state)
     extraction_prompt = SystemMessage(
         content=(
             'You are an expert metadata extractor. Retrieve the most relevant document chunks and extract the following metadata fields: '
-            + _metadata_fields(remove=['document_type'])
-            + '. Ensure correct identification of the company name, even if it was renamed. '
+            + _metadata_fields(remove=['document_type', *filled_fields(state.get('prefilled'))])
+            + '.'
+            + _prefilled_note(state.get('prefilled'))
+            + ' Start with the document digest tool, which returns the passages most likely to hold these fields '
+            'in one call. Ensure correct identification of the company name, even if it was renamed. '
             'When uncertain about a field, use the search tool to validate or improve accuracy. '
             'If uncertainty remains, retrieve up to two additional rounds of chunks to refine extraction. '
             'Create concise, meaningful tags.'
         )
     )
 
-    tool_result = model_with_tools.invoke([extraction_prompt] + history)
-    update: Dict[str, Any] = {'messages': [tool_result]}
-
-    if getattr(tool_result, 'tool_calls', None):
-        # Still need to execute tools; do not attempt to parse yet.
-        return update
+    update: Dict[str, Any] = {'messages': []}
+    followup: list[BaseMessage] = []
+    if not tool_rounds_exhausted(state, 'metadata_extractor'):
+        try:
+            record_model_call('metadata_extractor')
+            tool_result = _invoke(_models(config).with_tools, [extraction_prompt] + history, config)
+        except APITimeoutError:
+            logger.warning('Metadata tool round timed out; extracting from the context gathered so far')
+        else:
+            update = _tool_round_update('metadata_extractor', tool_result)
+            if getattr(tool_result, 'tool_calls', None):
+                # Still need to execute tools; do not attempt to parse yet.
+                return update
+            followup = [tool_result]
 
     structured_prompt = SystemMessage(
         content=(
@@ -82,34 +294,56 @@ def metadata_extractor(state: State) -> Dict[str, Any]:
     )
 
     try:
-        result = structured_metadata_model.invoke([structured_prompt, *history, tool_result])
-        metadata: MetadataSchema = MetadataSchema.model_validate(result)
-    except ValidationError:
-        metadata = _EMPTY_METADATA
+        metadata = _structured_metadata('metadata_extractor', [structured_prompt, *history, *followup], config)
+    except APITimeoutError:
+        logger.warning('Structured metadata extraction timed out; keeping the current metadata')
+        return update
 
-    update.setdefault('messages', []).append(_metadata_message(metadata))
+    metadata = lock_prefilled(metadata or _EMPTY_METADATA, state.get('prefilled'))
+
+    update['messages'].append(_metadata_message(metadata))
     update['metadata'] = metadata
     return update
 
 
-def metadata_cleaner(state: State) -> Dict[str, Any]:
+def metadata_cleaner(state: State, config: RunnableConfig) -> Dict[str, Any]:
+    if deadline_passed(config):
+        logger.warning('Job deadline passed; skipping metadata cleaning')
+        return {}
+
     history = _history(state)
     current_metadata = state.get('metadata') or _EMPTY_METADATA
+    # The cleaner only runs for candidates that failed the confidence checks, so it uses the stronger model.
+    escalated = _can_escalate(config)
+    if escalated and not (state.get('tool_rounds') or {}).get('metadata_cleaner'):
+        record_escalation('metadata_cleaner', 'confidence')
     metadata_context = AIMessage(content='Current metadata candidate:\n' + current_metadata.model_dump_json(indent=2))
 
     cleaner_prompt = SystemMessage(
         content=(
             'You are an expert metadata cleaner. Review the existing metadata and the available context. '
             'You may retrieve additional document chunks or use the search tool when you are uncertain about a field. '
-            'Ensure company names are the legal names.'
+            'Ensure company names are the legal names. Focus on these issues: '
+            + '; '.join(confidence_issues(current_metadata) or ['none'])
+            + '.'
         )
     )
 
-    tool_result = model_with_tools.invoke([cleaner_prompt, *history, metadata_context])
-    update: Dict[str, Any] = {'messages': [tool_result]}
-
-    if getattr(tool_result, 'tool_calls', None):
-        return update
+    update: Dict[str, Any] = {'messages': []}
+    followup: list[BaseMessage] = []
+    if not tool_rounds_exhausted(state, 'metadata_cleaner'):
+        try:
+            record_model_call('metadata_cleaner', escalated=escalated)
+            tool_result = _invoke(
+                _models(config, escalated=escalated).with_tools, [cleaner_prompt, *history, metadata_context], config
+            )
+        except APITimeoutError:
+            logger.warning('Metadata cleaner tool round timed out; cleaning with the context gathered so far')
+        else:
+            update = _tool_round_update('metadata_cleaner', tool_result)
+            if getattr(tool_result, 'tool_calls', None):
+                return update
+            followup = [tool_result]
 
     structured_prompt = SystemMessage(
         content=(
@@ -119,17 +353,70 @@ def metadata_cleaner(state: State) -> Dict[str, Any]:
     )
 
     try:
-        result = structured_metadata_model.invoke([structured_prompt, *history, metadata_context, tool_result])
-        metadata = MetadataSchema.model_validate(result)
-    except ValidationError:
-        metadata = current_metadata
+        metadata = _structured_metadata(
+            'metadata_cleaner', [structured_prompt, *history, metadata_context, *followup], config, escalated=escalated
+        )
+    except APITimeoutError:
+        logger.warning('Metadata cleaning timed out; keeping the current metadata')
+        return update
+
+    metadata = lock_prefilled(metadata or current_metadata, state.get('prefilled'))
 
-    update.setdefault('messages', []).append(_metadata_message(metadata))
+    update['messages'].append(_metadata_message(metadata))
     update['metadata'] = metadata
     return update
 
 
+def fast_extractor(state: State, config: RunnableConfig) -> Dict[str, Any]:
+    """Classify and extract in a single structured-output call over the first document chunks."""
+    if deadline_passed(config):
+        logger.warning('Job deadline passed; skipping fast extraction')
+        return {}
+
+    context = ContextSchema.model_validate(config['configurable'])
+    document = fetch_first_chunks(
+        context,
+        k=settings.agent_fast_chunk_count,
+        timeout_secs=call_timeout(config, settings.agent_tool_timeout_secs),
+    )
+    prefilled = extract_structured_fields(document.page_content)
+    prompt = SystemMessage(
+        content=(
+            'You are an expert document classifier and metadata extractor. Using only the document excerpt, '
+            f'classify the document ({DOCUMENT_TYPE_CHOICES}) and extract the following metadata fields: '
+            + _metadata_fields(remove=['document_type', *filled_fields(prefilled)])
+            + '.'
+            + _prefilled_note(prefilled)
+            + ' Respond with JSON matching the metadata schema precisely and use null for missing fields. '
+            'Create concise, meaningful tags using the fewest possible words in lowercase.'
+        )
+    )
+    excerpt = HumanMessage(content=document.page_content)
+
+    try:
+        metadata = _structured_metadata('fast_extractor', [prompt, excerpt], config) or _EMPTY_METADATA
+        metadata = lock_prefilled(metadata, prefilled)
+        # The fast profile has no cleaner, so a low-confidence candidate is re-extracted on the stronger model.
+        if confidence_issues(metadata) and _can_escalate(config):
+            record_escalation('fast_extractor', 'confidence')
+            escalated = _structured_metadata('fast_extractor', [prompt, excerpt], config, escalated=True)
+            if escalated is not None:
+                metadata = lock_prefilled(escalated, prefilled)
+    except APITimeoutError:
+        logger.warning('Fast extraction timed out; finalising with the rule-based fields')
+        return {'metadata': prefilled}
+    return {'messages': [_metadata_message(metadata)], 'metadata': metadata}
+
+
+def extraction_done(state: State) -> Dict[str, Any]:
+    """Join point of the extraction branch; `finalize_metadata` waits for it and `classify_document`."""
+    return {}
+
+
 def finalize_metadata(state: State) -> Dict[str, Any]:
     metadata = state.get('metadata') or _EMPTY_METADATA
+    document_type = state.get('document_type')
+    if document_type:
+        metadata = metadata.model_copy(update={'document_type': document_type})
     metadata_dict = metadata.model_dump()
     return {'metadata': metadata, **metadata_dict}
@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+from langgraph.graph.state import CompiledStateGraph
+
+from .graph import fast_graph, graph
+from .models import ModelRoute, profile_model_route
+
+DEFAULT_PROFILE = 'default'
+
+
+class UnknownProfileError(LookupError):
+    """Raised when a job references a processing profile that is not registered."""
+
+
+@dataclass(frozen=True, slots=True)
+class AgentProfile:
+    """Processing profile: the compiled graph and the model route (primary and escalation) used for a job."""
+
+    name: str
+    graph: CompiledStateGraph
+    models: ModelRoute
+
+
+_registry: dict[str, AgentProfile] = {}
+
+
+def register_profile(profile: AgentProfile) -> None:
+    _registry[profile.name] = profile
+
+
+def get_profile(name: str) -> AgentProfile:
+    try:
+        return _registry[name]
+    except KeyError:
+        raise UnknownProfileError(f'Unknown processing profile: {name!r}') from None
+
+
+def profile_names() -> list[str]:
+    return sorted(_registry)
+
+
+register_profile(AgentProfile(name=DEFAULT_PROFILE, graph=graph, models=profile_model_route(DEFAULT_PROFILE)))
+register_profile(AgentProfile(name='fast', graph=fast_graph, models=profile_model_route('fast')))
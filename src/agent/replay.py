@@ -0,0 +1,182 @@
+"""Record/replay of the agent's external calls for offline benchmarking.
+
+Chat model calls are intercepted through LangChain's global LLM cache; the first-chunk and digest SQL
+queries, the vector-store retriever and the Tavily search are intercepted at the tool boundary.
+Recorded responses live in one JSON cassette per document, keyed by a hash of the normalised request.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+from collections import defaultdict
+from collections.abc import Iterator, Sequence
+from contextlib import ExitStack, contextmanager
+from hashlib import sha256
+from pathlib import Path
+from typing import Any, Callable, Literal
+from unittest import mock
+
+from langchain_core.caches import BaseCache
+from langchain_core.documents import Document
+from langchain_core.globals import get_llm_cache, set_llm_cache
+from langchain_core.outputs import Generation
+
+from .cache import (
+    configure_llm_cache,
+    dump_generations,
+    json_default,
+    llm_request_key,
+    load_generations,
+)
+
+logger = logging.getLogger(__name__)
+
+Mode = Literal['record', 'replay']
+
+
+class CassetteMiss(LookupError):
+    """Raised in replay mode when a request was never recorded."""
+
+
+def request_key(kind: str, payload: Any) -> str:
+    return sha256(f'{kind}\n{json.dumps(payload, sort_keys=True, default=json_default)}'.encode()).hexdigest()
+
+
+class Cassette:
+    """Recorded responses of one agent run, stored as `{kind: {key: [response, ...]}}`.
+
+    Identical requests made repeatedly are replayed in recording order; the last response is reused
+    once they run out.
+    """
+
+    def __init__(self, path: Path, mode: Mode) -> None:
+        self.path = path
+        self.mode = mode
+        self._entries: dict[str, dict[str, list[Any]]] = defaultdict(dict)
+        self._cursors: dict[tuple[str, str], int] = defaultdict(int)
+        if mode == 'replay':
+            if not path.exists():
+                raise FileNotFoundError(f'No cassette recorded at {path}')
+            for kind, entries in json.loads(path.read_text()).items():
+                self._entries[kind] = entries
+
+    def lookup(self, kind: str, key: str) -> Any:
+        responses = self._entries[kind].get(key)
+        if not responses:
+            raise CassetteMiss(f'{kind} request {key[:12]} is not recorded in {self.path}')
+        index = min(self._cursors[kind, key], len(responses) - 1)
+        self._cursors[kind, key] += 1
+        return responses[index]
+
+    def record(self, kind: str, key: str, response: Any) -> None:
+        self._entries[kind].setdefault(key, []).append(response)
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.write_text(json.dumps(self._entries, indent=1, sort_keys=True, default=json_default))
+
+    def call(self, kind: str, payload: Any, fn: Callable[[], Any], *, dump: Callable, load: Callable) -> Any:
+        """Return the recorded response for `payload`, or call `fn` and record its result."""
+        key = request_key(kind, payload)
+        if self.mode == 'replay':
+            return load(self.lookup(kind, key))
+        result = fn()
+        self.record(kind, key, dump(result))
+        return result
+
+
+class CassetteLLMCache(BaseCache):
+    """LLM cache backed by a cassette; a miss raises in replay mode instead of calling the provider."""
+
+    def __init__(self, cassette: Cassette) -> None:
+        self.cassette = cassette
+
+    def lookup(self, prompt: str, llm_string: str) -> Sequence[Generation] | None:
+        if self.cassette.mode == 'record':
+            return None
+        return load_generations(self.cassette.lookup('llm', llm_request_key(prompt, llm_string)))
+
+    def update(self, prompt: str, llm_string: str, return_val: Sequence[Generation]) -> None:
+        if self.cassette.mode == 'record':
+            self.cassette.record('llm', llm_request_key(prompt, llm_string), dump_generations(return_val))
+
+    def clear(self, **kwargs: Any) -> None:
+        return None
+
+
+def _dump_document(document: Document) -> dict[str, Any]:
+    return {'page_content': document.page_content, 'metadata': document.metadata}
+
+
+def _load_document(data: dict[str, Any]) -> Document:
+    return Document(**data)
+
+
+def _identity(value: Any) -> Any:
+    return value
+
+
+@contextmanager
+def cassette_calls(cassette: Cassette) -> Iterator[Cassette]:
+    """Route the agent's chat model, SQL, vector-store and web-search calls through `cassette`."""
+    from . import nodes, tools
+
+    fetch_first_chunks = tools.fetch_first_chunks
+    fetch_document_digest = tools.fetch_document_digest
+    retrieve = tools.retriever.func
+    fetch_web_search = tools.fetch_web_search
+
+    def recorded_first_chunks(context, *, k, skip=0, timeout_secs):
+        return cassette.call(
+            'first_chunks',
+            {'digest': context.digest, 'collection': context.collection_name, 'k': k, 'skip': skip},
+            lambda: fetch_first_chunks(context, k=k, skip=skip, timeout_secs=timeout_secs),
+            dump=_dump_document,
+            load=_load_document,
+        )
+
+    def recorded_digest(context, *, k, head, timeout_secs):
+        return cassette.call(
+            'document_digest',
+            {'digest': context.digest, 'collection': context.collection_name, 'k': k, 'head': head},
+            lambda: fetch_document_digest(context, k=k, head=head, timeout_secs=timeout_secs),
+            dump=_dump_document,
+            load=_load_document,
+        )
+
+    def recorded_retriever(query, config, **kwargs):
+        return cassette.call(
+            'retriever',
+            {'query': query, 'digest': config['configurable'].get('digest'), 'kwargs': kwargs},
+            lambda: retrieve(query, config, **kwargs),
+            dump=_dump_document,
+            load=_load_document,
+        )
+
+    def recorded_search(query, *, max_results, topic, timeout_secs):
+        return cassette.call(
+            'search',
+            {'query': query, 'max_results': max_results, 'topic': topic},
+            lambda: fetch_web_search(query, max_results=max_results, topic=topic, timeout_secs=timeout_secs),
+            dump=_identity,
+            load=_identity,
+        )
+
+    # Install the response cache first so a lazily configured one cannot replace the cassette mid-run.
+    configure_llm_cache()
+    previous_cache = get_llm_cache()
+    set_llm_cache(CassetteLLMCache(cassette))
+    try:
+        with ExitStack() as stack:
+            stack.enter_context(mock.patch.object(tools, 'fetch_first_chunks', recorded_first_chunks))
+            stack.enter_context(mock.patch.object(nodes, 'fetch_first_chunks', recorded_first_chunks))
+            stack.enter_context(mock.patch.object(tools, 'fetch_document_digest', recorded_digest))
+            stack.enter_context(mock.patch.object(tools.retriever, 'func', recorded_retriever))
+            stack.enter_context(mock.patch.object(tools, 'fetch_web_search', recorded_search))
+            yield cassette
+    finally:
+        set_llm_cache(previous_cache)
+        if cassette.mode == 'record':
+            cassette.save()
+            logger.info('Recorded cassette %s', cassette.path)
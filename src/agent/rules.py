@@ -0,0 +1,118 @@
+"""Deterministic extraction of rigidly formatted fields from German filings."""
+
+from __future__ import annotations
+
+import datetime
+import re
+from typing import Iterable, TypeVar
+
+from .schemas import MetadataSchema
+
+T = TypeVar('T')
+
+_MONTHS = {
+    'januar': 1,
+    'jänner': 1,
+    'februar': 2,
+    'märz': 3,
+    'maerz': 3,
+    'april': 4,
+    'mai': 5,
+    'juni': 6,
+    'juli': 7,
+    'august': 8,
+    'september': 9,
+    'oktober': 10,
+    'november': 11,
+    'dezember': 12,
+}
+
+_DATE = (
+    r'(?:(?P<day>\d{1,2})\.\s?(?P<month>\d{1,2})\.\s?(?P<year>\d{4})'
+    r'|(?P<tday>\d{1,2})\.\s*(?P<tmonth>' + '|'.join(_MONTHS) + r')\s+(?P<tyear>\d{4}))'
+)
+_REPORTING_DATE = re.compile(
+    r'(?:Bilanz|Jahresabschluss|Konzernabschluss|Abschluss|Lagebericht|Geschäftsjahr)[^\n]{0,60}?\b(?:zum|bis)\s+'
+    + _DATE,
+    re.IGNORECASE,
+)
+_FISCAL_YEAR = re.compile(r'\bGeschäftsjahr(?:es)?\s+(?P<year>\d{4})\b(?!\s*/)', re.IGNORECASE)
+_REGISTER_NUMBER = re.compile(r'\b(?P<kind>HR[AB])\s*(?:Nr\.?\s*)?(?P<number>\d{1,6})(?:\s+(?P<suffix>B|HB)\b)?')
+_COURT = re.compile(
+    r'\bAmtsgerichts?\s+(?P<court>[A-ZÄÖÜ][\w\-äöüß]+(?:\s+(?:am|an der|im|in der|i\.)\s*[A-ZÄÖÜ][\w\-äöüß]+)?)'
+)
+_COURT_WINDOW = 150
+
+
+def _unique(values: Iterable[T]) -> T | None:
+    """Return the single distinct value, or None when absent or ambiguous."""
+    distinct = set(values)
+    return distinct.pop() if len(distinct) == 1 else None
+
+
+def _parse_date(match: re.Match[str]) -> datetime.date | None:
+    if match['year']:
+        day, month, year = int(match['day']), int(match['month']), int(match['year'])
+    else:
+        day, month, year = int(match['tday']), _MONTHS[match['tmonth'].lower()], int(match['tyear'])
+    if not 1900 <= year <= 2100:
+        return None
+    try:
+        return datetime.date(year, month, day)
+    except ValueError:
+        return None
+
+
+def _reporting_date(text: str) -> datetime.date | None:
+    dates = (_parse_date(match) for match in _REPORTING_DATE.finditer(text))
+    return _unique(date for date in dates if date is not None)
+
+
+def _reporting_year(text: str, reporting_date: datetime.date | None) -> int | None:
+    if reporting_date is not None:
+        return reporting_date.year
+    return _unique(int(match['year']) for match in _FISCAL_YEAR.finditer(text))
+
+
+def _register(text: str) -> tuple[str | None, str | None]:
+    """Return (company_register, register_number) when the register entry is unambiguous."""
+    matches = list(_REGISTER_NUMBER.finditer(text))
+    number = _unique(' '.join(filter(None, (m['kind'], m['number'], m['suffix']))) for m in matches)
+    if number is None:
+        return None, None
+
+    courts = []
+    for match in matches:
+        window = text[max(match.start() - _COURT_WINDOW, 0) : match.end() + _COURT_WINDOW]
+        courts.extend(f'Amtsgericht {court["court"]}' for court in _COURT.finditer(window))
+    return _unique(courts), number
+
+
+def extract_structured_fields(text: str) -> MetadataSchema:
+    """Extract register and reporting fields that follow fixed patterns.
+
+    Only fields with exactly one distinct candidate in the text are filled; everything else is left
+    to the LLM.
+    """
+    reporting_date = _reporting_date(text)
+    company_register, register_number = _register(text)
+    return MetadataSchema(
+        reporting_date=reporting_date,
+        reporting_year=_reporting_year(text, reporting_date),
+        company_register=company_register,
+        register_number=register_number,
+    )
+
+
+def filled_fields(metadata: MetadataSchema | None) -> list[str]:
+    if metadata is None:
+        return []
+    return list(metadata.model_dump(exclude_none=True))
+
+
+def lock_prefilled(metadata: MetadataSchema, prefilled: MetadataSchema | None) -> MetadataSchema:
+    """Overwrite `metadata` with every field the rule stage filled, like job-level locked fields."""
+    if prefilled is None:
+        return metadata
+    locked = prefilled.model_dump(exclude_none=True)
+    return metadata.model_copy(update=locked) if locked else metadata
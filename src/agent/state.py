@@ -10,8 +10,25 @@ def _prefer_metadata(current: MetadataSchema | None, value: MetadataSchema | Non
     return value or current
 
 
+def _add_counts(current: dict[str, int] | None, value: dict[str, int] | None) -> dict[str, int]:
+    """Reducer that sums per-node counters."""
+    merged = dict(current or {})
+    for key, count in (value or {}).items():
+        merged[key] = merged.get(key, 0) + count
+    return merged
+
+
 class State(TypedDict, total=False):
-    """Graph state tracking conversation history and metadata extraction."""
+    """Graph state tracking conversation history and metadata extraction.
+
+    Classification (`type_messages`) and field extraction (`messages`) run as parallel branches and keep
+    separate transcripts so their tool calls never interleave.
+    """
 
     messages: Annotated[list[AnyMessage], add_messages]
+    type_messages: Annotated[list[AnyMessage], add_messages]
     metadata: Annotated[MetadataSchema | None, _prefer_metadata]
+    document_type: str | None
+    tool_rounds: Annotated[dict[str, int], _add_counts]
+    first_chunks: str | None
+    prefilled: MetadataSchema | None
@@ -1,32 +1,22 @@
+from typing import Any
+
 from langchain_core.documents import Document
 from langchain_core.runnables import RunnableConfig
 from langchain_core.tools import tool
-from langchain_tavily import TavilySearch
 from psycopg2.extras import RealDictCursor
 
 from core.config import get_settings
+from core.http import get_http_client
 from utils.vstore import get_collection_uuid, get_vectorstore, pg_connect
 
+from .budget import call_timeout
 from .schemas import ContextSchema
 
 settings = get_settings()
 
 
-@tool('first_chunks')
-def first_chunks(
-    config: RunnableConfig,
-    k: int = 3,
-    skip: int = 0,
-) -> Document:
-    """Fetch the next `k` chunks for the current digest via SQL, ordered by chunk id and return as a single document.
-
-    :param config: Runnable configuration that carries digest context.
-    :param k: Number of chunks to return.
-    :param skip: Number of matching chunks to skip before returning results.
-
-    """
-
-    context = ContextSchema.model_validate(config['configurable'])
+def fetch_first_chunks(context: ContextSchema, *, k: int, skip: int = 0, timeout_secs: float) -> Document:
+    """Fetch `k` chunks for the context digest ordered by chunk id, joined into a single document."""
     if not context.digest or not context.collection_name:
         return Document(page_content='')
 
@@ -35,7 +25,10 @@ def first_chunks(
     if limit == 0:
         return Document(page_content='')
 
+    timeout_ms = int(timeout_secs * 1000)
     with pg_connect(tenant_id=context.tenant_id) as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT set_config('statement_timeout', %s, true)", (str(timeout_ms),))
         collection_uuid = get_collection_uuid(conn, context.collection_name)
         with conn.cursor(cursor_factory=RealDictCursor) as cur:
             cur.execute(
@@ -51,6 +44,9 @@ def first_chunks(
             )
             rows = cur.fetchall()
 
+    if not rows:
+        return Document(page_content='')
+
     # Map rows to LangChain Document objects
     return Document(
         page_content='\n\n'.join([row['document'] for row in rows]),
@@ -58,6 +54,125 @@ def first_chunks(
     )
 
 
+# PostgreSQL regular expressions (case-insensitive) for passages that carry the metadata we extract:
+# register entries, reporting period, balance sheet date, legal forms and the auditor's report.
+DIGEST_SIGNALS = (
+    r'\mHR[AB]\s*\d',
+    r'Amtsgericht|Handelsregister|Registergericht',
+    r'Geschäftsjahr|Berichtsjahr|Wirtschaftsjahr',
+    r'(Bilanz|Jahresabschluss|Konzernabschluss) (zum|per)|Bilanzstichtag',
+    r'\m(GmbH|AG|SE|KG|KGaA|mbH|UG)\M',
+    r'Bestätigungsvermerk|Abschlussprüfer|Lagebericht',
+)
+
+
+def format_digest(rows: list[dict[str, Any]]) -> str:
+    """Join digest chunks in document order, labelled with their chunk ids."""
+    ordered = sorted(rows, key=lambda row: row['chunk_id'])
+    return '\n\n'.join(f'[chunk {row["chunk_id"]}]\n{row["document"]}' for row in ordered)
+
+
+# Chunks are written by the ingestion service, so the digest is ranked per call. The signal scan only
+# covers the chunks of one document, which the collection and digest filters narrow down first.
+_DIGEST_QUERY = """
+WITH chunks AS (
+    SELECT document, (cmetadata ->> 'chunk_id')::int AS chunk_id
+    FROM langchain_pg_embedding
+    WHERE collection_id = %(collection)s
+      AND cmetadata ->> 'digest' = %(digest)s
+), head AS (
+    SELECT document, chunk_id
+    FROM chunks
+    ORDER BY chunk_id
+    LIMIT %(head)s
+), ranked AS (
+    SELECT document,
+           chunk_id,
+           (SELECT count(*) FROM unnest(%(signals)s::text[]) AS signal WHERE document ~* signal) AS score
+    FROM chunks
+    WHERE chunk_id NOT IN (SELECT chunk_id FROM head)
+)
+SELECT document, chunk_id FROM head
+UNION ALL
+(
+    SELECT document, chunk_id
+    FROM ranked
+    WHERE score > 0
+    ORDER BY score DESC, chunk_id
+    LIMIT %(ranked)s
+)
+"""
+
+
+def fetch_document_digest(context: ContextSchema, *, k: int, head: int, timeout_secs: float) -> Document:
+    """Fetch the first `head` chunks plus the chunks matching most metadata signals, `k` in total, in one query."""
+    if not context.digest or not context.collection_name or k <= 0:
+        return Document(page_content='')
+
+    head = min(max(int(head), 0), k)
+    timeout_ms = int(timeout_secs * 1000)
+    with pg_connect(tenant_id=context.tenant_id) as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT set_config('statement_timeout', %s, true)", (str(timeout_ms),))
+        collection_uuid = get_collection_uuid(conn, context.collection_name)
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(
+                _DIGEST_QUERY,
+                {
+                    'signals': list(DIGEST_SIGNALS),
+                    'collection': collection_uuid,
+                    'digest': context.digest,
+                    'head': head,
+                    'ranked': k - head,
+                },
+            )
+            rows = cur.fetchall()
+
+    return Document(page_content=format_digest(rows))
+
+
+@tool('document_digest')
+def document_digest(config: RunnableConfig) -> Document:
+    """Return a compact digest of the current document in a single call.
+
+    The digest holds the first pages plus the chunks most likely to contain the company name, register entry,
+    reporting period and auditor's report, in document order. Prefer it over paging with `first_chunks`.
+
+    :param config: Runnable configuration that carries digest context.
+
+    """
+    context = ContextSchema.model_validate(config['configurable'])
+    return fetch_document_digest(
+        context,
+        k=settings.agent_digest_chunk_count,
+        head=settings.agent_digest_head_chunks,
+        timeout_secs=call_timeout(config, settings.agent_tool_timeout_secs),
+    )
+
+
+@tool('first_chunks')
+def first_chunks(
+    config: RunnableConfig,
+    k: int = 3,
+    skip: int = 0,
+) -> Document:
+    """Fetch the next `k` chunks for the current digest via SQL, ordered by chunk id and return as a single document.
+
+    :param config: Runnable configuration that carries digest context.
+    :param k: Number of chunks to return.
+    :param skip: Number of matching chunks to skip before returning results.
+
+    """
+
+    context = ContextSchema.model_validate(config['configurable'])
+    return fetch_first_chunks(
+        context,
+        k=k,
+        skip=skip,
+        timeout_secs=call_timeout(config, settings.agent_tool_timeout_secs),
+    )
+
+
 @tool('retriever')
 def retriever(
     query: str,
@@ -75,13 +190,41 @@ def retriever(
         kwargs = {}
     kwargs.setdefault('filter', {'digest': context.digest})
 
-    vs = get_vectorstore(collection_name=context.collection_name, tenant_id=context.tenant_id)
+    vs = get_vectorstore(
+        collection_name=context.collection_name,
+        tenant_id=context.tenant_id,
+        timeout=call_timeout(config, settings.agent_tool_timeout_secs),
+    )
     docs = vs.search(query, 'similarity', **kwargs)
     return Document(page_content='\n\n'.join([doc.page_content for doc in docs]))
 
 
-search_tool = tool = TavilySearch(
-    tavily_api_key=settings.tavily_api_key.get_secret_value(),
-    max_results=5,
-    topic='general',
-)
+TAVILY_SEARCH_URL = 'https://api.tavily.com/search'
+
+
+def fetch_web_search(query: str, *, max_results: int, topic: str, timeout_secs: float) -> dict[str, Any]:
+    """Run a Tavily web search through the shared keep-alive HTTP client and return the raw response."""
+    response = get_http_client().post(
+        TAVILY_SEARCH_URL,
+        json={'query': query, 'max_results': max_results, 'topic': topic},
+        headers={'Authorization': f'Bearer {settings.tavily_api_key.get_secret_value()}'},
+        timeout=timeout_secs,
+    )
+    response.raise_for_status()
+    return response.json()
+
+
+@tool('tavily_search')
+def search_tool(query: str, config: RunnableConfig) -> dict[str, Any]:
+    """Search the web for current, trusted information, e.g. to verify a company name or register entry.
+
+    :param query: Search query.
+    :param config: Runnable configuration that carries the job deadline.
+
+    """
+    return fetch_web_search(
+        query,
+        max_results=5,
+        topic='general',
+        timeout_secs=call_timeout(config, settings.agent_tool_timeout_secs),
+    )
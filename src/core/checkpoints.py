@@ -0,0 +1,142 @@
+"""LangGraph checkpoints of running agent jobs, one thread per job id.
+
+Checkpoints of succeeded and canceled jobs are pruned by the worker. Failed jobs keep theirs so a
+resubmitted job resumes, so prune threads that have not been touched for a while periodically:
+
+    python -m core.checkpoints --older-than-days 7
+
+The tables live in the `agent_checkpoints` schema (see the 0002 migration), which the tenant-scoped
+`metadata_rw` role cannot read.
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import sys
+from datetime import timedelta
+
+from langgraph.checkpoint.postgres import PostgresSaver
+from psycopg.rows import dict_row
+from psycopg_pool import ConnectionPool
+
+from core.config import get_settings
+from core.logging import configure_logging
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_SCHEMA = 'agent_checkpoints'
+
+_pool: ConnectionPool | None = None
+_checkpointer: PostgresSaver | None = None
+
+
+def _conninfo() -> str | None:
+    """Return a libpq URL for the configured database, or None when it is not PostgreSQL."""
+    url = get_settings().pg_checkpoint_url.get_secret_value()
+    scheme, separator, rest = url.partition('://')
+    if not separator or not scheme.startswith('postgresql'):
+        return None
+    # Drop SQLAlchemy driver suffixes such as `postgresql+psycopg2`.
+    return f'postgresql://{rest}'
+
+
+def get_checkpointer() -> PostgresSaver | None:
+    """Return the process-wide LangGraph checkpointer, or None when checkpointing is unavailable.
+
+    Checkpoint tables live in the agent_checkpoints schema and are created by Alembic, so `setup()` is never
+    called at runtime.
+    """
+    global _checkpointer, _pool
+    if _checkpointer is not None:
+        return _checkpointer
+
+    settings = get_settings()
+    conninfo = _conninfo()
+    if not settings.agent_checkpoints_enabled or conninfo is None:
+        return None
+
+    _pool = ConnectionPool(
+        conninfo=conninfo,
+        max_size=settings.agent_checkpoint_pool_size,
+        kwargs={
+            'autocommit': True,
+            'prepare_threshold': 0,
+            'row_factory': dict_row,
+            'options': f'-c search_path={CHECKPOINT_SCHEMA}',
+        },
+        open=True,
+    )
+    _checkpointer = PostgresSaver(_pool)
+    logger.info('LangGraph checkpointer configured | schema=%s', CHECKPOINT_SCHEMA)
+    return _checkpointer
+
+
+def delete_checkpoints(thread_id: str) -> None:
+    """Prune all checkpoints of a succeeded or canceled agent run; best effort."""
+    checkpointer = get_checkpointer()
+    if checkpointer is None:
+        return
+    try:
+        checkpointer.delete_thread(thread_id)
+    except Exception:  # noqa: BLE001 - pruning must never fail a completed job
+        logger.exception('Failed pruning checkpoints for thread %s', thread_id)
+
+
+# Data-modifying CTEs run even when nothing references them, so one statement prunes all three tables.
+_PRUNE_STALE = f"""
+WITH stale AS (
+    SELECT thread_id
+    FROM {CHECKPOINT_SCHEMA}.checkpoints
+    GROUP BY thread_id
+    HAVING max((checkpoint ->> 'ts')::timestamptz) < now() - %(max_age)s
+    LIMIT %(batch_size)s
+), writes AS (
+    DELETE FROM {CHECKPOINT_SCHEMA}.checkpoint_writes WHERE thread_id IN (SELECT thread_id FROM stale)
+), blobs AS (
+    DELETE FROM {CHECKPOINT_SCHEMA}.checkpoint_blobs WHERE thread_id IN (SELECT thread_id FROM stale)
+), checkpoints AS (
+    DELETE FROM {CHECKPOINT_SCHEMA}.checkpoints WHERE thread_id IN (SELECT thread_id FROM stale)
+)
+SELECT count(*) AS pruned FROM stale
+"""
+
+
+def prune_stale_checkpoints(*, max_age: timedelta | None = None, batch_size: int | None = None) -> int:
+    """Delete the checkpoints of threads last written more than `max_age` ago; returns the threads pruned.
+
+    This catches runs the worker never pruned: failed jobs that were not resubmitted and jobs whose
+    worker died. Each batch of threads commits separately.
+    """
+    settings = get_settings()
+    max_age = max_age if max_age is not None else timedelta(days=settings.agent_checkpoint_retention_days)
+    batch_size = batch_size or settings.agent_checkpoint_prune_batch_size
+    if get_checkpointer() is None or _pool is None:
+        return 0
+
+    total = 0
+    while True:
+        # Pool connections run in autocommit mode, so every batch is its own transaction.
+        with _pool.connection() as conn:
+            pruned = conn.execute(_PRUNE_STALE, {'max_age': max_age, 'batch_size': batch_size}).fetchone()['pruned']
+        total += pruned
+        if pruned < batch_size:
+            break
+    logger.info('Pruned checkpoints of %d agent runs older than %s', total, max_age)
+    return total
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--older-than-days', type=int, help='Defaults to AGENT_CHECKPOINT_RETENTION_DAYS.')
+    parser.add_argument('--batch-size', type=int, help='Defaults to AGENT_CHECKPOINT_PRUNE_BATCH_SIZE.')
+    args = parser.parse_args(argv)
+
+    configure_logging()
+    max_age = timedelta(days=args.older_than_days) if args.older_than_days is not None else None
+    prune_stale_checkpoints(max_age=max_age, batch_size=args.batch_size)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -19,7 +19,22 @@ class Settings(BaseSettings):
     admin_email: str = 'support@riskary.de'
 
     postgres_url: SecretStr
+    postgres_replica_url: SecretStr | None = None
+    # Worker login role for the agent checkpoint tables (a member of agent_checkpoints_rw); defaults to POSTGRES_URL.
+    postgres_checkpoint_url: SecretStr | None = None
     redis_url: SecretStr
+    # Connection pool of the primary database; ignored for non-PostgreSQL URLs (tests use SQLite).
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout_secs: float = 30.0
+    db_pool_recycle_secs: int = 3600
+    db_pool_pre_ping: bool = True
+
+    job_archive_after_days: int = 30
+    job_archive_batch_size: int = 1000
+    metadata_keep_versions: int = 20
+    metadata_compaction_batch_size: int = 200
+    metadata_export_batch_size: int = 1000
 
     openai_api_key: SecretStr
     tavily_api_key: SecretStr
@@ -32,6 +47,47 @@ class Settings(BaseSettings):
     otel_metrics_enabled: bool = True
     internal_auth_token: SecretStr = SecretStr('dev-internal-token')
 
+    agent_model: str = 'openai:gpt-5-nano'
+    agent_escalation_model: str | None = 'openai:gpt-5-mini'
+    # Per-profile overrides of the two settings above; a null escalation model disables escalation.
+    # The single-pass `fast` profile trades the escalation retry for latency.
+    agent_profile_models: dict[str, str] = {}
+    agent_profile_escalation_models: dict[str, str | None] = {'fast': None}
+    http_http2: bool = True
+    http_max_connections: int = 20
+    http_max_keepalive_connections: int = 10
+    http_keepalive_expiry_secs: float = 60.0
+    http_connect_timeout_secs: float = 5.0
+
+    agent_max_tool_rounds: dict[str, int] = {
+        'type_extractor': 3,
+        'metadata_extractor': 4,
+        'metadata_cleaner': 2,
+    }
+    agent_job_timeout_secs: float = 180.0
+    agent_llm_timeout_secs: float = 60.0
+    agent_tool_timeout_secs: float = 20.0
+    agent_fast_chunk_count: int = 8
+    agent_prefetch_chunk_count: int = 5
+    agent_prefetch_max_workers: int = 4
+    agent_digest_chunk_count: int = 8
+    agent_digest_head_chunks: int = 2
+    agent_batch_size: int = 25
+    agent_batch_excerpt_chars: int = 4000
+    agent_hedge_enabled: bool = False
+    agent_hedge_percentile: float = 95.0
+    agent_hedge_min_samples: int = 20
+    agent_hedge_max_fraction: float = 0.1
+    agent_hedge_max_workers: int = 16
+    agent_llm_cache: Literal['none', 'memory', 'redis'] = 'memory'
+    agent_llm_cache_max_entries: int = 1024
+    agent_llm_cache_ttl_secs: int = 7 * 24 * 3600
+    agent_cleaner_enabled: bool = True
+    agent_checkpoints_enabled: bool = True
+    agent_checkpoint_pool_size: int = 4
+    agent_checkpoint_retention_days: int = 7
+    agent_checkpoint_prune_batch_size: int = 500
+
     @property
     def pg_vector_url(self) -> SecretStr:
         """Returns the PostgreSQL database URL for PGVector.
@@ -42,6 +98,26 @@ class Settings(BaseSettings):
             url = url.replace('postgres://', 'postgresql://', 1)
         return SecretStr(url)
 
+    @property
+    def pg_replica_url(self) -> SecretStr | None:
+        """Returns the read-replica URL, normalised like `pg_vector_url`, or None without a replica."""
+        if self.postgres_replica_url is None:
+            return None
+        url = self.postgres_replica_url.get_secret_value()
+        if url.startswith('postgres://'):
+            url = url.replace('postgres://', 'postgresql://', 1)
+        return SecretStr(url)
+
+    @property
+    def pg_checkpoint_url(self) -> SecretStr:
+        """Returns the URL of the agent checkpoint store, normalised like `pg_vector_url`."""
+        if self.postgres_checkpoint_url is None:
+            return self.pg_vector_url
+        url = self.postgres_checkpoint_url.get_secret_value()
+        if url.startswith('postgres://'):
+            url = url.replace('postgres://', 'postgresql://', 1)
+        return SecretStr(url)
+
 
 @lru_cache(maxsize=1)
 def get_settings() -> Settings:
@@ -1,65 +1,140 @@
 from __future__ import annotations
 
+import time
 from contextlib import contextmanager
 from typing import Generator
 
-from sqlalchemy import text
-from sqlalchemy.engine import Engine
+from sqlalchemy import event, make_url, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.pool import PoolProxiedConnection, QueuePool
 from sqlmodel import Session, create_engine
 from tenauth.schemas import AccessContext
 
 from core.config import get_settings
+from core.metrics import create_histogram, create_observable_gauge
 
 _engine: Engine | None = None
+_replica_engine: Engine | None = None
+
+_checkout_wait = create_histogram(
+    'metis.db.pool.checkout_wait', description='Time spent waiting for a pooled database connection.'
+)
+
+
+class TimedQueuePool(QueuePool):
+    """Queue pool that records how long each checkout took, including waiting for a free connection."""
+
+    label = 'primary'
+
+    def connect(self) -> PoolProxiedConnection:
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            _checkout_wait.record(1000 * (time.perf_counter() - start), {'pool': self.label})
+
+
+class ReplicaQueuePool(TimedQueuePool):
+    # A class attribute rather than an instance one, so it survives `Pool.recreate()` on dispose.
+    label = 'replica'
+
+
+def _pool_usage() -> list[tuple[float, dict[str, str]]]:
+    observations = []
+    for engine in (_engine, _replica_engine):
+        pool = engine.pool if engine is not None else None
+        if not isinstance(pool, TimedQueuePool):
+            continue
+        attributes = {'pool': pool.label}
+        observations += [
+            (pool.checkedout(), {**attributes, 'state': 'in_use'}),
+            (max(pool.overflow(), 0), {**attributes, 'state': 'overflow'}),
+            (pool.checkedin(), {**attributes, 'state': 'idle'}),
+        ]
+    return observations
+
+
+create_observable_gauge('metis.db.pool.connections', _pool_usage, description='Pooled database connections by state.')
+
+
+def _create_engine(url: str, poolclass: type[TimedQueuePool]) -> Engine:
+    settings = get_settings()
+    pool_options = {}
+    if make_url(url).get_backend_name() == 'postgresql':
+        pool_options = {
+            'poolclass': poolclass,
+            'pool_size': settings.db_pool_size,
+            'max_overflow': settings.db_max_overflow,
+            'pool_timeout': settings.db_pool_timeout_secs,
+        }
+    return create_engine(
+        url,
+        echo=settings.debug or False,
+        pool_pre_ping=settings.db_pool_pre_ping,
+        pool_recycle=settings.db_pool_recycle_secs,
+        **pool_options,
+    )
 
 
 def get_engine() -> Engine:
     global _engine
     if _engine is None:
-        settings = get_settings()
-        url = settings.pg_vector_url.get_secret_value()
-        _engine = create_engine(url, echo=settings.debug or False, pool_pre_ping=True, pool_recycle=3600)
+        _engine = _create_engine(get_settings().pg_vector_url.get_secret_value(), TimedQueuePool)
     return _engine
 
 
-def _apply_access_context(session: Session, access_context: AccessContext) -> None:
-    bind = session.get_bind()
-    if bind is not None and bind.dialect.name.startswith('postgresql'):
-        session.execute(
-            text("SELECT set_config('app.tenant_id', :value, false)"),
-            {'value': str(access_context.tenant_id)},
-        )
-        session.execute(
-            text("SELECT set_config('app.user_id', :value, false)"),
-            {'value': str(access_context.user_id)},
-        )
+def get_replica_engine() -> Engine | None:
+    """Return the read-replica engine, or None when no replica is configured."""
+    global _replica_engine
+    if _replica_engine is None:
+        url = get_settings().pg_replica_url
+        if url is None:
+            return None
+        _replica_engine = _create_engine(url.get_secret_value(), ReplicaQueuePool)
+    return _replica_engine
+
 
-    session.info['tenant_id'] = access_context.tenant_id
-    session.info['user_id'] = access_context.user_id
+# Transaction-local settings vanish at COMMIT/ROLLBACK, so nothing leaks to the next user of a pooled
+# (or PgBouncer transaction-mode) connection and no RESET is needed.
+_SET_ACCESS_CONTEXT = text(
+    "SELECT set_config('app.tenant_id', :tenant_id, true), set_config('app.user_id', :user_id, true)"
+)
 
 
-def _reset_access_context(session: Session) -> None:
-    bind = session.get_bind()
-    if bind is not None and bind.dialect.name.startswith('postgresql'):
-        session.execute(text('RESET app.user_id'))
-        session.execute(text('RESET app.tenant_id'))
+@event.listens_for(Session, 'after_begin')
+def _apply_access_context(session: Session, transaction, connection: Connection) -> None:
+    """Apply the session's RLS context in one statement at the start of every transaction."""
+    tenant_id = session.info.get('tenant_id')
+    if tenant_id is None or not connection.dialect.name.startswith('postgresql'):
+        return
+    connection.execute(_SET_ACCESS_CONTEXT, {'tenant_id': str(tenant_id), 'user_id': str(session.info['user_id'])})
 
-    session.info.pop('tenant_id', None)
-    session.info.pop('user_id', None)
+
+def is_replica_session(session: Session) -> bool:
+    return bool(session.info.get('replica'))
 
 
 @contextmanager
-def session_scope(access_context: AccessContext | None = None) -> Generator[Session, None, None]:
-    session = Session(get_engine())
+def session_scope(
+    access_context: AccessContext | None = None, *, read_only: bool = False
+) -> Generator[Session, None, None]:
+    """Yield a session bound to the primary, or to the read replica for `read_only` scopes when one is configured.
+
+    Replica reads may lag the primary by the replication delay; callers that must see their own writes
+    retry on the primary when the replica has no row yet.
+    """
+    info = {}
+    if access_context is not None:
+        info = {'tenant_id': access_context.tenant_id, 'user_id': access_context.user_id}
+    engine = get_replica_engine() if read_only else None
+    if engine is not None:
+        info['replica'] = True
+    session = Session(engine or get_engine(), info=info)
     try:
-        if access_context is not None:
-            _apply_access_context(session, access_context)
         yield session
         session.commit()
     except Exception:
         session.rollback()
         raise
     finally:
-        if access_context is not None:
-            _reset_access_context(session)
         session.close()
@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+import importlib.util
+import logging
+import threading
+from typing import Any
+
+import httpx
+
+from core.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_client: httpx.Client | None = None
+_async_client: httpx.AsyncClient | None = None
+
+
+def _client_kwargs() -> dict[str, Any]:
+    settings = get_settings()
+    # HTTP/2 needs the optional `h2` package; fall back to pooled HTTP/1.1 keep-alive without it.
+    http2 = settings.http_http2 and importlib.util.find_spec('h2') is not None
+    return {
+        'http2': http2,
+        'limits': httpx.Limits(
+            max_connections=settings.http_max_connections,
+            max_keepalive_connections=settings.http_max_keepalive_connections,
+            keepalive_expiry=settings.http_keepalive_expiry_secs,
+        ),
+        'timeout': httpx.Timeout(settings.agent_llm_timeout_secs, connect=settings.http_connect_timeout_secs),
+    }
+
+
+def get_http_client() -> httpx.Client:
+    """Return the process-wide pooled HTTP client shared by chat models, embeddings and web search."""
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                kwargs = _client_kwargs()
+                _client = httpx.Client(**kwargs)
+                logger.info('Shared HTTP client configured | http2=%s', kwargs['http2'])
+    return _client
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """Async counterpart of `get_http_client` for `ainvoke` code paths."""
+    global _async_client
+    if _async_client is None:
+        with _lock:
+            if _async_client is None:
+                _async_client = httpx.AsyncClient(**_client_kwargs())
+    return _async_client
+
+
+def close_http_clients() -> None:
+    global _client, _async_client
+    with _lock:
+        if _client is not None:
+            _client.close()
+        _client = None
+        # The async client is bound to the loop that used it; drop it and let the loop close its sockets.
+        _async_client = None
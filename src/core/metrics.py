@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+from typing import Any, Callable
+
+try:
+    from opentelemetry import metrics as otel_metrics
+except ImportError:  # pragma: no cover - optional dependency
+    otel_metrics = None
+
+METER_NAME = 'metis'
+
+
+class _NoopInstrument:
+    def add(self, *_args: Any, **_kwargs: Any) -> None:
+        return None
+
+    def record(self, *_args: Any, **_kwargs: Any) -> None:
+        return None
+
+
+def create_counter(name: str, *, unit: str = '1', description: str = '') -> Any:
+    """Create a monotonic counter; a no-op when OpenTelemetry is not installed.
+
+    Instruments obtained before `init_observability()` runs are bound to the real provider once it is set.
+    """
+    if otel_metrics is None:
+        return _NoopInstrument()
+    return otel_metrics.get_meter(METER_NAME).create_counter(name, unit=unit, description=description)
+
+
+def create_histogram(name: str, *, unit: str = 'ms', description: str = '') -> Any:
+    """Create a histogram; a no-op when OpenTelemetry is not installed."""
+    if otel_metrics is None:
+        return _NoopInstrument()
+    return otel_metrics.get_meter(METER_NAME).create_histogram(name, unit=unit, description=description)
+
+
+def create_observable_gauge(
+    name: str,
+    callback: Callable[[], list[tuple[float, dict[str, str]]]],
+    *,
+    unit: str = '1',
+    description: str = '',
+) -> None:
+    """Register a gauge read at export time; `callback` returns `(value, attributes)` pairs."""
+    if otel_metrics is None:
+        return
+
+    def observe(_options: Any) -> list[Any]:
+        return [otel_metrics.Observation(value, attributes) for value, attributes in callback()]
+
+    otel_metrics.get_meter(METER_NAME).create_observable_gauge(
+        name, callbacks=[observe], unit=unit, description=description
+    )
+
+
+__all__ = ['create_counter', 'create_histogram', 'create_observable_gauge']
@@ -1,22 +1,45 @@
 from __future__ import annotations
 
 import logging
+from collections.abc import Callable
 
 import dramatiq
 from dramatiq.brokers.redis import RedisBroker
 
 from core import configure_logging, get_settings
+from core.http import close_http_clients
 
 configure_logging()
 logger = logging.getLogger(__name__)
 
 
+_shutdown_hooks: list[Callable[[], None]] = [close_http_clients]
+
+
+def on_worker_shutdown(hook: Callable[[], None]) -> None:
+    """Run `hook` when a worker process shuts down, after the shared HTTP clients are closed."""
+    _shutdown_hooks.append(hook)
+
+
+class WorkerShutdown(dramatiq.Middleware):
+    """Release process-wide resources, such as the shared keep-alive HTTP clients, when a worker shuts down."""
+
+    def after_worker_shutdown(self, broker: dramatiq.Broker, worker: dramatiq.Worker) -> None:
+        for hook in _shutdown_hooks:
+            try:
+                hook()
+            except Exception:  # noqa: BLE001 - one failing hook must not skip the others
+                logger.exception('Worker shutdown hook %s failed', getattr(hook, '__name__', hook))
+
+
 def _make_broker() -> RedisBroker:
     """Construct a Redis broker from settings. Fail fast if missing."""
     url = get_settings().redis_url.get_secret_value()
     if not url:
         raise RuntimeError('REDIS_URL/redis_url is not configured')
-    return RedisBroker(url=url)
+    broker = RedisBroker(url=url)
+    broker.add_middleware(WorkerShutdown())
+    return broker
 
 
 # Expose a module-level broker so the CLI can import it via `queue:broker`.
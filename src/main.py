@@ -1,7 +1,10 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from starlette.middleware.cors import CORSMiddleware
 
 from core import configure_logging, get_settings, init_observability
+from core.http import close_http_clients
 from metadata.api import router as metadata_router
 
 origins = [
@@ -10,12 +13,18 @@ origins = [
 ]
 
 
+@asynccontextmanager
+async def lifespan(_application: FastAPI):
+    yield
+    close_http_clients()
+
+
 def create_app() -> FastAPI:
     configure_logging()
     init_observability()
     settings = get_settings()
 
-    application = FastAPI(title=settings.app_name, version=settings.version)
+    application = FastAPI(title=settings.app_name, version=settings.version, lifespan=lifespan)
 
     application.add_middleware(
         CORSMiddleware,
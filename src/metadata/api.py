@@ -1,36 +1,65 @@
 from __future__ import annotations
 
 import asyncio
+import datetime as dt
 import time
-from collections.abc import Iterator
+from collections.abc import Callable, Iterator
+from contextlib import AbstractContextManager
+from functools import partial
+from typing import Literal, TypeVar
 from uuid import UUID
 
 from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
 from sqlmodel import Session
 from tenauth.fastapi import require_access_context
 from tenauth.schemas import AccessContext
 
+from agent.profiles import profile_names
 from agent.schemas import MetadataSchema
-from core.db import session_scope
+from core.config import get_settings
+from core.db import is_replica_session, session_scope
+from core.metrics import create_counter
 from metadata import tasks
-from metadata.models import Job, JobStatus
+from metadata.models import DocumentMetadata, Job, JobStatus
 from metadata.schemas import (
+    CreateJobBatchDTO,
     CreateJobDTO,
+    FieldChange,
+    JobBatchCreatedResponse,
     JobCancelResponse,
     JobCreatedResponse,
+    JobListResponse,
     JobStatusResponse,
+    JobSummary,
     ManualMetadataUpdateDTO,
+    MetadataDiffResponse,
+    MetadataSearchHit,
+    MetadataSearchResponse,
+    MetadataVersionHeader,
+    MetadataVersionListResponse,
     MetadataVersionResponse,
     RebuildJobDTO,
     VersionQuery,
 )
 from metadata.service import (
     cancel_job,
+    count_jobs_by_status,
     create_job,
+    diff_payloads,
     fetch_document_metadata,
     get_job,
+    iter_metadata_export,
+    list_jobs,
+    list_metadata_versions,
+    load_payloads,
     manual_metadata_update,
+    search_latest_metadata,
+    set_metadata_version_pinned,
+    version_fingerprints,
 )
+from utils.ndjson import gzip_ndjson
+from utils.pagination import decode_cursor, encode_cursor
 
 router = APIRouter(
     prefix='/v1',
@@ -39,6 +68,12 @@ router = APIRouter(
 
 TERMINAL_STATUSES = {JobStatus.SUCCEEDED, JobStatus.FAILED, JobStatus.CANCELED}
 
+T = TypeVar('T')
+
+_replica_fallbacks = create_counter(
+    'metis.db.replica_fallbacks', description='Replica reads retried on the primary because the row was missing.'
+)
+
 
 def _status_url(request: Request, job_id: UUID) -> str:
     return str(request.url_for('get_job_status', job_id=str(job_id)))
@@ -63,6 +98,26 @@ async def _wait_for_completion(job_id: UUID, wait_for_secs: int, access: AccessC
     return None
 
 
+def _version_response(record: DocumentMetadata) -> MetadataVersionResponse:
+    return MetadataVersionResponse(
+        document_id=record.document_id,
+        version=record.version,
+        fingerprint=record.fingerprint,
+        extracted_on=record.extracted_on,
+        source=record.source,
+        pinned=record.pinned,
+        metadata=MetadataSchema.model_validate(record.payload),
+    )
+
+
+def _ensure_known_profile(profile: str) -> None:
+    if profile not in profile_names():
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f'Unknown profile {profile!r}; expected one of {profile_names()}',
+        )
+
+
 def get_scoped_session(
     access: AccessContext = Depends(require_access_context),
 ) -> Iterator[Session]:
@@ -70,6 +125,37 @@ def get_scoped_session(
         yield session
 
 
+def get_read_session(
+    access: AccessContext = Depends(require_access_context),
+) -> Iterator[Session]:
+    """Session for read-only handlers; served by the read replica when one is configured."""
+    with session_scope(access_context=access, read_only=True) as session:
+        yield session
+
+
+def get_read_session_factory(
+    access: AccessContext = Depends(require_access_context),
+) -> Callable[[], AbstractContextManager[Session]]:
+    """Opens read-only sessions on demand, for handlers that must not keep one open across a long response."""
+    return partial(session_scope, access_context=access, read_only=True)
+
+
+def _read_your_writes(session: Session, access: AccessContext, read: Callable[[Session], T | None]) -> T | None:
+    """Run `read` on `session` and retry on the primary when a replica finds nothing.
+
+    Rows written moments ago, such as a job created by the previous request, may not have replicated yet.
+    """
+    result = read(session)
+    if result is not None or not is_replica_session(session):
+        return result
+    _replica_fallbacks.add(1)
+    with session_scope(access_context=access) as primary:
+        result = read(primary)
+        if result is not None:
+            primary.expunge(result)
+    return result
+
+
 @router.post(
     '/metadata',
     response_model=JobCreatedResponse,
@@ -82,8 +168,9 @@ async def create_metadata_job(
     wait_for_secs: int = Query(default=0, ge=0, le=30),
     access: AccessContext = Depends(require_access_context),
 ):
+    _ensure_known_profile(payload.profile)
     job = create_job(session, payload, access_context=access)
-    tasks.enqueue_job(job.job_id, job.tenant_id, job.user_id)
+    tasks.enqueue_job(job.job_id, job.tenant_id, job.user_id, context=job.context)
 
     response = JobCreatedResponse(
         job_id=job.job_id,
@@ -97,6 +184,127 @@ async def create_metadata_job(
     return response
 
 
+@router.post(
+    '/metadata/batch',
+    response_model=JobBatchCreatedResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+def create_metadata_job_batch(
+    payload: CreateJobBatchDTO,
+    request: Request,
+    session: Session = Depends(get_scoped_session),
+    access: AccessContext = Depends(require_access_context),
+):
+    for item in payload.jobs:
+        _ensure_known_profile(item.profile)
+    jobs = [create_job(session, item, access_context=access) for item in payload.jobs]
+    pending = [job.job_id for job in jobs if job.status not in {JobStatus.SUCCEEDED, JobStatus.CANCELED}]
+    if pending:
+        tasks.enqueue_batch(pending, access.tenant_id, access.user_id)
+
+    return JobBatchCreatedResponse(
+        jobs=[
+            JobCreatedResponse(
+                job_id=job.job_id,
+                document_id=job.document_id,
+                status_url=_status_url(request, job.job_id),
+            )
+            for job in jobs
+        ]
+    )
+
+
+@router.get('/metadata/search', response_model=MetadataSearchResponse)
+def search_metadata(
+    document_type: str | None = Query(default=None, max_length=200),
+    company_name: str | None = Query(default=None, min_length=1, max_length=200),
+    company_match: Literal['prefix', 'contains'] = Query(default='prefix'),
+    reporting_year: int | None = Query(default=None, ge=1900, le=2100),
+    register_number: str | None = Query(default=None, max_length=100),
+    tags: list[str] = Query(default=[], max_length=20),
+    limit: int = Query(default=50, ge=1, le=200),
+    cursor: str | None = Query(default=None, max_length=200),
+    session: Session = Depends(get_read_session),
+    access: AccessContext = Depends(require_access_context),
+):
+    after_document_id = None
+    if cursor is not None:
+        try:
+            after_document_id = UUID(decode_cursor(cursor, 1)[0])
+        except ValueError as exc:
+            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail='Invalid cursor') from exc
+
+    entries = search_latest_metadata(
+        session,
+        tenant_id=access.tenant_id,
+        document_type=document_type,
+        company_name=company_name,
+        company_match=company_match,
+        reporting_year=reporting_year,
+        register_number=register_number,
+        tags=tags,
+        after_document_id=after_document_id,
+        limit=limit,
+    )
+    next_cursor = encode_cursor(str(entries[-1].document_id)) if len(entries) == limit else None
+    return MetadataSearchResponse(
+        items=[
+            MetadataSearchHit(
+                document_id=entry.document_id,
+                version=entry.version,
+                fingerprint=entry.fingerprint,
+                extracted_on=entry.extracted_on,
+                metadata=MetadataSchema.model_validate(entry.payload),
+            )
+            for entry in entries
+        ],
+        next_cursor=next_cursor,
+    )
+
+
+@router.get('/metadata/export', response_class=StreamingResponse)
+def export_metadata(
+    scope: Literal['latest', 'all'] = Query(default='latest'),
+    cursor: str | None = Query(default=None, max_length=200),
+    open_session: Callable[[], AbstractContextManager[Session]] = Depends(get_read_session_factory),
+    access: AccessContext = Depends(require_access_context),
+):
+    """Stream the tenant's metadata as gzip-compressed NDJSON, ordered by document and version.
+
+    Every line carries the `cursor` that resumes the export right after it.
+    """
+    after = None
+    if cursor is not None:
+        try:
+            document_id, version = decode_cursor(cursor, 2)
+            after = (UUID(document_id), int(version))
+        except ValueError as exc:
+            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail='Invalid cursor') from exc
+
+    batch_size = get_settings().metadata_export_batch_size
+    rows = iter_metadata_export(
+        open_session, tenant_id=access.tenant_id, scope=scope, after=after, batch_size=batch_size
+    )
+    records = (
+        {
+            'document_id': str(document_id),
+            'version': version,
+            'fingerprint': fingerprint,
+            'extracted_on': extracted_on.isoformat(),
+            'source': source,
+            'metadata': payload,
+            'cursor': encode_cursor(str(document_id), str(version)),
+        }
+        for document_id, version, fingerprint, extracted_on, source, payload in rows
+    )
+    # Each page opens and closes its own session while the response streams.
+    return StreamingResponse(
+        gzip_ndjson(records, flush_every=batch_size),
+        media_type='application/x-ndjson',
+        headers={'Content-Encoding': 'gzip'},
+    )
+
+
 @router.post(
     '/documents/{document_id}/rebuild',
     response_model=JobCreatedResponse,
@@ -109,9 +317,10 @@ async def rebuild_document_metadata(
     session: Session = Depends(get_scoped_session),
     access: AccessContext = Depends(require_access_context),
 ):
+    _ensure_known_profile(payload.profile)
     job_payload = payload.model_copy(update={'document_id': document_id})
     job = create_job(session, job_payload, access_context=access)
-    tasks.enqueue_job(job.job_id, job.tenant_id, job.user_id)
+    tasks.enqueue_job(job.job_id, job.tenant_id, job.user_id, context=job.context)
     return JobCreatedResponse(
         job_id=job.job_id,
         document_id=job.document_id,
@@ -119,15 +328,82 @@ async def rebuild_document_metadata(
     )
 
 
+@router.get('/jobs', response_model=JobListResponse)
+def list_jobs_handler(
+    request: Request,
+    job_status: list[JobStatus] = Query(default=[], alias='status'),
+    profile: str | None = Query(default=None, max_length=100),
+    document_id: UUID | None = Query(default=None),
+    created_from: dt.datetime | None = Query(default=None),
+    created_to: dt.datetime | None = Query(default=None),
+    include_archived: bool = Query(default=False),
+    limit: int = Query(default=50, ge=1, le=200),
+    cursor: str | None = Query(default=None, max_length=200),
+    session: Session = Depends(get_read_session),
+    access: AccessContext = Depends(require_access_context),
+):
+    before = None
+    if cursor is not None:
+        try:
+            created_at, job_id = decode_cursor(cursor, 2)
+            before = (dt.datetime.fromisoformat(created_at), UUID(job_id))
+        except ValueError as exc:
+            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail='Invalid cursor') from exc
+
+    filters = {
+        'tenant_id': access.tenant_id,
+        'profile': profile,
+        'document_id': document_id,
+        'created_from': created_from,
+        'created_to': created_to,
+        'include_archived': include_archived,
+    }
+    jobs = list_jobs(session, **filters, statuses=job_status, before=before, limit=limit)
+    next_cursor = None
+    if len(jobs) == limit:
+        next_cursor = encode_cursor(jobs[-1].created_at.isoformat(), str(jobs[-1].job_id))
+
+    return JobListResponse(
+        items=[
+            JobSummary(
+                job_id=job.job_id,
+                document_id=job.document_id,
+                profile=job.profile,
+                status=job.status,
+                retries=job.retries,
+                priority=job.priority,
+                created_at=job.created_at,
+                started_at=job.started_at,
+                finished_at=job.finished_at,
+                error_type=job.error_type,
+                stage=job.stage,
+                status_url=_status_url(request, job.job_id),
+            )
+            for job in jobs
+        ],
+        next_cursor=next_cursor,
+        # Counting scans every matching job, so it is done once per listing rather than per page.
+        counts=count_jobs_by_status(session, **filters) if cursor is None else None,
+    )
+
+
 @router.get('/jobs/{job_id}', response_model=JobStatusResponse, name='get_job_status')
-def get_job_status(job_id: UUID, request: Request, session: Session = Depends(get_scoped_session)):
-    job = get_job(session, job_id)
+def get_job_status(
+    job_id: UUID,
+    request: Request,
+    session: Session = Depends(get_read_session),
+    access: AccessContext = Depends(require_access_context),
+):
+    job = _read_your_writes(session, access, lambda db: get_job(db, job_id, include_archived=True))
     if job is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Job not found')
 
     result_url = None
+    partial_metadata = None
     if job.status == JobStatus.SUCCEEDED:
         result_url = _result_url(request, job.document_id)
+    elif job.partial_metadata:
+        partial_metadata = MetadataSchema.model_validate(job.partial_metadata)
 
     return JobStatusResponse(
         job_id=job.job_id,
@@ -142,12 +418,15 @@ def get_job_status(job_id: UUID, request: Request, session: Session = Depends(ge
         error_type=job.error_type,
         error_msg=job.error_msg,
         result_url=result_url,
+        stage=job.stage,
+        partial_metadata=partial_metadata,
     )
 
 
 @router.delete('/jobs/{job_id}', response_model=JobCancelResponse, status_code=status.HTTP_202_ACCEPTED)
 def cancel_job_handler(job_id: UUID, session: Session = Depends(get_scoped_session)):
-    job = get_job(session, job_id)
+    # Archived jobs are terminal, so cancel_job reports their status unchanged.
+    job = get_job(session, job_id, include_archived=True)
     if job is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Job not found')
     job = cancel_job(session, job)
@@ -163,20 +442,94 @@ def get_document_metadata(
     document_id: UUID,
     request: Request,
     version: VersionQuery = Query(default='latest'),
-    session: Session = Depends(get_scoped_session),
+    session: Session = Depends(get_read_session),
     access: AccessContext = Depends(require_access_context),
 ):
-    record = fetch_document_metadata(session, tenant_id=access.tenant_id, document_id=document_id, version=version)
+    record = _read_your_writes(
+        session,
+        access,
+        lambda db: fetch_document_metadata(db, tenant_id=access.tenant_id, document_id=document_id, version=version),
+    )
     if record is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Metadata not found')
 
-    metadata = MetadataSchema.model_validate(record.payload)
-    return MetadataVersionResponse(
-        document_id=record.document_id,
-        version=record.version,
-        fingerprint=record.fingerprint,
-        extracted_on=record.extracted_on,
-        metadata=metadata,
+    return _version_response(record)
+
+
+def _changes(old: dict | None, new: dict) -> list[FieldChange]:
+    return [FieldChange(field=field, old=before, new=after) for field, before, after in diff_payloads(old, new)]
+
+
+@router.get('/documents/{document_id}/metadata/versions', response_model=MetadataVersionListResponse)
+def list_document_metadata_versions(
+    document_id: UUID,
+    include_changes: bool = Query(default=False),
+    limit: int = Query(default=50, ge=1, le=200),
+    cursor: str | None = Query(default=None, max_length=200),
+    session: Session = Depends(get_read_session),
+    access: AccessContext = Depends(require_access_context),
+):
+    before_version = None
+    if cursor is not None:
+        try:
+            before_version = int(decode_cursor(cursor, 1)[0])
+        except ValueError as exc:
+            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail='Invalid cursor') from exc
+
+    # One extra row tells whether another page follows and is the diff base of the page's oldest version.
+    versions = list_metadata_versions(
+        session, tenant_id=access.tenant_id, document_id=document_id, before_version=before_version, limit=limit + 1
+    )
+    page, older = versions[:limit], versions[limit:]
+    payloads = {}
+    if include_changes:
+        payloads = load_payloads(session, tenant_id=access.tenant_id, fingerprints=[v.fingerprint for v in versions])
+
+    items = []
+    for index, version in enumerate(page):
+        changes = None
+        if include_changes:
+            previous = (page[index + 1 :] + older)[:1]
+            base = payloads.get(previous[0].fingerprint) if previous else None
+            if previous and previous[0].fingerprint == version.fingerprint:
+                changes = []
+            else:
+                changes = _changes(base, payloads[version.fingerprint])
+        items.append(
+            MetadataVersionHeader(
+                version=version.version,
+                fingerprint=version.fingerprint,
+                extracted_on=version.extracted_on,
+                source=version.source,
+                pinned=version.pinned,
+                changes=changes,
+            )
+        )
+    next_cursor = encode_cursor(str(page[-1].version)) if older else None
+    return MetadataVersionListResponse(document_id=document_id, items=items, next_cursor=next_cursor)
+
+
+@router.get('/documents/{document_id}/metadata/diff', response_model=MetadataDiffResponse)
+def diff_document_metadata(
+    document_id: UUID,
+    from_version: int = Query(ge=1),
+    to_version: int = Query(ge=1),
+    session: Session = Depends(get_read_session),
+    access: AccessContext = Depends(require_access_context),
+):
+    fingerprints = version_fingerprints(
+        session, tenant_id=access.tenant_id, document_id=document_id, versions=[from_version, to_version]
+    )
+    for version in (from_version, to_version):
+        if version not in fingerprints:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f'Metadata version {version} not found')
+
+    changes = []
+    if fingerprints[from_version] != fingerprints[to_version]:
+        payloads = load_payloads(session, tenant_id=access.tenant_id, fingerprints=list(fingerprints.values()))
+        changes = _changes(payloads[fingerprints[from_version]], payloads[fingerprints[to_version]])
+    return MetadataDiffResponse(
+        document_id=document_id, from_version=from_version, to_version=to_version, changes=changes
     )
 
 
@@ -196,11 +549,33 @@ def upsert_document_metadata(
         metadata=payload.metadata,
         tenant_id=access.tenant_id,
     )
-    metadata = MetadataSchema.model_validate(record.payload)
-    return MetadataVersionResponse(
-        document_id=record.document_id,
-        version=record.version,
-        fingerprint=record.fingerprint,
-        extracted_on=record.extracted_on,
-        metadata=metadata,
+    return _version_response(record)
+
+
+def _pin_version(document_id: UUID, version: int, session: Session, access: AccessContext, *, pinned: bool):
+    record = set_metadata_version_pinned(
+        session, tenant_id=access.tenant_id, document_id=document_id, version=version, pinned=pinned
     )
+    if record is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Metadata not found')
+    return _version_response(record)
+
+
+@router.put('/documents/{document_id}/metadata/versions/{version}/pin', response_model=MetadataVersionResponse)
+def pin_metadata_version(
+    document_id: UUID,
+    version: int,
+    session: Session = Depends(get_scoped_session),
+    access: AccessContext = Depends(require_access_context),
+):
+    return _pin_version(document_id, version, session, access, pinned=True)
+
+
+@router.delete('/documents/{document_id}/metadata/versions/{version}/pin', response_model=MetadataVersionResponse)
+def unpin_metadata_version(
+    document_id: UUID,
+    version: int,
+    session: Session = Depends(get_scoped_session),
+    access: AccessContext = Depends(require_access_context),
+):
+    return _pin_version(document_id, version, session, access, pinned=False)
@@ -0,0 +1,67 @@
+"""Move terminal jobs out of the hot `metadata_jobs` table.
+
+Run periodically, e.g. from a cron job:
+
+    python -m metadata.archive --older-than-days 30
+
+Archiving spans tenants, so it goes through the `metadata.archive_terminal_jobs` database function,
+which runs as its owner (see the 0004 migration) rather than under the caller's RLS context.
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import sys
+from datetime import timedelta
+
+from sqlalchemy import text
+
+from core.config import get_settings
+from core.db import session_scope
+from core.logging import configure_logging
+from core.metrics import create_counter
+
+logger = logging.getLogger(__name__)
+
+_ARCHIVE_BATCH = text('SELECT metadata.archive_terminal_jobs(:max_age, :batch_size)')
+
+_archived = create_counter('metis.jobs.archived', description='Terminal jobs moved to the archive table.')
+
+
+def archive_terminal_jobs(*, max_age: timedelta | None = None, batch_size: int | None = None) -> int:
+    """Archive terminal jobs finished more than `max_age` ago; returns the number of jobs moved.
+
+    Each batch commits separately, keeping row locks short and letting concurrent archivers skip
+    each other's rows.
+    """
+    settings = get_settings()
+    max_age = max_age if max_age is not None else timedelta(days=settings.job_archive_after_days)
+    batch_size = batch_size or settings.job_archive_batch_size
+
+    total = 0
+    while True:
+        with session_scope() as session:
+            moved = session.execute(_ARCHIVE_BATCH, {'max_age': max_age, 'batch_size': batch_size}).scalar_one()
+        total += moved
+        _archived.add(moved)
+        if moved < batch_size:
+            break
+    logger.info('Archived %d terminal jobs older than %s', total, max_age)
+    return total
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--older-than-days', type=int, help='Defaults to JOB_ARCHIVE_AFTER_DAYS.')
+    parser.add_argument('--batch-size', type=int, help='Defaults to JOB_ARCHIVE_BATCH_SIZE.')
+    args = parser.parse_args(argv)
+
+    configure_logging()
+    max_age = timedelta(days=args.older_than_days) if args.older_than_days is not None else None
+    archive_terminal_jobs(max_age=max_age, batch_size=args.batch_size)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
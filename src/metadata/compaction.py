@@ -0,0 +1,87 @@
+"""Bound the number of stored metadata versions per document.
+
+Every successful job appends a full payload, so frequently rebuilt documents collect many near-identical
+versions. Compaction keeps the newest `METADATA_KEEP_VERSIONS` versions of each document plus every
+manual and every pinned version, and deletes the remaining agent versions. Run it periodically:
+
+    python -m metadata.compaction --keep 20
+
+Payloads no longer referenced by any version are deleted along with the versions. Like job archival it
+spans tenants and goes through a database function (see the 0005 and 0006 migrations).
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import sys
+from uuid import UUID
+
+from sqlalchemy import text
+
+from core.config import get_settings
+from core.db import session_scope
+from core.logging import configure_logging
+from core.metrics import create_counter
+
+logger = logging.getLogger(__name__)
+
+_COMPACT_BATCH = text(
+    'SELECT deleted, last_tenant_id, last_document_id '
+    'FROM metadata.compact_metadata_versions(:keep_last, :batch_size, :after_tenant_id, :after_document_id)'
+)
+
+# Smaller than any UUID, so the first batch starts at the beginning of the key range. Passed as text
+# because psycopg2 does not adapt `uuid.UUID` without registering an adapter.
+_START = str(UUID(int=0))
+
+_compacted = create_counter('metis.metadata.versions_compacted', description='Metadata versions removed by compaction.')
+
+
+def compact_metadata_versions(*, keep_last: int | None = None, batch_size: int | None = None) -> int:
+    """Delete surplus agent versions; returns the number of versions removed.
+
+    Documents are walked in key order, `batch_size` documents per transaction, so each batch holds its
+    row locks briefly and never rescans documents that were already compacted.
+    """
+    settings = get_settings()
+    keep_last = keep_last if keep_last is not None else settings.metadata_keep_versions
+    batch_size = batch_size or settings.metadata_compaction_batch_size
+    if keep_last < 1:
+        raise ValueError('keep_last must be at least 1 so the latest version always survives')
+
+    total = 0
+    cursor = (_START, _START)
+    while True:
+        with session_scope() as session:
+            row = session.execute(
+                _COMPACT_BATCH,
+                {
+                    'keep_last': keep_last,
+                    'batch_size': batch_size,
+                    'after_tenant_id': cursor[0],
+                    'after_document_id': cursor[1],
+                },
+            ).first()
+        if row is None:
+            break
+        total += row.deleted
+        _compacted.add(row.deleted)
+        cursor = (str(row.last_tenant_id), str(row.last_document_id))
+    logger.info('Compacted %d metadata versions keeping the latest %d per document', total, keep_last)
+    return total
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--keep', type=int, help='Versions to keep per document; defaults to METADATA_KEEP_VERSIONS.')
+    parser.add_argument('--batch-size', type=int, help='Documents per transaction.')
+    args = parser.parse_args(argv)
+
+    configure_logging()
+    compact_metadata_versions(keep_last=args.keep, batch_size=args.batch_size)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
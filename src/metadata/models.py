@@ -5,9 +5,11 @@ from enum import Enum
 from typing import Any
 from uuid import UUID, uuid4
 
+import sqlalchemy as sa
 from pydantic import ConfigDict
-from sqlalchemy import JSON, Column, Index, UniqueConstraint
-from sqlmodel import Field, SQLModel
+from sqlalchemy import JSON, Column, Index, UniqueConstraint, text
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlmodel import Field, Relationship, SQLModel
 
 
 class JobStatus(str, Enum):
@@ -18,26 +20,22 @@ class JobStatus(str, Enum):
     CANCELED = 'canceled'
 
 
+class MetadataSource(str, Enum):
+    AGENT = 'agent'
+    MANUAL = 'manual'
+
+
 class BaseSQLModel(SQLModel):
     model_config = ConfigDict(arbitrary_types_allowed=True, from_attributes=True)  # type: ignore[bad-override]
 
 
-class Job(BaseSQLModel, table=True):
-    """Metadata processing job as persisted in the metadata.metadata_jobs table."""
+def _enum_type(enum: type[Enum]) -> sa.Enum:
+    """Store enum values such as `'queued'`, which migrations and raw SQL compare against, not member names."""
+    return sa.Enum(enum, native_enum=False, values_callable=lambda members: [member.value for member in members])
 
-    __tablename__ = 'metadata_jobs'  # type: ignore[bad-argument-type]
-    __table_args__ = (
-        UniqueConstraint(
-            'tenant_id',
-            'document_id',
-            'profile',
-            'ingestion_fingerprint',
-            name='uq_job_idempotency',
-        ),
-        Index('ix_jobs_status_priority_created', 'status', 'priority', 'created_at'),
-        Index('ix_jobs_tenant_created', 'tenant_id', 'created_at'),
-        {'schema': 'metadata'},
-    )
+
+class JobFields(BaseSQLModel):
+    """Columns shared by metadata_jobs and its archive, so the two tables cannot drift apart."""
 
     job_id: UUID = Field(default_factory=uuid4, primary_key=True)
     tenant_id: UUID
@@ -45,7 +43,7 @@ class Job(BaseSQLModel, table=True):
     document_id: UUID
     profile: str
     ingestion_fingerprint: str
-    status: JobStatus = Field(default=JobStatus.QUEUED)
+    status: JobStatus = Field(default=JobStatus.QUEUED, sa_type=_enum_type(JobStatus))
     priority: int = Field(default=5)
     retries: int = Field(default=0)
     error_type: str | None = None
@@ -58,27 +56,95 @@ class Job(BaseSQLModel, table=True):
     idempotency_key: str | None = None
     context: dict[str, Any] = Field(
         default_factory=dict,
-        sa_column=Column(JSON, nullable=False),
+        sa_type=JSON,
+        nullable=False,
         description='Context payload required by the agent.',
     )
     input_metadata: dict[str, Any] | None = Field(
         default=None,
-        sa_column=Column(JSON, nullable=True),
+        sa_type=JSON,
+        nullable=True,
         description='Optional metadata provided with the job request.',
     )
     locked_fields: list[str] = Field(
         default_factory=list,
-        sa_column=Column(JSON, nullable=False),
+        sa_type=JSON,
+        nullable=False,
         description='Metadata fields that must not be overwritten by the agent.',
     )
+    stage: str | None = Field(default=None, description='Last completed agent stage of a running job.')
+    partial_metadata: dict[str, Any] | None = Field(
+        default=None,
+        sa_type=JSON,
+        nullable=True,
+        description='Intermediate metadata persisted while the agent is still running.',
+    )
+
+
+class Job(JobFields, table=True):
+    """Metadata processing job as persisted in the metadata.metadata_jobs table."""
+
+    __tablename__ = 'metadata_jobs'  # type: ignore[bad-argument-type]
+    __table_args__ = (
+        UniqueConstraint(
+            'tenant_id',
+            'document_id',
+            'profile',
+            'ingestion_fingerprint',
+            name='uq_job_idempotency',
+        ),
+        # Terminal jobs never need the queue index, and the archiver only scans terminal jobs.
+        Index(
+            'ix_jobs_active_priority_created',
+            'status',
+            'priority',
+            'created_at',
+            postgresql_where=text("status IN ('queued', 'running')"),
+        ),
+        Index(
+            'ix_jobs_terminal_finished',
+            'finished_at',
+            postgresql_where=text("status IN ('succeeded', 'failed', 'canceled')"),
+        ),
+        Index('ix_jobs_tenant_created', 'tenant_id', 'created_at'),
+        {'schema': 'metadata'},
+    )
+
+
+class ArchivedJob(JobFields, table=True):
+    """Terminal job moved out of metadata_jobs by the archiver."""
+
+    __tablename__ = 'metadata_jobs_archive'  # type: ignore[bad-argument-type]
+    __table_args__ = (
+        Index('ix_jobs_archive_tenant_created', 'tenant_id', 'created_at'),
+        {'schema': 'metadata'},
+    )
+
+    archived_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+
+class MetadataPayload(BaseSQLModel, table=True):
+    """Metadata payload stored once per tenant and fingerprint and shared by every version with that content."""
+
+    __tablename__ = 'metadata_payloads'  # type: ignore[bad-argument-type]
+    __table_args__ = ({'schema': 'metadata'},)
+
+    tenant_id: UUID = Field(primary_key=True)
+    fingerprint: str = Field(primary_key=True)
+    payload: dict[str, Any] = Field(
+        sa_column=Column(JSON, nullable=False),
+        description='Full metadata payload as JSON.',
+    )
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 
 class DocumentMetadata(BaseSQLModel, table=True):
-    """Versioned metadata payload generated by the agent."""
+    """Versioned metadata generated by the agent or stored manually; the payload lives in MetadataPayload."""
 
     __tablename__ = 'document_metadata'  # type: ignore[bad-argument-type]
     __table_args__ = (
         Index('ix_docmeta_tenant_doc_version', 'tenant_id', 'document_id', 'version', unique=True),
+        Index('ix_docmeta_tenant_fingerprint', 'tenant_id', 'fingerprint'),
         {'schema': 'metadata'},
     )
 
@@ -87,7 +153,68 @@ class DocumentMetadata(BaseSQLModel, table=True):
     version: int = Field(primary_key=True)
     fingerprint: str
     extracted_on: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
-    payload: dict[str, Any] = Field(
-        sa_column=Column(JSON, nullable=False),
-        description='Full metadata payload as JSON.',
+    source: MetadataSource = Field(default=MetadataSource.AGENT, sa_type=_enum_type(MetadataSource))
+    pinned: bool = Field(default=False, description='Pinned versions are never removed by compaction.')
+    # Payload rows are upserted by `_store_payload`, never through this relationship.
+    content: MetadataPayload = Relationship(
+        sa_relationship_kwargs={
+            'primaryjoin': 'and_(foreign(DocumentMetadata.tenant_id) == MetadataPayload.tenant_id, '
+            'foreign(DocumentMetadata.fingerprint) == MetadataPayload.fingerprint)',
+            'lazy': 'joined',
+            'innerjoin': True,
+            'viewonly': True,
+            # Detaching a version (session.expunge) detaches its payload too, so both stay readable.
+            'cascade': 'expunge',
+        }
+    )
+
+    @property
+    def payload(self) -> dict[str, Any]:
+        return self.content.payload
+
+
+class MetadataSearchEntry(BaseSQLModel, table=True):
+    """Searchable fields of a document's latest metadata version, maintained by `record_metadata_version`."""
+
+    __tablename__ = 'metadata_search'  # type: ignore[bad-argument-type]
+    __table_args__ = (
+        Index('ix_search_tenant_type_year', 'tenant_id', 'document_type', 'reporting_year', 'document_id'),
+        Index('ix_search_tenant_register', 'tenant_id', 'register_number'),
+        # Trigram index serving both prefix and substring ILIKE matches on the company name.
+        Index(
+            'ix_search_company_trgm',
+            'company_name',
+            postgresql_using='gin',
+            postgresql_ops={'company_name': 'gin_trgm_ops'},
+        ),
+        Index('ix_search_tags', 'tags', postgresql_using='gin', postgresql_ops={'tags': 'jsonb_path_ops'}),
+        {'schema': 'metadata'},
     )
+
+    tenant_id: UUID = Field(primary_key=True)
+    document_id: UUID = Field(primary_key=True)
+    version: int
+    fingerprint: str
+    extracted_on: datetime
+    document_type: str | None = None
+    company_name: str | None = None
+    reporting_year: int | None = None
+    register_number: str | None = None
+    tags: list[str] = Field(
+        default_factory=list,
+        sa_column=Column(JSON().with_variant(JSONB(), 'postgresql'), nullable=False),
+    )
+    content: MetadataPayload = Relationship(
+        sa_relationship_kwargs={
+            'primaryjoin': 'and_(foreign(MetadataSearchEntry.tenant_id) == MetadataPayload.tenant_id, '
+            'foreign(MetadataSearchEntry.fingerprint) == MetadataPayload.fingerprint)',
+            'lazy': 'joined',
+            'innerjoin': True,
+            'viewonly': True,
+            'cascade': 'expunge',
+        }
+    )
+
+    @property
+    def payload(self) -> dict[str, Any]:
+        return self.content.payload
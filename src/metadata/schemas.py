@@ -1,13 +1,13 @@
 from __future__ import annotations
 
 import datetime as dt
-from typing import Annotated
+from typing import Annotated, Any
 from uuid import UUID, uuid5
 
 from pydantic import AnyHttpUrl, BaseModel, Field, StringConstraints, conint
 
 from agent.schemas import ContextSchema, MetadataSchema
-from metadata.models import JobStatus
+from metadata.models import JobStatus, MetadataSource
 from utils.types import SHA256B64
 
 METADATA_DOCUMENT_NAMESPACE = UUID('6e14968a-5b92-4774-a1f0-655f4eca8ef8')
@@ -63,6 +63,15 @@ class RebuildJobDTO(CreateJobDTO):
     pass
 
 
+class CreateJobBatchDTO(BaseModel):
+    jobs: list[CreateJobDTO] = Field(
+        ...,
+        min_length=1,
+        max_length=1000,
+        description='Jobs to create; documents are classified in batches before per-document extraction.',
+    )
+
+
 class ManualMetadataUpdateDTO(BaseModel):
     metadata: MetadataSchema
 
@@ -74,6 +83,10 @@ class JobCreatedResponse(BaseModel):
     result_url: str | None = None
 
 
+class JobBatchCreatedResponse(BaseModel):
+    jobs: list[JobCreatedResponse]
+
+
 class JobStatusResponse(BaseModel):
     job_id: UUID
     document_id: UUID
@@ -87,6 +100,31 @@ class JobStatusResponse(BaseModel):
     error_type: str | None = None
     error_msg: str | None = None
     result_url: str | None = None
+    stage: str | None = None
+    partial_metadata: MetadataSchema | None = None
+
+
+class JobSummary(BaseModel):
+    job_id: UUID
+    document_id: UUID
+    profile: str
+    status: JobStatus
+    retries: int
+    priority: int
+    created_at: dt.datetime
+    started_at: dt.datetime | None = None
+    finished_at: dt.datetime | None = None
+    error_type: str | None = None
+    stage: str | None = None
+    status_url: str
+
+
+class JobListResponse(BaseModel):
+    items: list[JobSummary]
+    next_cursor: str | None = Field(default=None, description='Pass as `cursor` to fetch the next page.')
+    counts: dict[JobStatus, int] | None = Field(
+        default=None, description='Jobs per status matching the filters other than `status`; first page only.'
+    )
 
 
 class MetadataVersionResponse(BaseModel):
@@ -94,9 +132,54 @@ class MetadataVersionResponse(BaseModel):
     version: int
     fingerprint: str
     extracted_on: dt.datetime
+    source: MetadataSource = MetadataSource.AGENT
+    pinned: bool = False
     metadata: MetadataSchema
 
 
+class FieldChange(BaseModel):
+    field: str
+    old: Any = None
+    new: Any = None
+
+
+class MetadataVersionHeader(BaseModel):
+    version: int
+    fingerprint: str
+    extracted_on: dt.datetime
+    source: MetadataSource
+    pinned: bool
+    changes: list[FieldChange] | None = Field(
+        default=None, description='Changes against the previous stored version; only with `include_changes`.'
+    )
+
+
+class MetadataVersionListResponse(BaseModel):
+    document_id: UUID
+    items: list[MetadataVersionHeader]
+    next_cursor: str | None = Field(default=None, description='Pass as `cursor` to fetch the next page.')
+
+
+class MetadataDiffResponse(BaseModel):
+    document_id: UUID
+    from_version: int
+    to_version: int
+    changes: list[FieldChange]
+
+
+class MetadataSearchHit(BaseModel):
+    document_id: UUID
+    version: int
+    fingerprint: str
+    extracted_on: dt.datetime
+    metadata: MetadataSchema
+
+
+class MetadataSearchResponse(BaseModel):
+    items: list[MetadataSearchHit]
+    next_cursor: str | None = Field(default=None, description='Pass as `cursor` to fetch the next page.')
+
+
 class JobCancelResponse(BaseModel):
     job_id: UUID
     status: JobStatus
@@ -2,20 +2,34 @@ from __future__ import annotations
 
 import json
 import logging
-from contextlib import contextmanager
+from collections.abc import Callable, Iterator
+from contextlib import AbstractContextManager, contextmanager
 from datetime import datetime, timezone
 from hashlib import sha256
-from typing import Sequence
+from typing import Any, Literal, Sequence
 from uuid import UUID
 
-from sqlalchemy import desc
+from sqlalchemy import and_, desc, exists, func, tuple_, type_coerce
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import lazyload
+from sqlalchemy.orm.attributes import set_committed_value
 from sqlmodel import Session, select
 from tenauth.schemas import AccessContext
 
 from agent.schemas import ContextSchema, MetadataSchema
 from core.logging import configure_logging
-from metadata.models import DocumentMetadata, Job, JobStatus
+from metadata.models import (
+    ArchivedJob,
+    DocumentMetadata,
+    Job,
+    JobStatus,
+    MetadataPayload,
+    MetadataSearchEntry,
+    MetadataSource,
+)
 from metadata.schemas import CreateJobDTO
 from utils.vstore import get_collection_uuid, pg_connect
 
@@ -88,8 +102,96 @@ def create_job(session: Session, dto: CreateJobDTO, *, access_context: AccessCon
         return existing
 
 
-def get_job(session: Session, job_id: UUID) -> Job | None:
-    return session.get(Job, job_id)
+def get_job(session: Session, job_id: UUID, *, include_archived: bool = False) -> Job | ArchivedJob | None:
+    job = session.get(Job, job_id)
+    if job is None and include_archived:
+        return session.get(ArchivedJob, job_id)
+    return job
+
+
+def _as_utc(value: datetime) -> datetime:
+    # Timestamp columns only accept aware datetimes; filters without an offset are taken as UTC.
+    return value.replace(tzinfo=timezone.utc) if value.utcoffset() is None else value
+
+
+def _job_filters(
+    model: type[Job | ArchivedJob],
+    tenant_id: UUID,
+    *,
+    profile: str | None,
+    document_id: UUID | None,
+    created_from: datetime | None,
+    created_to: datetime | None,
+) -> list:
+    conditions = [model.tenant_id == tenant_id]
+    if profile is not None:
+        conditions.append(model.profile == profile)
+    if document_id is not None:
+        conditions.append(model.document_id == document_id)
+    if created_from is not None:
+        conditions.append(model.created_at >= _as_utc(created_from))
+    if created_to is not None:
+        conditions.append(model.created_at < _as_utc(created_to))
+    return conditions
+
+
+def list_jobs(
+    session: Session,
+    *,
+    tenant_id: UUID,
+    statuses: Sequence[JobStatus] = (),
+    profile: str | None = None,
+    document_id: UUID | None = None,
+    created_from: datetime | None = None,
+    created_to: datetime | None = None,
+    before: tuple[datetime, UUID] | None = None,
+    limit: int = 50,
+    include_archived: bool = False,
+) -> list[Job | ArchivedJob]:
+    """Return jobs newest first, continuing after the `(created_at, job_id)` keyset `before`.
+
+    The tenant and creation-window filters and the ordering are served by `ix_jobs_tenant_created`. With
+    `include_archived`, the same page is also read from the archive through `ix_jobs_archive_tenant_created`
+    and the two pages are merged.
+    """
+    jobs: list[Job | ArchivedJob] = []
+    for model in (Job, ArchivedJob) if include_archived else (Job,):
+        conditions = _job_filters(
+            model, tenant_id, profile=profile, document_id=document_id, created_from=created_from, created_to=created_to
+        )
+        if statuses:
+            conditions.append(model.status.in_(statuses))
+        if before is not None:
+            conditions.append(tuple_(model.created_at, model.job_id) < tuple_(_as_utc(before[0]), before[1]))
+        stmt = select(model).where(*conditions).order_by(desc(model.created_at), desc(model.job_id)).limit(limit)
+        jobs.extend(session.exec(stmt).all())
+
+    for job in jobs:
+        session.expunge(job)
+    jobs.sort(key=lambda job: (job.created_at, job.job_id), reverse=True)
+    return jobs[:limit]
+
+
+def count_jobs_by_status(
+    session: Session,
+    *,
+    tenant_id: UUID,
+    profile: str | None = None,
+    document_id: UUID | None = None,
+    created_from: datetime | None = None,
+    created_to: datetime | None = None,
+    include_archived: bool = False,
+) -> dict[JobStatus, int]:
+    """Count matching jobs per status with one grouped query per table; statuses without jobs count as zero."""
+    counts = dict.fromkeys(JobStatus, 0)
+    for model in (Job, ArchivedJob) if include_archived else (Job,):
+        conditions = _job_filters(
+            model, tenant_id, profile=profile, document_id=document_id, created_from=created_from, created_to=created_to
+        )
+        rows = session.exec(select(model.status, func.count()).where(*conditions).group_by(model.status)).all()
+        for status, count in rows:
+            counts[JobStatus(status)] += count
+    return counts
 
 
 def cancel_job(session: Session, job: Job) -> Job:
@@ -104,6 +206,17 @@ def cancel_job(session: Session, job: Job) -> Job:
     return job
 
 
+def record_partial_result(session: Session, job_id: UUID, *, stage: str, metadata: MetadataSchema) -> bool:
+    """Store intermediate metadata on a running job; returns False when the job is no longer running."""
+    job = session.get(Job, job_id)
+    if job is None or job.status != JobStatus.RUNNING:
+        return False
+    job.stage = stage
+    job.partial_metadata = metadata.model_dump(mode='json', exclude_none=True)
+    session.add(job)
+    return True
+
+
 def merge_metadata(
     *,
     base: MetadataSchema | None,
@@ -143,6 +256,31 @@ def metadata_fingerprint(metadata: MetadataSchema) -> str:
     return _fingerprint_from_payload(payload)
 
 
+def _insert(session: Session):
+    """Dialect `insert` with ON CONFLICT support; SQLite only backs the test suite."""
+    return postgresql_insert if session.get_bind().dialect.name == 'postgresql' else sqlite_insert
+
+
+def _store_payload(session: Session, *, tenant_id: UUID, fingerprint: str, payload: dict) -> MetadataPayload:
+    """Insert the payload unless one with the same fingerprint exists; identical content is written once.
+
+    An existing row is touched with a no-op update rather than skipped so it stays row-locked until the
+    transaction commits; compaction would otherwise be free to delete a payload this version is about to
+    reference.
+    """
+    insert = _insert(session)
+    content = MetadataPayload(tenant_id=tenant_id, fingerprint=fingerprint, payload=payload)
+    stmt = insert(MetadataPayload).values(
+        tenant_id=tenant_id, fingerprint=fingerprint, payload=payload, created_at=content.created_at
+    )
+    session.execute(
+        stmt.on_conflict_do_update(
+            index_elements=['tenant_id', 'fingerprint'], set_={'fingerprint': stmt.excluded.fingerprint}
+        )
+    )
+    return content
+
+
 def record_metadata_version(
     session: Session,
     *,
@@ -150,6 +288,7 @@ def record_metadata_version(
     document_id: UUID,
     metadata: MetadataSchema | None,
     fingerprint: str | None = None,
+    source: MetadataSource = MetadataSource.AGENT,
 ) -> DocumentMetadata:
     version = next_metadata_version(session, tenant_id, document_id)
 
@@ -160,18 +299,45 @@ def record_metadata_version(
         payload = metadata.model_dump(mode='json')
         fp = fingerprint or metadata_fingerprint(metadata)
 
+    content = _store_payload(session, tenant_id=tenant_id, fingerprint=fp, payload=payload)
     record = DocumentMetadata(
         tenant_id=tenant_id,
         document_id=document_id,
         version=version,
         fingerprint=fp,
-        payload=payload,
+        source=source,
     )
     session.add(record)
     session.flush()
+    set_committed_value(record, 'content', content)
+    _index_latest_version(session, record, payload)
     return record
 
 
+def _index_latest_version(session: Session, record: DocumentMetadata, payload: dict) -> None:
+    """Point the document's search entry at `record` unless a newer version is already indexed."""
+    values = {
+        'tenant_id': record.tenant_id,
+        'document_id': record.document_id,
+        'version': record.version,
+        'fingerprint': record.fingerprint,
+        'extracted_on': record.extracted_on,
+        'document_type': payload.get('document_type'),
+        'company_name': payload.get('company_name'),
+        'reporting_year': payload.get('reporting_year'),
+        'register_number': payload.get('register_number'),
+        'tags': payload.get('tags') or [],
+    }
+    stmt = _insert(session)(MetadataSearchEntry).values(**values)
+    session.execute(
+        stmt.on_conflict_do_update(
+            index_elements=['tenant_id', 'document_id'],
+            set_={key: stmt.excluded[key] for key in values if key not in {'tenant_id', 'document_id'}},
+            where=MetadataSearchEntry.version < stmt.excluded.version,
+        )
+    )
+
+
 def fetch_document_metadata(
     session: Session,
     *,
@@ -210,6 +376,166 @@ def fetch_document_metadata(
     return record
 
 
+def list_metadata_versions(
+    session: Session,
+    *,
+    tenant_id: UUID,
+    document_id: UUID,
+    before_version: int | None = None,
+    limit: int = 50,
+) -> list[DocumentMetadata]:
+    """Return version headers newest first, without loading their payloads."""
+    stmt = (
+        select(DocumentMetadata)
+        .options(lazyload(DocumentMetadata.content))  # type: ignore[arg-type]
+        .where(DocumentMetadata.tenant_id == tenant_id, DocumentMetadata.document_id == document_id)
+    )
+    if before_version is not None:
+        stmt = stmt.where(DocumentMetadata.version < before_version)
+    versions = list(session.exec(stmt.order_by(desc(DocumentMetadata.version)).limit(limit)).all())
+    for version in versions:
+        session.expunge(version)
+    return versions
+
+
+def version_fingerprints(
+    session: Session, *, tenant_id: UUID, document_id: UUID, versions: Sequence[int]
+) -> dict[int, str]:
+    """Map each stored version in `versions` to its fingerprint; missing versions are left out."""
+    stmt = select(DocumentMetadata.version, DocumentMetadata.fingerprint).where(
+        DocumentMetadata.tenant_id == tenant_id,
+        DocumentMetadata.document_id == document_id,
+        DocumentMetadata.version.in_(set(versions)),  # type: ignore[attr-defined]
+    )
+    return {version: fingerprint for version, fingerprint in session.exec(stmt).all()}
+
+
+def load_payloads(session: Session, *, tenant_id: UUID, fingerprints: Sequence[str]) -> dict[str, dict]:
+    """Load the payloads of `fingerprints` in one query; versions with equal content share one row."""
+    if not fingerprints:
+        return {}
+    stmt = select(MetadataPayload).where(
+        MetadataPayload.tenant_id == tenant_id,
+        MetadataPayload.fingerprint.in_(set(fingerprints)),  # type: ignore[attr-defined]
+    )
+    return {content.fingerprint: content.payload for content in session.exec(stmt).all()}
+
+
+def diff_payloads(old: dict[str, Any] | None, new: dict[str, Any]) -> list[tuple[str, Any, Any]]:
+    """Field-level changes from `old` to `new` as `(field, old_value, new_value)`, in field order."""
+    old = old or {}
+    fields = list(new) + [field for field in old if field not in new]
+    return [(field, old.get(field), new.get(field)) for field in fields if old.get(field) != new.get(field)]
+
+
+def iter_metadata_export(
+    open_session: Callable[[], AbstractContextManager[Session]],
+    *,
+    tenant_id: UUID,
+    scope: Literal['latest', 'all'] = 'latest',
+    after: tuple[UUID, int] | None = None,
+    batch_size: int = 1000,
+) -> Iterator[tuple[UUID, int, str, datetime, MetadataSource, dict[str, Any]]]:
+    """Yield `(document_id, version, fingerprint, extracted_on, source, payload)` ordered by document and version.
+
+    Rows are fetched `batch_size` at a time and never become ORM objects, so memory stays flat however many
+    versions the tenant has. Each page is read in its own short session from `open_session` and the next one
+    is queried behind the last row's keyset, so a slow download never holds a transaction open on the
+    replica. `after` resumes behind that keyset.
+    """
+    stmt = (
+        select(
+            DocumentMetadata.document_id,
+            DocumentMetadata.version,
+            DocumentMetadata.fingerprint,
+            DocumentMetadata.extracted_on,
+            DocumentMetadata.source,
+            MetadataPayload.payload,
+        )
+        .join(
+            MetadataPayload,
+            and_(
+                MetadataPayload.tenant_id == DocumentMetadata.tenant_id,
+                MetadataPayload.fingerprint == DocumentMetadata.fingerprint,
+            ),
+        )
+        .where(DocumentMetadata.tenant_id == tenant_id)
+    )
+    if scope == 'latest':
+        # The search index holds exactly one row per document, pointing at its latest version.
+        stmt = stmt.join(
+            MetadataSearchEntry,
+            and_(
+                MetadataSearchEntry.tenant_id == DocumentMetadata.tenant_id,
+                MetadataSearchEntry.document_id == DocumentMetadata.document_id,
+                MetadataSearchEntry.version == DocumentMetadata.version,
+            ),
+        )
+    stmt = stmt.order_by(DocumentMetadata.document_id, DocumentMetadata.version).limit(batch_size)
+    while True:
+        page = stmt
+        if after is not None:
+            page = page.where(tuple_(DocumentMetadata.document_id, DocumentMetadata.version) > tuple_(*after))
+        with open_session() as session:
+            rows = session.exec(page).all()
+        yield from rows
+        if len(rows) < batch_size:
+            return
+        after = (rows[-1][0], rows[-1][1])
+
+
+def _escape_like(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def _has_tags(session: Session, tags: Sequence[str]):
+    if session.get_bind().dialect.name == 'postgresql':
+        # JSONB containment, served by the GIN index on tags.
+        return type_coerce(MetadataSearchEntry.tags, JSONB).contains(list(tags))
+    conditions = []
+    for tag in tags:
+        elements = func.json_each(MetadataSearchEntry.tags).table_valued('value')
+        conditions.append(exists().select_from(elements).where(elements.c.value == tag))
+    return and_(*conditions)
+
+
+def search_latest_metadata(
+    session: Session,
+    *,
+    tenant_id: UUID,
+    document_type: str | None = None,
+    company_name: str | None = None,
+    company_match: Literal['prefix', 'contains'] = 'prefix',
+    reporting_year: int | None = None,
+    register_number: str | None = None,
+    tags: Sequence[str] = (),
+    after_document_id: UUID | None = None,
+    limit: int = 50,
+) -> list[MetadataSearchEntry]:
+    """Return latest metadata versions matching all given filters, ordered by document id."""
+    stmt = select(MetadataSearchEntry).where(MetadataSearchEntry.tenant_id == tenant_id)
+    if document_type is not None:
+        stmt = stmt.where(MetadataSearchEntry.document_type == document_type)
+    if company_name:
+        pattern = _escape_like(company_name) + '%'
+        if company_match == 'contains':
+            pattern = '%' + pattern
+        stmt = stmt.where(MetadataSearchEntry.company_name.ilike(pattern, escape='\\'))
+    if reporting_year is not None:
+        stmt = stmt.where(MetadataSearchEntry.reporting_year == reporting_year)
+    if register_number is not None:
+        stmt = stmt.where(MetadataSearchEntry.register_number == register_number)
+    if tags:
+        stmt = stmt.where(_has_tags(session, tags))
+    if after_document_id is not None:
+        stmt = stmt.where(MetadataSearchEntry.document_id > after_document_id)
+
+    entries = list(session.exec(stmt.order_by(MetadataSearchEntry.document_id).limit(limit)).all())
+    for entry in entries:
+        session.expunge(entry)
+    return entries
+
+
 def manual_metadata_update(
     session: Session,
     *,
@@ -219,9 +545,17 @@ def manual_metadata_update(
 ) -> DocumentMetadata:
     """Persist a manual metadata version, skipping agent processing."""
     fingerprint = metadata_fingerprint(metadata)
-    existing = fetch_document_metadata(session, tenant_id=tenant_id, document_id=document_id, version='latest')
-    if existing and existing.fingerprint == fingerprint:
-        return existing
+    # Compare fingerprints first; the payload is only loaded when the update turns out to be a no-op.
+    latest_fingerprint = session.exec(
+        select(DocumentMetadata.fingerprint)
+        .where(DocumentMetadata.tenant_id == tenant_id, DocumentMetadata.document_id == document_id)
+        .order_by(desc(DocumentMetadata.version))
+        .limit(1)
+    ).first()
+    if latest_fingerprint == fingerprint:
+        existing = fetch_document_metadata(session, tenant_id=tenant_id, document_id=document_id, version='latest')
+        if existing is not None:
+            return existing
 
     record = record_metadata_version(
         session,
@@ -229,6 +563,7 @@ def manual_metadata_update(
         document_id=document_id,
         metadata=metadata,
         fingerprint=fingerprint,
+        source=MetadataSource.MANUAL,
     )
     session.commit()
     session.refresh(record)
@@ -236,6 +571,27 @@ def manual_metadata_update(
     return record
 
 
+def set_metadata_version_pinned(
+    session: Session,
+    *,
+    tenant_id: UUID,
+    document_id: UUID,
+    version: int,
+    pinned: bool,
+) -> DocumentMetadata | None:
+    """Pin or unpin a metadata version; pinned versions are kept by compaction."""
+    record = session.get(DocumentMetadata, (tenant_id, document_id, version))
+    if record is None:
+        return None
+    if record.pinned != pinned:
+        record.pinned = pinned
+        session.add(record)
+        session.commit()
+        session.refresh(record)
+    session.expunge(record)
+    return record
+
+
 @contextmanager
 def _vectorstore_connection(tenant_id: UUID):
     conn = pg_connect(tenant_id)
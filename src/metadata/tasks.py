@@ -1,23 +1,38 @@
 from __future__ import annotations
 
 import logging
+import threading
+from collections import defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor
 from dataclasses import dataclass
 from datetime import datetime, timezone
+from typing import Any, Callable, Sequence
 from uuid import UUID
 
 import dramatiq
+from langchain_core.runnables import RunnableConfig
+from langgraph.graph.state import CompiledStateGraph
+from sqlmodel import select
 from tenauth.schemas import AccessContext
 
-from agent.graph import graph
+from agent.batch import classify_documents
+from agent.budget import DEADLINE_KEY, job_deadline, recursion_limit
+from agent.models import MODEL_KEY
+from agent.nodes import first_chunks_state
+from agent.profiles import AgentProfile, get_profile
 from agent.schemas import ContextSchema, MetadataSchema
+from agent.tools import fetch_first_chunks
+from core.checkpoints import delete_checkpoints, get_checkpointer
+from core.config import get_settings
 from core.db import session_scope
 from core.logging import configure_logging
-from core.queueing import setup_broker
+from core.queueing import on_worker_shutdown, setup_broker
 from metadata.models import Job, JobStatus
 from metadata.service import (
     merge_metadata,
     metadata_fingerprint,
     record_metadata_version,
+    record_partial_result,
     update_vecstore_metadata,
 )
 
@@ -25,11 +40,19 @@ configure_logging()
 setup_broker()
 logger = logging.getLogger(__name__)
 
+_checkpointed_graphs: dict[str, CompiledStateGraph] = {}
+
+ProgressCallback = Callable[[str, MetadataSchema], None]
+
+_prefetch_executor: ThreadPoolExecutor | None = None
+_prefetch_lock = threading.Lock()
+
 
 @dataclass(frozen=True, slots=True)
 class JobSnapshot:
     job_id: UUID
     document_id: UUID
+    profile: str
 
 
 def _load_job(
@@ -48,7 +71,7 @@ def _load_job(
         job.error_msg = None
         session.add(job)
         session.flush()
-        snapshot = JobSnapshot(job_id=job.job_id, document_id=job.document_id)
+        snapshot = JobSnapshot(job_id=job.job_id, document_id=job.document_id, profile=job.profile)
         context = ContextSchema.model_validate(job.context)
         base_metadata = (
             MetadataSchema.model_validate(job.input_metadata)
@@ -59,9 +82,92 @@ def _load_job(
     return snapshot, context, base_metadata, locked_fields
 
 
-def _run_agent(context: ContextSchema) -> MetadataSchema | None:
+def _agent_graph(profile: AgentProfile) -> CompiledStateGraph:
+    """Return the profile graph, bound to the Postgres checkpointer when one is configured."""
+    checkpointer = get_checkpointer()
+    if checkpointer is None:
+        return profile.graph
+    if profile.name not in _checkpointed_graphs:
+        _checkpointed_graphs[profile.name] = profile.graph.copy(update={'checkpointer': checkpointer})
+    return _checkpointed_graphs[profile.name]
+
+
+def _partial_candidate(values: dict[str, Any]) -> MetadataSchema | None:
+    metadata = values.get('metadata')
+    document_type = values.get('document_type')
+    if metadata is None and not document_type:
+        return None
+    metadata = metadata or MetadataSchema()
+    if document_type:
+        metadata = metadata.model_copy(update={'document_type': document_type})
+    return metadata
+
+
+def _stream(
+    graph: CompiledStateGraph,
+    graph_input: dict[str, Any] | None,
+    config: RunnableConfig,
+    on_progress: ProgressCallback | None,
+) -> Any:
+    """Run the graph step by step, reporting the metadata candidate whenever a stage changes it."""
+    values: dict[str, Any] = {}
+    stages: list[str] = []
+    reported: MetadataSchema | None = None
+    for mode, chunk in graph.stream(graph_input, config=config, stream_mode=['updates', 'values']):
+        if mode == 'updates':
+            stages.extend(chunk)
+            continue
+        values = chunk
+        candidate = _partial_candidate(values)
+        # The first values chunk only echoes the input; report once a stage has run.
+        if on_progress is not None and stages and candidate is not None and candidate != reported:
+            on_progress(', '.join(stages), candidate)
+            reported = candidate
+        stages = []
+    return values.get('metadata')
+
+
+def _invoke_or_resume(
+    graph: CompiledStateGraph,
+    config: RunnableConfig,
+    initial_state: dict[str, Any],
+    on_progress: ProgressCallback | None = None,
+) -> Any:
+    """Start a fresh run, resume an interrupted one, or reuse the state of a finished one."""
+    if graph.checkpointer is None:
+        return _stream(graph, initial_state, config, on_progress)
+
+    snapshot = graph.get_state(config)
+    if not snapshot.values:
+        return _stream(graph, initial_state, config, on_progress)
+    thread_id = config['configurable']['thread_id']
+    if snapshot.next:
+        logger.info('Resuming agent run %s at %s', thread_id, ', '.join(snapshot.next))
+        return _stream(graph, None, config, on_progress)
+    logger.info('Reusing completed agent run %s', thread_id)
+    return snapshot.values.get('metadata')
+
+
+def _run_agent(
+    job_id: UUID,
+    context: ContextSchema,
+    profile_name: str,
+    initial_state: dict[str, Any] | None = None,
+    on_progress: ProgressCallback | None = None,
+) -> MetadataSchema | None:
+    profile = get_profile(profile_name)
+    initial_state = initial_state or {}
+    config: RunnableConfig = {
+        'configurable': {
+            **context.model_dump(),
+            'thread_id': str(job_id),
+            DEADLINE_KEY: job_deadline(),
+            MODEL_KEY: profile.models,
+        },
+        'recursion_limit': recursion_limit(),
+    }
     try:
-        result = graph.invoke({}, config={'configurable': context.model_dump()})
+        result = _invoke_or_resume(_agent_graph(profile), config, initial_state, on_progress)
     except Exception:  # pragma: no cover - external dependency
         logger.exception('Metadata agent failed: context=%s', context)
         raise
@@ -73,6 +179,115 @@ def _run_agent(context: ContextSchema) -> MetadataSchema | None:
     return MetadataSchema.model_validate(result or {})
 
 
+def _classify_batch(
+    job_ids: Sequence[UUID], access_context: AccessContext
+) -> tuple[dict[str, str | None], dict[str, dict[str, Any]]]:
+    """Classify the pending jobs of one tenant with one LLM call per profile, on that profile's model route.
+
+    Returns the document type and the agent context per pending job. Jobs missing from the document types
+    classify themselves, e.g. when the call for their profile fails.
+    """
+    settings = get_settings()
+    job_contexts: dict[str, dict[str, Any]] = {}
+    with session_scope(access_context=access_context) as session:
+        jobs = session.exec(select(Job).where(Job.job_id.in_(job_ids))).all()
+        contexts_by_profile: dict[str, dict[str, ContextSchema]] = defaultdict(dict)
+        for job in jobs:
+            if job.status not in {JobStatus.SUCCEEDED, JobStatus.CANCELED}:
+                job_contexts[str(job.job_id)] = job.context
+                contexts_by_profile[job.profile][str(job.job_id)] = ContextSchema.model_validate(job.context)
+
+    document_types: dict[str, str | None] = {}
+    for profile_name, contexts in contexts_by_profile.items():
+        try:
+            excerpts = {
+                job_id: fetch_first_chunks(
+                    context,
+                    k=settings.agent_prefetch_chunk_count,
+                    timeout_secs=settings.agent_tool_timeout_secs,
+                ).page_content
+                for job_id, context in contexts.items()
+            }
+            config: RunnableConfig = {
+                'configurable': {DEADLINE_KEY: job_deadline(), MODEL_KEY: get_profile(profile_name).models}
+            }
+            document_types.update(classify_documents(excerpts, config))
+        except Exception:  # noqa: BLE001 - jobs classify themselves when the batch call fails
+            logger.exception('Batch classification of %d %s jobs failed', len(contexts), profile_name)
+    return document_types, job_contexts
+
+
+def _get_prefetch_executor() -> ThreadPoolExecutor:
+    global _prefetch_executor
+    with _prefetch_lock:
+        if _prefetch_executor is None:
+            _prefetch_executor = ThreadPoolExecutor(
+                max_workers=get_settings().agent_prefetch_max_workers, thread_name_prefix='prefetch'
+            )
+        return _prefetch_executor
+
+
+def shutdown_prefetch_executor() -> None:
+    """Stop the prefetch threads; queued prefetches are dropped since their jobs are not processed any more."""
+    global _prefetch_executor
+    with _prefetch_lock:
+        if _prefetch_executor is not None:
+            _prefetch_executor.shutdown(wait=False, cancel_futures=True)
+            _prefetch_executor = None
+
+
+on_worker_shutdown(shutdown_prefetch_executor)
+
+
+def _prefetch_first_chunks(context: ContextSchema) -> str:
+    settings = get_settings()
+    return fetch_first_chunks(
+        context,
+        k=settings.agent_prefetch_chunk_count,
+        timeout_secs=settings.agent_tool_timeout_secs,
+    ).page_content
+
+
+def _initial_state(
+    profile_name: str,
+    context: ContextSchema,
+    document_type: str | None,
+    prefetch: Future[str] | None,
+    prefetch_context: ContextSchema | None,
+) -> dict[str, Any]:
+    """Seed the batch-classified document type and the chunks prefetched while the job was loading."""
+    state: dict[str, Any] = {'document_type': document_type} if document_type else {}
+    if prefetch is None:
+        return state
+    if prefetch_context != context or 'prefetch_chunks' not in get_profile(profile_name).graph.nodes:
+        prefetch.cancel()
+        return state
+    try:
+        state.update(first_chunks_state(prefetch.result()))
+    except Exception:  # noqa: BLE001 - the prefetch_chunks node fetches the chunks itself
+        logger.warning('Prefetching first chunks failed; the agent will fetch them', exc_info=True)
+    return state
+
+
+def _progress_recorder(
+    job_id: UUID,
+    access_context: AccessContext,
+    base_metadata: MetadataSchema | None,
+    locked_fields: list[str],
+) -> ProgressCallback:
+    """Persist each intermediate candidate on the job row so clients can show it before the run ends."""
+
+    def record(stage: str, candidate: MetadataSchema) -> None:
+        partial = merge_metadata(base=base_metadata, generated=candidate, locked_fields=locked_fields)
+        try:
+            with session_scope(access_context=access_context) as session:
+                record_partial_result(session, job_id, stage=stage, metadata=partial)
+        except Exception:  # noqa: BLE001 - progress is best effort and must not fail the run
+            logger.exception('Failed persisting partial result for job %s', job_id)
+
+    return record
+
+
 def _finalise_success(
     job_id: UUID,
     *,
@@ -103,31 +318,48 @@ def _finalise_success(
         session.add(job)
 
 
-def _finalise_failure(job_id: UUID, exc: Exception, access_context: AccessContext) -> None:
+def _finalise_failure(job_id: UUID, exc: Exception, access_context: AccessContext) -> bool:
+    """Mark the job failed; returns False when it was canceled or removed, so it will not be resubmitted."""
     with session_scope(access_context=access_context) as session:
         job = session.get(Job, job_id)
         if job is None:
-            return
+            return False
+        if job.status == JobStatus.CANCELED:
+            logger.info('Job %s was canceled; keep the canceled status', job_id)
+            return False
         job.status = JobStatus.FAILED
         job.finished_at = datetime.now(timezone.utc)
         job.retries += 1
         job.error_type = exc.__class__.__name__
         job.error_msg = str(exc)
         session.add(job)
+    return True
 
 
-def _process_job(job_id: UUID, access_context: AccessContext) -> None:
+def _process_job(
+    job_id: UUID,
+    access_context: AccessContext,
+    document_type: str | None = None,
+    prefetch_context: ContextSchema | None = None,
+) -> None:
+    # The first chunks only depend on the job context, so fetch them while the job row is being loaded.
+    prefetch = _get_prefetch_executor().submit(_prefetch_first_chunks, prefetch_context) if prefetch_context else None
     try:
         snapshot, context, base_metadata, locked_fields = _load_job(job_id, access_context)
     except LookupError as exc:  # pragma: no cover - defensive
         logger.warning(str(exc))
+        delete_checkpoints(str(job_id))
         return
 
     document_id = snapshot.document_id
     metadata_candidate: MetadataSchema | None = None
-    logger.info('Processing metadata job %s for document %s', snapshot.job_id, document_id)
+    logger.info(
+        'Processing metadata job %s for document %s with profile %s', snapshot.job_id, document_id, snapshot.profile
+    )
     try:
-        metadata_candidate = _run_agent(context)
+        initial_state = _initial_state(snapshot.profile, context, document_type, prefetch, prefetch_context)
+        on_progress = _progress_recorder(snapshot.job_id, access_context, base_metadata, locked_fields)
+        metadata_candidate = _run_agent(snapshot.job_id, context, snapshot.profile, initial_state, on_progress)
         merged = merge_metadata(
             base=base_metadata,
             generated=metadata_candidate,
@@ -141,21 +373,52 @@ def _process_job(job_id: UUID, access_context: AccessContext) -> None:
             fingerprint=fingerprint,
             access_context=access_context,
         )
+        delete_checkpoints(str(snapshot.job_id))
         logger.info('Metadata job %s completed successfully with fingerprint %s', snapshot.job_id, fingerprint)
     except Exception as exc:  # noqa: BLE001 - capture all failures for job bookkeeping
         if metadata_candidate is None:
             logger.exception('Job %s failed during metadata generation', job_id)
         else:
             logger.exception('Job %s failed during persistence', job_id)
-        _finalise_failure(snapshot.job_id, exc, access_context)
+        # Failed jobs keep their checkpoints so a resubmission resumes; `core.checkpoints` sweeps stale ones.
+        if not _finalise_failure(snapshot.job_id, exc, access_context):
+            delete_checkpoints(str(snapshot.job_id))
+
+
+@dramatiq.actor
+def process_metadata_job(
+    job_id: str,
+    tenant_id: str,
+    user_id: str,
+    document_type: str | None = None,
+    context: dict[str, Any] | None = None,
+) -> None:
+    access_context = AccessContext(tenant_id=UUID(tenant_id), user_id=UUID(user_id))
+    prefetch_context = ContextSchema.model_validate(context) if context else None
+    _process_job(UUID(job_id), access_context, document_type, prefetch_context)
 
 
 @dramatiq.actor
-def process_metadata_job(job_id: str, tenant_id: str, user_id: str) -> None:
+def classify_metadata_batch(job_ids: list[str], tenant_id: str, user_id: str) -> None:
+    """Classify a batch of jobs in one call, then process each job with its document type seeded.
+
+    Each job is sent with its agent context so the worker prefetches its chunks, as for a single job.
+    """
     access_context = AccessContext(tenant_id=UUID(tenant_id), user_id=UUID(user_id))
-    _process_job(UUID(job_id), access_context)
+    document_types, contexts = _classify_batch([UUID(job_id) for job_id in job_ids], access_context)
+    for job_id in job_ids:
+        process_metadata_job.send(job_id, tenant_id, user_id, document_types.get(job_id), contexts.get(job_id))
 
 
-def enqueue_job(job_id: UUID, tenant_id: UUID, user_id: UUID) -> None:
-    process_metadata_job.send(str(job_id), str(tenant_id), str(user_id))
+def enqueue_job(job_id: UUID, tenant_id: UUID, user_id: UUID, *, context: dict[str, Any] | None = None) -> None:
+    """Enqueue a job; passing its agent context lets the worker prefetch chunks while loading the job."""
+    process_metadata_job.send(str(job_id), str(tenant_id), str(user_id), None, context)
     logger.info('Enqueued metadata job %s', job_id)
+
+
+def enqueue_batch(job_ids: Sequence[UUID], tenant_id: UUID, user_id: UUID) -> None:
+    size = get_settings().agent_batch_size
+    for start in range(0, len(job_ids), size):
+        batch = [str(job_id) for job_id in job_ids[start : start + size]]
+        classify_metadata_batch.send(batch, str(tenant_id), str(user_id))
+    logger.info('Enqueued %d metadata jobs for batch classification', len(job_ids))
@@ -0,0 +1,22 @@
+from __future__ import annotations
+
+import json
+import zlib
+from collections.abc import Iterable, Iterator
+from typing import Any
+
+
+def gzip_ndjson(records: Iterable[dict[str, Any]], *, flush_every: int = 1000) -> Iterator[bytes]:
+    """Encode `records` as gzip-compressed NDJSON, one chunk at a time.
+
+    The stream is sync-flushed every `flush_every` records, so a client that loses the connection can
+    still decompress every complete line it received.
+    """
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+    for count, record in enumerate(records, start=1):
+        chunk = compressor.compress(json.dumps(record, separators=(',', ':')).encode() + b'\n')
+        if count % flush_every == 0:
+            chunk += compressor.flush(zlib.Z_SYNC_FLUSH)
+        if chunk:
+            yield chunk
+    yield compressor.flush()
@@ -0,0 +1,20 @@
+from __future__ import annotations
+
+import base64
+import json
+
+
+def encode_cursor(*values: str) -> str:
+    """Encode the sort key of the last returned row as an opaque keyset-pagination cursor."""
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str, size: int) -> list[str]:
+    """Decode a cursor produced by `encode_cursor`; raises ValueError when it is malformed."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (ValueError, TypeError) as exc:
+        raise ValueError('Malformed cursor') from exc
+    if not isinstance(values, list) or len(values) != size or not all(isinstance(value, str) for value in values):
+        raise ValueError('Malformed cursor')
+    return values
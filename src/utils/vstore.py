@@ -6,6 +6,7 @@ from langchain_postgres import PGVector
 from tenauth.tenancy import dsn_with_tenant
 
 from core.config import get_settings
+from core.http import get_async_http_client, get_http_client
 
 settings = get_settings()
 
@@ -32,7 +33,7 @@ def get_collection_uuid(conn, collection_name: str) -> str:
         return row[0]
 
 
-def get_vectorstore(*, collection_name: str, tenant_id: UUID) -> PGVector:
+def get_vectorstore(*, collection_name: str, tenant_id: UUID, timeout: float | None = None) -> PGVector:
     """Create and return a PGVector instance lazily.
 
     This avoids importing DB drivers or creating connections at module import time,
@@ -40,5 +41,10 @@ def get_vectorstore(*, collection_name: str, tenant_id: UUID) -> PGVector:
     """
     dsn = settings.pg_vector_url.get_secret_value()
     tenant_dsn = dsn_with_tenant(dsn, tenant_id)
-    embeddings = OpenAIEmbeddings(model='text-embedding-3-small')
+    embeddings = OpenAIEmbeddings(
+        model='text-embedding-3-small',
+        timeout=timeout,
+        http_client=get_http_client(),
+        http_async_client=get_async_http_client(),
+    )
     return PGVector(embeddings=embeddings, collection_name=collection_name, connection=tenant_dsn)
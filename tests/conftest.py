@@ -15,6 +15,15 @@ def anyio_backend():
     return 'asyncio'
 
 
+@pytest.fixture(scope='session')
+def postgres_url() -> str:
+    """Scratch PostgreSQL database for tests of raw SQL; set TEST_POSTGRES_URL (a libpq URL) to run them."""
+    url = os.environ.get('TEST_POSTGRES_URL')
+    if not url:
+        pytest.skip('TEST_POSTGRES_URL not set; skipping PostgreSQL tests')
+    return url
+
+
 def pytest_collection_modifyitems(config, items):
     # Skip tests that require LangSmith if no API key is configured
     if not os.environ.get('LANGSMITH_API_KEY'):
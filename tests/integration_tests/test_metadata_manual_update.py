@@ -1,5 +1,7 @@
 import importlib
+import json
 import sys
+from contextlib import contextmanager
 from pathlib import Path
 from types import SimpleNamespace
 from uuid import uuid4
@@ -10,8 +12,7 @@ from sqlmodel import Session, create_engine
 from tenauth.schemas import AccessContext
 
 from core.config import get_settings
-from metadata import api as metadata_api
-from metadata.models import DocumentMetadata, Job
+from metadata.models import DocumentMetadata, Job, MetadataPayload, MetadataSearchEntry
 
 
 class _DummyBroker:
@@ -51,6 +52,8 @@ def client(monkeypatch: pytest.MonkeyPatch, tmp_path: Path):
     monkeypatch.setattr(queueing, 'broker', _DummyBroker())
 
     main = importlib.import_module('main')
+    # `main` re-imported the API module; overrides must target its dependency functions.
+    metadata_api = importlib.import_module('metadata.api')
     app = main.create_app()
 
     engine = create_engine(
@@ -61,10 +64,16 @@ def client(monkeypatch: pytest.MonkeyPatch, tmp_path: Path):
     original_job_schema = Job.__table__.schema  # type: ignore[missing-attribute]
     original_doc_schema = DocumentMetadata.__table__.schema  # type: ignore[missing-attribute]
     Job.__table__.schema = None  # type: ignore[missing-attribute]
+    original_payload_schema = MetadataPayload.__table__.schema  # type: ignore[missing-attribute]
     DocumentMetadata.__table__.schema = None  # type: ignore[missing-attribute]
+    MetadataPayload.__table__.schema = None  # type: ignore[missing-attribute]
+    original_search_schema = MetadataSearchEntry.__table__.schema  # type: ignore[missing-attribute]
+    MetadataSearchEntry.__table__.schema = None  # type: ignore[missing-attribute]
 
     Job.__table__.create(engine)  # type:ignore[missing-attribute]
     DocumentMetadata.__table__.create(engine)  # type:ignore[missing-attribute]
+    MetadataPayload.__table__.create(engine)  # type:ignore[missing-attribute]
+    MetadataSearchEntry.__table__.create(engine)  # type:ignore[missing-attribute]
 
     tenant_id = uuid4()
     user_id = uuid4()
@@ -82,15 +91,21 @@ def client(monkeypatch: pytest.MonkeyPatch, tmp_path: Path):
 
     app.dependency_overrides[metadata_api.require_access_context] = override_access_context
     app.dependency_overrides[metadata_api.get_scoped_session] = override_scoped_session
+    app.dependency_overrides[metadata_api.get_read_session] = override_scoped_session
+    app.dependency_overrides[metadata_api.get_read_session_factory] = lambda: contextmanager(override_scoped_session)
 
     with TestClient(app) as test_client:
         yield test_client
 
     app.dependency_overrides.clear()
+    MetadataSearchEntry.__table__.drop(engine)  # type:ignore[missing-attribute]
+    MetadataPayload.__table__.drop(engine)  # type:ignore[missing-attribute]
     DocumentMetadata.__table__.drop(engine)  # type:ignore[missing-attribute]
     Job.__table__.drop(engine)  # type:ignore[missing-attribute]
     Job.__table__.schema = original_job_schema  # type: ignore[missing-attribute]
     DocumentMetadata.__table__.schema = original_doc_schema  # type: ignore[missing-attribute]
+    MetadataPayload.__table__.schema = original_payload_schema  # type: ignore[missing-attribute]
+    MetadataSearchEntry.__table__.schema = original_search_schema  # type: ignore[missing-attribute]
     get_settings.cache_clear()
     if db_path.exists():
         db_path.unlink()
@@ -125,3 +140,76 @@ def test_put_metadata_creates_versions(client):
     assert body['version'] == 2
     assert body['metadata']['company_name'] == 'ACME Group'
     assert body['metadata']['reporting_year'] == 2024
+
+
+def test_version_history_returns_headers_and_diffs(client):
+    document_id = uuid4()
+    for company_name in ('ACME AG', 'ACME Group'):
+        payload = {'metadata': {'document_type': 'Annual Report', 'company_name': company_name}}
+        assert client.put(f'/v1/documents/{document_id}/metadata', json=payload).status_code == 200
+
+    url = f'/v1/documents/{document_id}/metadata/versions'
+    response = client.get(url, params={'limit': 1, 'include_changes': True})
+    assert response.status_code == 200
+    body = response.json()
+    assert [item['version'] for item in body['items']] == [2]
+    assert body['items'][0]['changes'] == [{'field': 'company_name', 'old': 'ACME AG', 'new': 'ACME Group'}]
+
+    body = client.get(url, params={'cursor': body['next_cursor']}).json()
+    assert [item['version'] for item in body['items']] == [1]
+    assert body['items'][0]['changes'] is None and body['next_cursor'] is None
+
+    response = client.get(f'/v1/documents/{document_id}/metadata/diff', params={'from_version': 2, 'to_version': 1})
+    assert response.status_code == 200
+    assert response.json()['changes'] == [{'field': 'company_name', 'old': 'ACME Group', 'new': 'ACME AG'}]
+    missing = client.get(f'/v1/documents/{document_id}/metadata/diff', params={'from_version': 1, 'to_version': 3})
+    assert missing.status_code == 404
+
+
+def test_search_returns_latest_metadata(client):
+    document_id = uuid4()
+    payload = {'metadata': {'document_type': 'Annual Report', 'company_name': 'ACME AG', 'reporting_year': 2022}}
+    assert client.put(f'/v1/documents/{document_id}/metadata', json=payload).status_code == 200
+
+    response = client.get('/v1/metadata/search', params={'company_name': 'acme', 'reporting_year': 2022, 'limit': 1})
+    assert response.status_code == 200
+    body = response.json()
+    assert [item['document_id'] for item in body['items']] == [str(document_id)]
+    assert body['items'][0]['metadata']['company_name'] == 'ACME AG'
+
+    response = client.get('/v1/metadata/search', params={'cursor': body['next_cursor']})
+    assert response.status_code == 200
+    assert response.json() == {'items': [], 'next_cursor': None}
+    assert client.get('/v1/metadata/search', params={'cursor': 'bogus'}).status_code == 422
+
+
+def test_export_streams_gzip_ndjson_and_resumes_from_a_line_cursor(client):
+    first, second = sorted([uuid4(), uuid4()])
+    for document_id, company_name in ((first, 'ACME AG'), (first, 'ACME Group'), (second, 'Globex')):
+        payload = {'metadata': {'document_type': 'Annual Report', 'company_name': company_name}}
+        assert client.put(f'/v1/documents/{document_id}/metadata', json=payload).status_code == 200
+
+    response = client.get('/v1/metadata/export', params={'scope': 'all'})
+    assert response.status_code == 200
+    assert response.headers['content-encoding'] == 'gzip'
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [(line['document_id'], line['version']) for line in lines] == [
+        (str(first), 1),
+        (str(first), 2),
+        (str(second), 1),
+    ]
+
+    resumed = client.get('/v1/metadata/export', params={'cursor': lines[0]['cursor']})
+    assert [json.loads(line)['metadata']['company_name'] for line in resumed.text.splitlines()] == [
+        'ACME Group',
+        'Globex',
+    ]
+    assert client.get('/v1/metadata/export', params={'cursor': 'bogus'}).status_code == 422
+
+
+def test_list_jobs_reports_counts_on_the_first_page(client):
+    response = client.get('/v1/jobs', params={'status': ['queued', 'failed'], 'limit': 10})
+    assert response.status_code == 200
+    body = response.json()
+    assert body['items'] == [] and body['next_cursor'] is None
+    assert body['counts'] == {status: 0 for status in ('queued', 'running', 'succeeded', 'failed', 'canceled')}
@@ -0,0 +1,290 @@
+"""Raw SQL that SQLite cannot run, executed against the database named by TEST_POSTGRES_URL."""
+
+from __future__ import annotations
+
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from uuid import UUID, uuid4
+
+import psycopg2
+import pytest
+from psycopg2.errors import LockNotAvailable
+from psycopg2.extras import Json
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from sqlmodel import Session, create_engine, select
+
+import agent.tools as tools
+import metadata.service as service
+from agent.schemas import ContextSchema
+from alembic import command
+from alembic.config import Config
+from metadata.models import ArchivedJob, Job, JobStatus, MetadataSource
+
+DIGEST = 'A' * 43 + '='
+ROOT = Path(__file__).resolve().parents[2]
+
+
+@pytest.fixture(scope='module')
+def migrated_engine(postgres_url: str):
+    """Engine on the test database after `alembic upgrade head`."""
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setenv('ALEMBIC_DATABASE_URL', postgres_url)
+        config = Config()
+        config.set_main_option('script_location', str(ROOT / 'alembic'))
+        command.upgrade(config, 'head')
+    engine = create_engine(postgres_url)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def tenant_session(migrated_engine):
+    """Session whose transactions run under the RLS context of a fresh tenant."""
+    tenant_id = uuid4()
+    with Session(migrated_engine) as session:
+
+        def begin():
+            session.execute(text("SELECT set_config('app.tenant_id', :tenant_id, true)"), {'tenant_id': str(tenant_id)})
+
+        begin()
+        yield session, tenant_id, begin
+
+
+def _job(tenant_id: UUID, status: JobStatus, finished_days_ago: int | None = None) -> Job:
+    finished_at = None
+    if finished_days_ago is not None:
+        finished_at = datetime.now(timezone.utc) - timedelta(days=finished_days_ago)
+    return Job(
+        tenant_id=tenant_id,
+        user_id=uuid4(),
+        document_id=uuid4(),
+        profile='default',
+        ingestion_fingerprint=uuid4().hex,
+        status=status,
+        finished_at=finished_at,
+    )
+
+
+@pytest.fixture
+def vector_store(postgres_url: str, monkeypatch: pytest.MonkeyPatch):
+    schema = f'test_{uuid4().hex}'
+    options = f'-c search_path={schema}'
+    conn = psycopg2.connect(postgres_url)
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute(f'CREATE SCHEMA {schema}')
+        cur.execute(f'SET search_path TO {schema}')
+        cur.execute('CREATE TABLE langchain_pg_collection (uuid uuid PRIMARY KEY, name text NOT NULL)')
+        cur.execute('CREATE TABLE langchain_pg_embedding (collection_id uuid, document text, cmetadata jsonb)')
+    monkeypatch.setattr(tools, 'pg_connect', lambda tenant_id: psycopg2.connect(postgres_url, options=options))
+    yield conn
+    with conn.cursor() as cur:
+        cur.execute(f'DROP SCHEMA {schema} CASCADE')
+    conn.close()
+
+
+def test_document_digest_takes_the_head_by_position_then_ranks_by_signals(vector_store):
+    collection_id = uuid4()
+    # Chunk ids start above zero and have gaps; the head is still the first chunks in document order.
+    chunks = {
+        5: 'Inhaltsverzeichnis',
+        7: 'Vorwort',
+        9: 'Allgemeine Angaben',
+        20: 'Eingetragen beim Amtsgericht München unter HRB 12345',
+        30: 'Die ACME GmbH ist ein Handelsunternehmen',
+        40: 'Anhang',
+    }
+    with vector_store.cursor() as cur:
+        cur.execute('INSERT INTO langchain_pg_collection VALUES (%s, %s)', (str(collection_id), 'docs'))
+        for chunk_id, document in chunks.items():
+            cur.execute(
+                'INSERT INTO langchain_pg_embedding VALUES (%s, %s, %s)',
+                (str(collection_id), document, Json({'digest': DIGEST, 'chunk_id': chunk_id, 'source': 'a.pdf'})),
+            )
+        cur.execute(
+            'INSERT INTO langchain_pg_embedding VALUES (%s, %s, %s)',
+            (str(collection_id), 'HRB 999 of another document', Json({'digest': 'other', 'chunk_id': 0})),
+        )
+    context = ContextSchema(tenant_id=uuid4(), digest=DIGEST, collection_name='docs')
+
+    digest = tools.fetch_document_digest(context, k=4, head=2, timeout_secs=5)
+    assert [line for line in digest.page_content.splitlines() if line.startswith('[chunk')] == [
+        '[chunk 5]',
+        '[chunk 7]',
+        '[chunk 20]',
+        '[chunk 30]',
+    ]
+
+    digest = tools.fetch_document_digest(context, k=3, head=5, timeout_secs=5)
+    assert digest.page_content.count('[chunk') == 3
+    assert '[chunk 20]' not in digest.page_content
+
+
+def test_job_status_is_stored_as_the_lowercase_value_the_sql_expects(tenant_session):
+    session, tenant_id, _begin = tenant_session
+    session.add(_job(tenant_id, JobStatus.QUEUED))
+    session.flush()
+
+    stored = session.execute(text('SELECT status FROM metadata.metadata_jobs WHERE tenant_id = :t'), {'t': tenant_id})
+    assert stored.scalar_one() == 'queued'
+    session.rollback()
+
+
+def test_archive_terminal_jobs_moves_old_terminal_jobs(tenant_session):
+    session, tenant_id, begin = tenant_session
+    old_succeeded = _job(tenant_id, JobStatus.SUCCEEDED, finished_days_ago=40)
+    old_failed = _job(tenant_id, JobStatus.FAILED, finished_days_ago=40)
+    recent = _job(tenant_id, JobStatus.SUCCEEDED, finished_days_ago=1)
+    queued = _job(tenant_id, JobStatus.QUEUED)
+    session.add_all([old_succeeded, old_failed, recent, queued])
+    session.commit()
+    old_ids = {old_succeeded.job_id, old_failed.job_id}
+
+    begin()
+    moved = session.execute(
+        text('SELECT metadata.archive_terminal_jobs(:max_age, :batch_size)'),
+        {'max_age': timedelta(days=30), 'batch_size': 1000},
+    ).scalar_one()
+    session.commit()
+
+    begin()
+    archived = session.exec(select(ArchivedJob).where(ArchivedJob.tenant_id == tenant_id)).all()
+    remaining = session.exec(select(Job.job_id).where(Job.tenant_id == tenant_id)).all()
+    assert moved >= 2
+    assert {job.job_id for job in archived} == old_ids
+    assert {job.status for job in archived} == {JobStatus.SUCCEEDED, JobStatus.FAILED}
+    assert set(remaining) == {recent.job_id, queued.job_id}
+
+
+def _insert_version(session: Session, tenant_id: UUID, document_id: UUID, version: int, source: str | None = None):
+    """Insert a payload and version through raw SQL, as the migrations and SQL functions see them."""
+    fingerprint = f'fp-{version}'
+    session.execute(
+        text(
+            'INSERT INTO metadata.metadata_payloads (tenant_id, fingerprint, payload, created_at) '
+            'VALUES (:tenant_id, :fingerprint, CAST(:payload AS json), now()) ON CONFLICT DO NOTHING'
+        ),
+        {'tenant_id': tenant_id, 'fingerprint': fingerprint, 'payload': f'{{"version": {version}}}'},
+    )
+    columns = 'tenant_id, document_id, version, fingerprint, extracted_on'
+    values = ':tenant_id, :document_id, :version, :fingerprint, now()'
+    if source is not None:
+        columns, values = f'{columns}, source', f'{values}, :source'
+    session.execute(
+        text(f'INSERT INTO metadata.document_metadata ({columns}) VALUES ({values})'),
+        {
+            'tenant_id': tenant_id,
+            'document_id': document_id,
+            'version': version,
+            'fingerprint': fingerprint,
+            'source': source,
+        },
+    )
+
+
+def test_metadata_source_written_by_sql_reads_back_as_the_enum(tenant_session):
+    session, tenant_id, _begin = tenant_session
+    document_id = uuid4()
+    _insert_version(session, tenant_id, document_id, 1)
+    _insert_version(session, tenant_id, document_id, 2, source='manual')
+    session.flush()
+
+    first = service.fetch_document_metadata(session, tenant_id=tenant_id, document_id=document_id, version='v1')
+    latest = service.fetch_document_metadata(session, tenant_id=tenant_id, document_id=document_id, version='latest')
+    assert first is not None and first.source is MetadataSource.AGENT
+    assert latest is not None and latest.source is MetadataSource.MANUAL
+    assert latest.payload == {'version': 2}
+    session.rollback()
+
+
+def test_compact_metadata_versions_removes_old_agent_versions_only(tenant_session):
+    session, tenant_id, begin = tenant_session
+    document_id = uuid4()
+    for version in range(1, 5):
+        _insert_version(session, tenant_id, document_id, version, source='manual' if version == 1 else None)
+    session.commit()
+
+    begin()
+    session.execute(
+        text('SELECT * FROM metadata.compact_metadata_versions(1, 1000, :after, :after)'),
+        {'after': str(UUID(int=0))},
+    )
+    session.commit()
+
+    begin()
+    remaining = session.execute(
+        text('SELECT version FROM metadata.document_metadata WHERE document_id = :document_id ORDER BY version'),
+        {'document_id': document_id},
+    )
+    assert remaining.scalars().all() == [1, 4]
+
+
+def test_storing_an_existing_payload_locks_it_before_the_version_is_written(tenant_session, migrated_engine):
+    session, tenant_id, begin = tenant_session
+    _insert_version(session, tenant_id, uuid4(), 1)
+    session.commit()
+
+    begin()
+    service._store_payload(session, tenant_id=tenant_id, fingerprint='fp-1', payload={'version': 1})
+    with migrated_engine.connect() as other:
+        other.execute(text("SELECT set_config('app.tenant_id', :tenant_id, true)"), {'tenant_id': str(tenant_id)})
+        with pytest.raises(DBAPIError) as excinfo:
+            other.execute(
+                text('SELECT 1 FROM metadata.metadata_payloads WHERE tenant_id = :tenant_id FOR UPDATE NOWAIT'),
+                {'tenant_id': tenant_id},
+            )
+        assert isinstance(excinfo.value.orig, LockNotAvailable)
+    session.rollback()
+
+
+def test_compaction_keeps_deleting_payloads_when_one_is_re_referenced_concurrently(tenant_session, migrated_engine):
+    session, tenant_id, begin = tenant_session
+    document_id, other_document_id = uuid4(), uuid4()
+    for version in range(1, 4):
+        _insert_version(session, tenant_id, document_id, version)
+    session.commit()
+
+    # An uncommitted version of another document references fp-1, which compaction is about to orphan.
+    writer = migrated_engine.connect()
+    writer.execute(text("SELECT set_config('app.tenant_id', :tenant_id, true)"), {'tenant_id': str(tenant_id)})
+    writer.execute(
+        text(
+            'INSERT INTO metadata.document_metadata (tenant_id, document_id, version, fingerprint, extracted_on) '
+            "VALUES (:tenant_id, :document_id, 1, 'fp-1', now())"
+        ),
+        {'tenant_id': tenant_id, 'document_id': other_document_id},
+    )
+    compaction = threading.Thread(
+        target=_compact_all, args=(migrated_engine,), name='compaction-under-test', daemon=True
+    )
+    compaction.start()
+    # Commit only once the compaction is waiting on the writer's lock, so its delete of fp-1 is rejected.
+    with migrated_engine.connect() as monitor:
+        for _ in range(100):
+            waiting = monitor.execute(
+                text("SELECT count(*) FROM pg_stat_activity WHERE wait_event_type = 'Lock'")
+            ).scalar_one()
+            if waiting:
+                break
+            time.sleep(0.05)
+    writer.commit()
+    writer.close()
+    compaction.join(timeout=10)
+
+    begin()
+    payloads = session.execute(
+        text('SELECT fingerprint FROM metadata.metadata_payloads WHERE tenant_id = :tenant_id ORDER BY fingerprint'),
+        {'tenant_id': tenant_id},
+    )
+    assert payloads.scalars().all() == ['fp-1', 'fp-3']
+
+
+def _compact_all(engine) -> None:
+    with engine.begin() as connection:
+        connection.execute(
+            text('SELECT * FROM metadata.compact_metadata_versions(1, 1000, :after, :after)'),
+            {'after': str(UUID(int=0))},
+        )
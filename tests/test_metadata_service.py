@@ -1,22 +1,42 @@
 from __future__ import annotations
 
 from contextlib import contextmanager
+from datetime import datetime, timezone
 from uuid import UUID, uuid4
 
 import pytest
-from sqlmodel import Session, SQLModel, create_engine
+from sqlmodel import Session, SQLModel, create_engine, select
 from tenauth.schemas import AccessContext
 
 from agent.schemas import MetadataSchema
-from metadata.models import DocumentMetadata, Job
+from metadata.models import (
+    ArchivedJob,
+    DocumentMetadata,
+    Job,
+    JobStatus,
+    MetadataPayload,
+    MetadataSearchEntry,
+    MetadataSource,
+)
 from metadata.schemas import CreateJobDTO, JobContextPayload
 from metadata.service import (
+    count_jobs_by_status,
     create_job,
+    diff_payloads,
     fetch_document_metadata,
+    get_job,
+    iter_metadata_export,
+    list_jobs,
+    list_metadata_versions,
+    load_payloads,
     manual_metadata_update,
     merge_metadata,
     metadata_fingerprint,
     record_metadata_version,
+    record_partial_result,
+    search_latest_metadata,
+    set_metadata_version_pinned,
+    version_fingerprints,
 )
 
 
@@ -29,10 +49,11 @@ def configure_env(monkeypatch: pytest.MonkeyPatch) -> None:
 
 @pytest.fixture
 def engine():
-    original_job_schema = Job.__table__.schema  # type: ignore[missing-attribute]
-    original_doc_schema = DocumentMetadata.__table__.schema  # type: ignore[missing-attribute]
-    Job.__table__.schema = None  # type: ignore[missing-attribute]
-    DocumentMetadata.__table__.schema = None  # type: ignore[missing-attribute]
+    models = (Job, ArchivedJob, DocumentMetadata, MetadataPayload, MetadataSearchEntry)
+    tables = [model.__table__ for model in models]  # type: ignore[missing-attribute]
+    original_schemas = [table.schema for table in tables]
+    for table in tables:
+        table.schema = None
 
     engine = create_engine('sqlite:///:memory:', connect_args={'check_same_thread': False})
     SQLModel.metadata.create_all(engine)
@@ -40,8 +61,8 @@ def engine():
     yield engine
 
     SQLModel.metadata.drop_all(engine)
-    Job.__table__.schema = original_job_schema  # type: ignore[missing-attribute]
-    DocumentMetadata.__table__.schema = original_doc_schema  # type: ignore[missing-attribute]
+    for table, schema in zip(tables, original_schemas):
+        table.schema = schema
 
 
 @contextmanager
@@ -110,6 +131,41 @@ def test_create_job_is_idempotent(engine):
     assert job1.job_id == job2.job_id
 
 
+def test_record_partial_result_only_updates_running_jobs(engine):
+    access = _access()
+    with session_ctx(engine) as session:
+        job = create_job(session, _dto(), access_context=access)
+
+    partial = MetadataSchema(document_type='Balance Sheet')
+    with session_ctx(engine) as session:
+        assert record_partial_result(session, job.job_id, stage='classify_document', metadata=partial) is False
+
+        stored = session.get(Job, job.job_id)
+        stored.status = JobStatus.RUNNING
+        session.add(stored)
+        assert record_partial_result(session, job.job_id, stage='classify_document', metadata=partial) is True
+
+    with session_ctx(engine) as session:
+        stored = session.get(Job, job.job_id)
+        assert stored.stage == 'classify_document'
+        assert stored.partial_metadata == {'document_type': 'Balance Sheet'}
+
+
+def test_get_job_falls_back_to_the_archive(engine):
+    with session_ctx(engine) as session:
+        job = create_job(session, _dto(), access_context=_access())
+
+    with session_ctx(engine) as session:
+        stored = session.get(Job, job.job_id)
+        archived = ArchivedJob.model_validate(stored.model_dump() | {'status': JobStatus.SUCCEEDED})
+        session.delete(stored)
+        session.add(archived)
+
+    with session_ctx(engine) as session:
+        assert get_job(session, job.job_id) is None
+        assert get_job(session, job.job_id, include_archived=True).status == JobStatus.SUCCEEDED
+
+
 def test_fetch_document_metadata_latest(engine):
     dto = _dto()
     access = _access()
@@ -225,3 +281,194 @@ def test_manual_metadata_update_skips_duplicate_payload(engine):
         )
 
     assert first.version == second.version == 1
+
+
+def test_manual_versions_are_marked_and_versions_can_be_pinned(engine):
+    tenant_id = uuid4()
+    document_id = uuid4()
+    with session_ctx(engine) as session:
+        record_metadata_version(
+            session, tenant_id=tenant_id, document_id=document_id, metadata=MetadataSchema(document_type='Other')
+        )
+        manual = manual_metadata_update(
+            session, tenant_id=tenant_id, document_id=document_id, metadata=MetadataSchema(document_type='Memo')
+        )
+    assert manual.version == 2 and manual.source == MetadataSource.MANUAL
+
+    with session_ctx(engine) as session:
+        pinned = set_metadata_version_pinned(
+            session, tenant_id=tenant_id, document_id=document_id, version=1, pinned=True
+        )
+        missing = set_metadata_version_pinned(
+            session, tenant_id=tenant_id, document_id=document_id, version=3, pinned=True
+        )
+    assert pinned.pinned and pinned.source == MetadataSource.AGENT
+    assert missing is None
+
+
+def test_version_headers_page_newest_first_and_diff_payloads(engine):
+    tenant_id = uuid4()
+    document_id = uuid4()
+    with session_ctx(engine) as session:
+        for company_name in ('ACME AG', 'ACME Group', 'ACME AG'):
+            record_metadata_version(
+                session,
+                tenant_id=tenant_id,
+                document_id=document_id,
+                metadata=MetadataSchema(document_type='Annual Report', company_name=company_name),
+            )
+
+    with session_ctx(engine) as session:
+        first_page = list_metadata_versions(session, tenant_id=tenant_id, document_id=document_id, limit=2)
+        rest = list_metadata_versions(session, tenant_id=tenant_id, document_id=document_id, before_version=2)
+        fingerprints = version_fingerprints(session, tenant_id=tenant_id, document_id=document_id, versions=[1, 2, 9])
+        payloads = load_payloads(session, tenant_id=tenant_id, fingerprints=list(fingerprints.values()))
+
+    assert [v.version for v in first_page] == [3, 2] and [v.version for v in rest] == [1]
+    assert sorted(fingerprints) == [1, 2] and len(payloads) == 2
+    assert first_page[0].fingerprint == rest[0].fingerprint
+    assert diff_payloads(payloads[fingerprints[1]], payloads[fingerprints[2]]) == [
+        ('company_name', 'ACME AG', 'ACME Group')
+    ]
+    assert ('document_type', None, 'Annual Report') in diff_payloads(None, payloads[fingerprints[1]])
+
+
+def test_export_streams_latest_or_all_versions_after_a_keyset(engine):
+    tenant_id = uuid4()
+    first, second = sorted([uuid4(), uuid4()])
+    with session_ctx(engine) as session:
+        for document_id, document_type in ((first, 'Other'), (first, 'Memo'), (second, 'Annual Report')):
+            record_metadata_version(
+                session,
+                tenant_id=tenant_id,
+                document_id=document_id,
+                metadata=MetadataSchema(document_type=document_type),
+            )
+        record_metadata_version(
+            session, tenant_id=uuid4(), document_id=first, metadata=MetadataSchema(document_type='Other')
+        )
+
+    pages = []
+
+    def open_session():
+        pages.append(None)
+        return session_ctx(engine)
+
+    latest = list(iter_metadata_export(open_session, tenant_id=tenant_id, batch_size=1))
+    pages.clear()
+    everything = list(iter_metadata_export(open_session, tenant_id=tenant_id, scope='all', batch_size=1))
+    assert len(pages) == 4  # one short session per row, plus the empty page that ends the export
+    resumed = list(iter_metadata_export(open_session, tenant_id=tenant_id, scope='all', after=(first, 1)))
+
+    assert [(row[0], row[1], row[5]['document_type']) for row in latest] == [
+        (first, 2, 'Memo'),
+        (second, 1, 'Annual Report'),
+    ]
+    assert [(row[0], row[1]) for row in everything] == [(first, 1), (first, 2), (second, 1)]
+    assert resumed == everything[1:]
+
+
+def test_identical_payloads_are_stored_once(engine):
+    tenant_id = uuid4()
+    metadata = MetadataSchema(document_type='Annual Report', company_name='ACME AG')
+    with session_ctx(engine) as session:
+        first = record_metadata_version(session, tenant_id=tenant_id, document_id=uuid4(), metadata=metadata)
+        second = record_metadata_version(session, tenant_id=tenant_id, document_id=uuid4(), metadata=metadata)
+        assert first.payload == second.payload == metadata.model_dump(mode='json')
+
+    with session_ctx(engine) as session:
+        assert len(session.exec(select(MetadataPayload)).all()) == 1
+        assert len(session.exec(select(DocumentMetadata)).all()) == 2
+
+
+def test_search_filters_latest_versions_with_keyset_pagination(engine):
+    tenant_id = uuid4()
+    acme, globex, other = sorted([uuid4(), uuid4(), uuid4()])
+    with session_ctx(engine) as session:
+        record_metadata_version(
+            session,
+            tenant_id=tenant_id,
+            document_id=acme,
+            metadata=MetadataSchema(document_type='Annual Report', company_name='ACME AG', reporting_year=2021),
+        )
+        record_metadata_version(
+            session,
+            tenant_id=tenant_id,
+            document_id=acme,
+            metadata=MetadataSchema(
+                document_type='Annual Report', company_name='ACME AG', reporting_year=2022, tags=['esg', 'audit']
+            ),
+        )
+        record_metadata_version(
+            session,
+            tenant_id=tenant_id,
+            document_id=globex,
+            metadata=MetadataSchema(document_type='Annual Report', company_name='Acme Holding', reporting_year=2022),
+        )
+        record_metadata_version(
+            session,
+            tenant_id=tenant_id,
+            document_id=other,
+            metadata=MetadataSchema(document_type='Memo', company_name='ACME AG', reporting_year=2022),
+        )
+
+    def search(**filters):
+        with session_ctx(engine) as session:
+            return [entry.document_id for entry in search_latest_metadata(session, tenant_id=tenant_id, **filters)]
+
+    reports = {'document_type': 'Annual Report', 'reporting_year': 2022}
+    assert search(**reports, company_name='acme') == [acme, globex]
+    assert search(**reports, company_name='acme', limit=1) == [acme]
+    assert search(**reports, company_name='acme', after_document_id=acme) == [globex]
+    assert search(**reports, company_name='holding', company_match='contains') == [globex]
+    assert search(tags=['audit', 'esg']) == [acme]
+    assert search(document_type='Annual Report', reporting_year=2021) == []
+
+
+def test_list_jobs_pages_newest_first_and_counts_by_status(engine):
+    access = _access()
+    with session_ctx(engine) as session:
+        created = [create_job(session, _dto(document_id=uuid4()), access_context=access) for _ in range(3)]
+        create_job(session, _dto(document_id=uuid4()), access_context=_access())
+    with session_ctx(engine) as session:
+        for offset, job in enumerate(created):
+            stored = session.get(Job, job.job_id)
+            stored.created_at = datetime(2024, 1, 1, 12, offset, tzinfo=timezone.utc)
+            stored.status = JobStatus.FAILED if offset == 0 else stored.status
+            session.add(stored)
+
+    newest_first = [job.job_id for job in reversed(created)]
+    with session_ctx(engine) as session:
+        first_page = list_jobs(session, tenant_id=access.tenant_id, limit=2)
+        last = first_page[-1]
+        second_page = list_jobs(session, tenant_id=access.tenant_id, before=(last.created_at, last.job_id), limit=2)
+        failed_only = list_jobs(session, tenant_id=access.tenant_id, statuses=[JobStatus.FAILED])
+        windowed = list_jobs(session, tenant_id=access.tenant_id, created_from=datetime(2024, 1, 1, 12, 1))
+        counts = count_jobs_by_status(session, tenant_id=access.tenant_id)
+
+    assert [job.job_id for job in first_page + second_page] == newest_first
+    assert [job.job_id for job in failed_only] == [created[0].job_id]
+    assert [job.job_id for job in windowed] == newest_first[:2]
+    assert counts[JobStatus.QUEUED] == 2 and counts[JobStatus.FAILED] == 1 and counts[JobStatus.RUNNING] == 0
+
+
+def test_list_jobs_and_counts_include_archived_jobs_on_request(engine):
+    access = _access()
+    with session_ctx(engine) as session:
+        live, old = (create_job(session, _dto(document_id=uuid4()), access_context=access) for _ in range(2))
+    with session_ctx(engine) as session:
+        stored = session.get(Job, old.job_id)
+        stored.created_at = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        session.add(ArchivedJob.model_validate(stored.model_dump() | {'status': JobStatus.SUCCEEDED}))
+        session.delete(stored)
+
+    with session_ctx(engine) as session:
+        live_only = list_jobs(session, tenant_id=access.tenant_id)
+        everything = list_jobs(session, tenant_id=access.tenant_id, include_archived=True)
+        first = list_jobs(session, tenant_id=access.tenant_id, include_archived=True, limit=1)
+        counts = count_jobs_by_status(session, tenant_id=access.tenant_id, include_archived=True)
+
+    assert [job.job_id for job in live_only] == [live.job_id]
+    assert [job.job_id for job in everything] == [live.job_id, old.job_id]
+    assert [job.job_id for job in first] == [live.job_id]
+    assert counts[JobStatus.QUEUED] == 1 and counts[JobStatus.SUCCEEDED] == 1
@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+from types import SimpleNamespace
+from uuid import UUID, uuid4
+
+from langchain_core.runnables import RunnableLambda
+
+import agent.batch as batch
+import metadata.tasks as tasks
+from agent.batch import BatchClassification, DocumentClassification, classify_documents
+from agent.nodes import type_extractor
+from agent.profiles import DEFAULT_PROFILE
+from agent.schemas import ContextSchema, MetadataSchema
+
+
+def _fake_chat_model(monkeypatch, answer: BatchClassification) -> list:
+    prompts: list = []
+
+    def run(messages, **_kwargs):
+        prompts.append(messages)
+        return answer
+
+    model = SimpleNamespace(with_structured_output=lambda _schema: RunnableLambda(run))
+    monkeypatch.setattr(batch, 'chat_model', lambda _settings: model)
+    return prompts
+
+
+def test_classify_documents_uses_one_call_and_maps_types_by_key(monkeypatch):
+    answer = BatchClassification(
+        documents=[
+            DocumentClassification(key='a', document_type='Annual Report'),
+            DocumentClassification(key='b', document_type='something else'),
+            DocumentClassification(key='unknown', document_type='Balance Sheet'),
+        ]
+    )
+    prompts = _fake_chat_model(monkeypatch, answer)
+
+    result = classify_documents({'a': 'Jahresabschluss', 'b': 'Lagebericht', 'c': ''}, {'configurable': {}})
+
+    assert result == {'a': 'Annual Report', 'b': None, 'c': None}
+    assert len(prompts) == 1
+    assert 'key="c"' not in prompts[0][1].content
+
+
+def test_classify_documents_without_text_skips_the_model(monkeypatch):
+    prompts = _fake_chat_model(monkeypatch, BatchClassification(documents=[]))
+
+    assert classify_documents({'a': ''}, {'configurable': {}}) == {'a': None}
+    assert prompts == []
+
+
+def test_type_extractor_skips_seeded_document_type():
+    assert type_extractor({'document_type': 'Balance Sheet'}, {'configurable': {}}) == {}
+
+
+def test_batch_fallback_sends_the_job_context_so_the_worker_prefetches_chunks(monkeypatch):
+    job_id, tenant_id, user_id = str(uuid4()), str(uuid4()), str(uuid4())
+    context = {'digest': 'A' * 43 + '=', 'collection_name': 'default', 'tenant_id': tenant_id}
+    sent: list = []
+    monkeypatch.setattr(tasks, '_classify_batch', lambda _job_ids, _access: ({}, {job_id: context}))
+    monkeypatch.setattr(tasks.process_metadata_job, 'send', lambda *args: sent.append(args))
+
+    tasks.classify_metadata_batch.fn([job_id], tenant_id, user_id)
+
+    assert sent == [(job_id, tenant_id, user_id, None, context)]
+
+    prefetched: list = []
+    initial_states: list = []
+    snapshot = tasks.JobSnapshot(job_id=UUID(job_id), document_id=uuid4(), profile=DEFAULT_PROFILE)
+    monkeypatch.setattr(tasks, '_prefetch_first_chunks', lambda ctx: prefetched.append(ctx) or 'first chunks')
+    monkeypatch.setattr(tasks, '_load_job', lambda *_: (snapshot, ContextSchema.model_validate(context), None, []))
+    monkeypatch.setattr(tasks, '_run_agent', lambda *args: initial_states.append(args[3]) or MetadataSchema())
+    monkeypatch.setattr(tasks, 'update_vecstore_metadata', lambda *_: None)
+    monkeypatch.setattr(tasks, '_finalise_success', lambda *_, **__: None)
+    monkeypatch.setattr(tasks, 'delete_checkpoints', lambda *_: None)
+
+    tasks.process_metadata_job.fn(*sent[0])
+
+    assert prefetched == [ContextSchema.model_validate(context)]
+    assert initial_states[0]['first_chunks'] == 'first chunks'
@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+import time
+
+from langchain_core.messages import AIMessage, ToolMessage
+
+from agent.budget import (
+    DEADLINE_KEY,
+    call_timeout,
+    deadline_passed,
+    max_tool_rounds,
+    tool_rounds_exhausted,
+)
+from agent.graph import route_tools
+
+
+def _config(deadline: float | None) -> dict:
+    return {'configurable': {DEADLINE_KEY: deadline}}
+
+
+def test_tool_rounds_exhausted_after_budget():
+    budget = max_tool_rounds('metadata_extractor')
+
+    assert not tool_rounds_exhausted({'tool_rounds': {'metadata_extractor': budget - 1}}, 'metadata_extractor')
+    assert tool_rounds_exhausted({'tool_rounds': {'metadata_extractor': budget}}, 'metadata_extractor')
+
+
+def test_unknown_node_has_no_tool_budget():
+    assert tool_rounds_exhausted({}, 'unknown_node')
+
+
+def test_call_timeout_is_clamped_to_deadline():
+    assert call_timeout(_config(None), cap=30) == 30
+    assert call_timeout(_config(time.time() + 5), cap=30) <= 5
+    assert call_timeout(_config(time.time() + 120), cap=30) == 30
+
+
+def test_deadline_passed():
+    assert not deadline_passed(_config(None))
+    assert not deadline_passed(_config(time.time() + 60))
+    assert deadline_passed(_config(time.time() - 1))
+
+
+def test_route_tools_falls_through_without_tool_calls():
+    tool_call = {'name': 'first_chunks', 'args': {}, 'id': 'call-1'}
+
+    assert route_tools({'messages': []}) == '__end__'
+    assert route_tools({'messages': [AIMessage(content='', tool_calls=[tool_call])]}) == 'tools'
+    assert route_tools({'messages': [ToolMessage(content='chunk', tool_call_id='call-1')]}) == '__end__'
@@ -0,0 +1,37 @@
+from __future__ import annotations
+
+from langchain_core.language_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration
+
+from agent.cache import InMemoryResponseCache, llm_request_key
+
+
+def _generation(content: str) -> list[ChatGeneration]:
+    return [ChatGeneration(message=AIMessage(content=content))]
+
+
+def test_identical_requests_are_served_from_the_cache():
+    cache = InMemoryResponseCache(max_entries=8)
+    prompt = [HumanMessage(content='Which document type?')]
+
+    first = GenericFakeChatModel(messages=iter([AIMessage(content='Annual Report')]), cache=cache).invoke(prompt)
+    second = GenericFakeChatModel(messages=iter([AIMessage(content='Other')]), cache=cache).invoke(prompt)
+
+    assert first.content == second.content == 'Annual Report'
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = InMemoryResponseCache(max_entries=2)
+    cache.update('a', 'model', _generation('A'))
+    cache.update('b', 'model', _generation('B'))
+    cache.lookup('a', 'model')
+    cache.update('c', 'model', _generation('C'))
+
+    assert cache.lookup('b', 'model') is None
+    assert cache.lookup('a', 'model')[0].message.content == 'A'
+
+
+def test_request_key_depends_on_model_and_bound_schema():
+    assert llm_request_key('[]', "gpt-a---[('tools', 'x')]") != llm_request_key('[]', "gpt-b---[('tools', 'x')]")
+    assert llm_request_key('[]', "gpt-a---[('tools', 'x')]") != llm_request_key('[]', "gpt-a---[('tools', 'y')]")
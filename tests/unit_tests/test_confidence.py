@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+import datetime
+
+from langchain_core.messages import AIMessage
+
+from agent.confidence import confidence_issues
+from agent.graph import route_extraction
+from agent.schemas import MetadataSchema
+
+
+def _confident() -> MetadataSchema:
+    return MetadataSchema(
+        company_name='Muster GmbH & Co. KG',
+        reporting_date=datetime.date(2022, 12, 31),
+        reporting_year=2022,
+        tags=['finance'],
+    )
+
+
+def test_complete_metadata_has_no_issues():
+    assert confidence_issues(_confident()) == []
+
+
+def test_flags_missing_legal_form_year_and_tags():
+    metadata = MetadataSchema(company_name='Muster Holding')
+
+    assert confidence_issues(metadata) == [
+        'company name has no legal form',
+        'reporting year is missing',
+        'tags are empty',
+    ]
+
+
+def test_flags_conflicting_dates():
+    metadata = _confident().model_copy(update={'reporting_year': 2021, 'call_date': datetime.date(2022, 1, 5)})
+
+    assert confidence_issues(metadata) == [
+        'reporting date and reporting year disagree',
+        'call date precedes the reporting date',
+    ]
+
+
+def test_route_extraction_only_cleans_low_confidence_candidates():
+    done = [AIMessage(content='{}')]
+
+    assert route_extraction({'messages': done, 'metadata': _confident()}) == '__end__'
+    assert route_extraction({'messages': done, 'metadata': MetadataSchema(company_name='Acme')}) == 'clean'
@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+from types import SimpleNamespace
+from uuid import uuid4
+
+from tenauth.schemas import AccessContext
+
+import core.db as db
+
+
+class _RecordingConnection:
+    dialect = SimpleNamespace(name='postgresql')
+
+    def __init__(self) -> None:
+        self.statements: list[tuple[str, dict]] = []
+
+    def execute(self, statement, params):
+        self.statements.append((str(statement), params))
+
+
+def test_access_context_is_set_transaction_locally_in_one_statement():
+    access = AccessContext(tenant_id=uuid4(), user_id=uuid4())
+    session = SimpleNamespace(info={'tenant_id': access.tenant_id, 'user_id': access.user_id})
+    connection = _RecordingConnection()
+
+    db._apply_access_context(session, None, connection)
+
+    [(statement, params)] = connection.statements
+    assert statement.count('set_config') == 2 and ', true)' in statement
+    assert params == {'tenant_id': str(access.tenant_id), 'user_id': str(access.user_id)}
+
+
+def test_timed_pool_reports_checkout_and_usage(monkeypatch):
+    import sqlite3
+
+    waits = []
+    monkeypatch.setattr(db._checkout_wait, 'record', lambda value, attributes: waits.append((value, attributes)))
+    pool = db.TimedQueuePool(lambda: sqlite3.connect(':memory:'), pool_size=1, max_overflow=1)
+    monkeypatch.setattr(db, '_engine', SimpleNamespace(pool=pool))
+
+    first, second = pool.connect(), pool.connect()
+    usage = {attributes['state']: value for value, attributes in db._pool_usage()}
+    first.close()
+    second.close()
+
+    assert len(waits) == 2 and all(attributes == {'pool': 'primary'} for _, attributes in waits)
+    assert usage == {'in_use': 2, 'overflow': 1, 'idle': 0}
+
+
+def test_read_only_scope_uses_replica_only_when_configured(monkeypatch):
+    primary, replica = object(), object()
+    sessions = []
+
+    class _Session:
+        def __init__(self, bind, info):
+            sessions.append((bind, info))
+
+        def commit(self):
+            pass
+
+        def close(self):
+            pass
+
+    monkeypatch.setattr(db, 'Session', _Session)
+    monkeypatch.setattr(db, 'get_engine', lambda: primary)
+    monkeypatch.setattr(db, 'get_replica_engine', lambda: replica)
+    with db.session_scope(read_only=True):
+        pass
+    with db.session_scope():
+        pass
+    monkeypatch.setattr(db, 'get_replica_engine', lambda: None)
+    with db.session_scope(read_only=True):
+        pass
+
+    assert sessions == [(replica, {'replica': True}), (primary, {}), (primary, {})]
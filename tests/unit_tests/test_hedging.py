@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import itertools
+import threading
+import time
+
+from langchain_core.runnables import RunnableLambda
+
+from agent.hedging import Hedger, LatencyWindow
+
+
+def _runnable(delays):
+    delays = iter(delays)
+
+    def run(value):
+        time.sleep(next(delays))
+        return value
+
+    return RunnableLambda(run)
+
+
+def test_latency_window_percentile():
+    window = LatencyWindow()
+    for secs in range(1, 101):
+        window.add(secs / 100)
+
+    assert window.percentile(95) == 0.95
+
+
+def test_slow_call_is_hedged_and_the_faster_request_wins():
+    hedger = Hedger(percentile=50, min_samples=2, max_fraction=1.0, max_workers=4)
+    runnable = _runnable([0.01, 0.01, 1.0, 0.01])
+    hedger.invoke(runnable, 'warm')
+    hedger.invoke(runnable, 'warm')
+
+    start = time.perf_counter()
+    assert hedger.invoke(runnable, 'answer') == 'answer'
+    assert time.perf_counter() - start < 0.5
+
+
+def test_hedging_respects_the_budget():
+    hedger = Hedger(percentile=50, min_samples=1, max_fraction=0.0, max_workers=4)
+    calls = itertools.count()
+    runnable = RunnableLambda(lambda value: (next(calls), time.sleep(0.05), value)[2])
+    hedger.invoke(runnable, 'warm')
+
+    hedger.invoke(runnable, 'answer')
+
+    assert next(calls) == 2
+
+
+def test_time_queued_in_the_executor_does_not_trigger_a_hedge():
+    hedger = Hedger(percentile=50, min_samples=2, max_fraction=1.0, max_workers=1)
+    runnable = _runnable([0.1, 0.1, 0.05])
+    hedger.invoke(runnable, 'warm')
+    hedger.invoke(runnable, 'warm')
+    hedger._executor.submit(time.sleep, 0.3)
+
+    assert hedger.invoke(runnable, 'answer') == 'answer'
+    assert hedger._hedged == 0
+
+
+def test_a_saturated_executor_falls_back_to_a_direct_call():
+    hedger = Hedger(percentile=50, min_samples=2, max_fraction=1.0, max_workers=1)
+    runnable = _runnable([0.05, 0.05, 0.05])
+    hedger.invoke(runnable, 'warm')
+    hedger.invoke(runnable, 'warm')
+    release = threading.Event()
+    hedger._executor.submit(release.wait)
+
+    start = time.perf_counter()
+    try:
+        assert hedger.invoke(runnable, 'answer') == 'answer'
+        assert time.perf_counter() - start < 1.0
+        assert hedger._hedged == 0
+    finally:
+        release.set()
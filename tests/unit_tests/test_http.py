@@ -0,0 +1,27 @@
+from __future__ import annotations
+
+import httpx
+
+import core.http as http
+from agent.tools import search_tool
+
+
+def test_http_client_is_shared():
+    try:
+        assert http.get_http_client() is http.get_http_client()
+    finally:
+        http.close_http_clients()
+
+
+def test_tavily_search_posts_through_the_shared_client(monkeypatch):
+    requests: list[httpx.Request] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(200, json={'results': []})
+
+    monkeypatch.setattr(http, '_client', httpx.Client(transport=httpx.MockTransport(handler)))
+
+    assert search_tool.invoke({'query': 'ACME AG'}) == {'results': []}
+    assert requests[0].url.path == '/search'
+    assert requests[0].headers['Authorization'] == 'Bearer test-key'
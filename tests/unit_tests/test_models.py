@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+from types import SimpleNamespace
+
+from langchain_core.runnables import RunnableLambda
+from pydantic import ValidationError
+
+import agent.models as models
+import agent.nodes as nodes
+from agent.models import (
+    MODEL_KEY,
+    ModelRoute,
+    ModelSettings,
+    default_model_route,
+    model_route,
+    profile_model_route,
+)
+from agent.profiles import DEFAULT_PROFILE, get_profile
+from agent.schemas import MetadataSchema
+
+PRIMARY = ModelSettings('openai:small')
+ESCALATION = ModelSettings('openai:large')
+
+
+def _config(route: ModelRoute) -> dict:
+    return {'configurable': {MODEL_KEY: route}}
+
+
+def _fake_models(monkeypatch, answers: dict[bool, object]) -> list[bool]:
+    calls: list[bool] = []
+
+    def structured(escalated: bool):
+        def run(_messages, **_kwargs):
+            calls.append(escalated)
+            answer = answers[escalated]
+            if isinstance(answer, Exception):
+                raise answer
+            return answer
+
+        return RunnableLambda(run)
+
+    monkeypatch.setattr(
+        nodes, '_models', lambda config, *, escalated=False: SimpleNamespace(structured=structured(escalated))
+    )
+    return calls
+
+
+def _validation_error() -> ValidationError:
+    try:
+        MetadataSchema.model_validate({'reporting_year': 'not a year'})
+    except ValidationError as exc:
+        return exc
+    raise AssertionError('expected a validation error')
+
+
+def test_route_tiers_fall_back_to_primary_without_escalation():
+    assert ModelRoute(PRIMARY, ESCALATION).tier(True) == ESCALATION
+    assert ModelRoute(PRIMARY).tier(True) == PRIMARY
+
+
+def test_model_route_defaults_when_config_has_none():
+    assert model_route({'configurable': {}}) == default_model_route()
+    assert model_route(_config(ModelRoute(PRIMARY))) == ModelRoute(PRIMARY)
+
+
+def test_profile_routes_apply_per_profile_overrides(monkeypatch):
+    settings = SimpleNamespace(
+        agent_model='openai:small',
+        agent_escalation_model='openai:large',
+        agent_profile_models={'bulk': 'openai:tiny'},
+        agent_profile_escalation_models={'fast': None},
+    )
+    monkeypatch.setattr(models, 'get_settings', lambda: settings)
+
+    assert profile_model_route('default') == ModelRoute(PRIMARY, ESCALATION)
+    assert profile_model_route('fast') == ModelRoute(PRIMARY)
+    assert profile_model_route('bulk') == ModelRoute(ModelSettings('openai:tiny'), ESCALATION)
+
+
+def test_nodes_bind_the_model_of_the_job_profile(monkeypatch):
+    bound: list[ModelSettings] = []
+    monkeypatch.setattr(nodes, '_bind_models', lambda model: bound.append(model))
+
+    fast = get_profile('fast').models
+    nodes._models(_config(fast))
+    nodes._models(_config(fast), escalated=True)
+
+    assert fast.escalation is None
+    assert get_profile(DEFAULT_PROFILE).models == default_model_route()
+    assert bound == [fast.primary, fast.primary]
+    assert not nodes._can_escalate(_config(fast))
+
+
+def test_structured_output_escalates_on_validation_error(monkeypatch):
+    calls = _fake_models(monkeypatch, {False: _validation_error(), True: MetadataSchema(company_name='ACME AG')})
+
+    result = nodes._structured_metadata('metadata_extractor', [], _config(ModelRoute(PRIMARY, ESCALATION)))
+
+    assert result == MetadataSchema(company_name='ACME AG')
+    assert calls == [False, True]
+
+
+def test_structured_output_stays_on_primary_when_valid(monkeypatch):
+    calls = _fake_models(monkeypatch, {False: MetadataSchema(company_name='ACME AG'), True: MetadataSchema()})
+
+    nodes._structured_metadata('metadata_extractor', [], _config(ModelRoute(PRIMARY, ESCALATION)))
+
+    assert calls == [False]
+
+
+def test_structured_output_without_escalation_model_returns_none(monkeypatch):
+    calls = _fake_models(monkeypatch, {False: _validation_error()})
+
+    assert nodes._structured_metadata('metadata_extractor', [], _config(ModelRoute(PRIMARY))) is None
+    assert calls == [False]
@@ -0,0 +1,19 @@
+from __future__ import annotations
+
+import gzip
+import json
+import zlib
+
+from utils.ndjson import gzip_ndjson
+
+
+def test_gzip_ndjson_round_trip():
+    records = [{'id': index, 'name': f'doc-{index}'} for index in range(5)]
+    body = b''.join(gzip_ndjson(records, flush_every=2))
+    assert [json.loads(line) for line in gzip.decompress(body).splitlines()] == records
+
+
+def test_truncated_stream_keeps_flushed_lines():
+    chunks = list(gzip_ndjson([{'id': index} for index in range(4)], flush_every=2))
+    partial = zlib.decompressobj(wbits=zlib.MAX_WBITS | 16).decompress(b''.join(chunks[:-1]))
+    assert partial.splitlines() == [b'{"id":0}', b'{"id":1}', b'{"id":2}', b'{"id":3}']
@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+from langchain_core.messages import AIMessage
+
+from agent.graph import graph
+from agent.nodes import (
+    classify_document,
+    finalize_metadata,
+    first_chunks_state,
+    parse_document_type,
+    prefetch_chunks,
+    tools,
+)
+from agent.schemas import MetadataSchema
+
+
+def test_parse_document_type_picks_first_known_type():
+    assert parse_document_type('This is an Annual Report including a balance sheet.') == 'Annual Report'
+    assert parse_document_type('commercial register extract') == 'Commercial Register Extract'
+    assert parse_document_type('') is None
+
+
+def test_classify_document_ignores_tool_call_turns():
+    tool_call = {'name': 'first_chunks', 'args': {}, 'id': 'call-1'}
+    state = {
+        'type_messages': [
+            AIMessage(content='Balance Sheet'),
+            AIMessage(content='', tool_calls=[tool_call]),
+        ]
+    }
+
+    assert classify_document(state, {}) == {'document_type': 'Balance Sheet'}
+
+
+def test_finalize_metadata_joins_classification_and_extraction():
+    state = {
+        'metadata': MetadataSchema(company_name='ACME AG', document_type='Other'),
+        'document_type': 'Annual Report',
+    }
+
+    result = finalize_metadata(state)
+
+    assert result['document_type'] == 'Annual Report'
+    assert result['company_name'] == 'ACME AG'
+
+
+def test_classification_and_extraction_branches_fan_out():
+    edges = {(edge.source, edge.target) for edge in graph.get_graph().edges}
+
+    assert ('rule_extractor', 'type_extractor') in edges
+    assert ('rule_extractor', 'metadata_extractor') in edges
+
+
+def test_document_digest_is_offered_to_the_model():
+    assert tools[0].name == 'document_digest'
+
+
+def test_worker_seeded_chunks_skip_the_prefetch_node():
+    seeded = first_chunks_state('ACME AG Jahresabschluss zum 31.12.2023')
+
+    assert seeded['messages'][-1].content == seeded['first_chunks']
+    assert seeded['type_messages'][0].tool_calls[0]['name'] == 'first_chunks'
+    assert prefetch_chunks(seeded, {'configurable': {}}) == {}
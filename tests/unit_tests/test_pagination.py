@@ -0,0 +1,16 @@
+from __future__ import annotations
+
+import pytest
+
+from utils.pagination import decode_cursor, encode_cursor
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor('2024-01-16T09:53:10', 'be9f6304-5ea1-4690-843b-7192617b61d4')
+    assert decode_cursor(cursor, 2) == ['2024-01-16T09:53:10', 'be9f6304-5ea1-4690-843b-7192617b61d4']
+
+
+@pytest.mark.parametrize('cursor', ['not-a-cursor', encode_cursor('one'), encode_cursor('a', 'b', 'c')])
+def test_malformed_cursor_is_rejected(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor, 2)
@@ -0,0 +1,28 @@
+from __future__ import annotations
+
+import pytest
+from langgraph.pregel import Pregel
+
+from agent.profiles import (
+    DEFAULT_PROFILE,
+    UnknownProfileError,
+    get_profile,
+    profile_names,
+)
+
+
+def test_builtin_profiles_are_registered():
+    assert {DEFAULT_PROFILE, 'fast'} <= set(profile_names())
+    assert isinstance(get_profile('fast').graph, Pregel)
+
+
+def test_fast_profile_runs_a_single_extraction_node():
+    nodes = set(get_profile('fast').graph.get_graph().nodes)
+
+    assert 'fast_extractor' in nodes
+    assert 'type_extractor' not in nodes
+
+
+def test_unknown_profile_raises():
+    with pytest.raises(UnknownProfileError):
+        get_profile('does-not-exist')
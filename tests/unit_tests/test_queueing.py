@@ -0,0 +1,24 @@
+from __future__ import annotations
+
+import core.queueing as queueing
+import metadata.tasks as tasks
+from core.config import get_settings
+
+
+def test_worker_shutdown_stops_the_prefetch_executor_sized_from_settings(monkeypatch):
+    monkeypatch.setenv('AGENT_PREFETCH_MAX_WORKERS', '2')
+    get_settings.cache_clear()
+    closed: list = []
+    monkeypatch.setattr(queueing, '_shutdown_hooks', [lambda: closed.append('http'), tasks.shutdown_prefetch_executor])
+    tasks.shutdown_prefetch_executor()
+    try:
+        executor = tasks._get_prefetch_executor()
+        assert executor._max_workers == 2
+
+        queueing.WorkerShutdown().after_worker_shutdown(None, None)
+
+        assert closed == ['http']
+        assert tasks._prefetch_executor is None
+        assert executor._shutdown
+    finally:
+        get_settings.cache_clear()
@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+import pytest
+from langchain_core.language_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+
+from agent.replay import Cassette, CassetteMiss, cassette_calls, llm_request_key
+
+
+def test_llm_request_key_ignores_message_ids_and_timeouts():
+    first = llm_request_key(
+        '[{"lc": 1, "type": "constructor", "kwargs": {"content": "hi", "id": "a"}}]',
+        "model---[('stop', None), ('timeout', 12.5)]",
+    )
+    second = llm_request_key(
+        '[{"lc": 1, "type": "constructor", "kwargs": {"content": "hi", "id": "b"}}]',
+        "model---[('stop', None), ('timeout', 3.1)]",
+    )
+
+    assert first == second
+
+
+def test_chat_model_calls_replay_from_the_cassette(tmp_path):
+    path = tmp_path / 'doc.json'
+    prompt = [HumanMessage(content='Which document type?')]
+
+    with cassette_calls(Cassette(path, 'record')):
+        recorded = GenericFakeChatModel(messages=iter([AIMessage(content='Annual Report')])).invoke(prompt)
+
+    with cassette_calls(Cassette(path, 'replay')):
+        replayed = GenericFakeChatModel(messages=iter([AIMessage(content='Balance Sheet')])).invoke(prompt)
+
+    assert recorded.content == replayed.content == 'Annual Report'
+
+
+def test_replay_of_an_unrecorded_request_fails(tmp_path):
+    path = tmp_path / 'doc.json'
+    Cassette(path, 'record').save()
+
+    with pytest.raises(CassetteMiss):
+        Cassette(path, 'replay').call('search', {'query': 'acme'}, lambda: {}, dump=dict, load=dict)
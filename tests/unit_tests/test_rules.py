@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+import datetime
+
+from agent.rules import extract_structured_fields, lock_prefilled
+from agent.schemas import MetadataSchema
+
+
+def test_extracts_register_and_reporting_fields():
+    text = (
+        'Muster GmbH, Sitz München, eingetragen beim Amtsgericht München unter HRB 123456\n'
+        'Jahresabschluss zum 31. Dezember 2022\n'
+        'Bilanz zum 31.12.2022'
+    )
+
+    fields = extract_structured_fields(text)
+
+    assert fields.company_register == 'Amtsgericht München'
+    assert fields.register_number == 'HRB 123456'
+    assert fields.reporting_date == datetime.date(2022, 12, 31)
+    assert fields.reporting_year == 2022
+
+
+def test_keeps_register_suffix_and_multi_word_court():
+    fields = extract_structured_fields('Amtsgericht Frankfurt am Main, HRB 98765 B. Geschäftsjahr 2021')
+
+    assert fields.company_register == 'Amtsgericht Frankfurt am Main'
+    assert fields.register_number == 'HRB 98765 B'
+    assert fields.reporting_date is None
+    assert fields.reporting_year == 2021
+
+
+def test_ambiguous_values_are_left_to_the_llm():
+    text = 'HRB 1 und HRB 2. Bilanz zum 31.12.2021 sowie Bilanz zum 31.12.2022. Geschäftsjahr 2021/2022'
+
+    fields = extract_structured_fields(text)
+
+    assert fields.register_number is None
+    assert fields.reporting_date is None
+    assert fields.reporting_year is None
+
+
+def test_lock_prefilled_overrides_generated_values():
+    generated = MetadataSchema(company_name='ACME AG', register_number='HRB 1')
+    prefilled = MetadataSchema(register_number='HRB 123456')
+
+    locked = lock_prefilled(generated, prefilled)
+
+    assert locked.register_number == 'HRB 123456'
+    assert locked.company_name == 'ACME AG'
@@ -0,0 +1,14 @@
+from __future__ import annotations
+
+from agent.tools import format_digest
+
+
+def test_format_digest_orders_chunks_by_position():
+    rows = [
+        {'chunk_id': 14, 'document': 'Bestätigungsvermerk des Abschlussprüfers'},
+        {'chunk_id': 0, 'document': 'ACME AG Jahresabschluss zum 31.12.2023'},
+    ]
+
+    assert format_digest(rows) == (
+        '[chunk 0]\nACME AG Jahresabschluss zum 31.12.2023\n\n[chunk 14]\nBestätigungsvermerk des Abschlussprüfers'
+    )